@@ -30,6 +30,8 @@ if command -v apt-get &> /dev/null; then
     
     $PKG_MANAGER update
     $PKG_MANAGER install -y python3 python3-venv python3-pip nginx git libmagic1
+    # OCR for scanned PDFs (offline Tesseract + poppler for rasterizing)
+    $PKG_MANAGER install -y tesseract-ocr tesseract-ocr-chi-sim poppler-utils || true
     PYTHON_EXEC="python3"
 
 elif command -v dnf &> /dev/null; then
@@ -43,6 +45,8 @@ elif command -v dnf &> /dev/null; then
     # We attempt to install epel-release just in case
     $PKG_MANAGER install -y epel-release || true
     $PKG_MANAGER install -y python39 python39-devel python39-pip nginx git gcc file-libs
+    # OCR for scanned PDFs (tesseract-langpack-chi_sim comes from EPEL)
+    $PKG_MANAGER install -y tesseract tesseract-langpack-chi_sim poppler-utils || true
     PYTHON_EXEC="python3.9"
     
     # Fallback to python3 if python3.9 not found (and hope system python is new enough)
@@ -188,7 +192,7 @@ User=$USER_NAME
 Group=$USER_NAME
 WorkingDirectory=$SERVER_DIR
 Environment="PATH=$SERVER_DIR/venv/bin"
-ExecStart=$SERVER_DIR/venv/bin/gunicorn app.main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind 127.0.0.1:8000
+ExecStart=$SERVER_DIR/venv/bin/gunicorn app.main:app -c $SERVER_DIR/gunicorn.conf.py
 Restart=always
 
 [Install]
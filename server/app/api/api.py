@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import contracts, auth, risks, team, archive, overview, knowledge, demo
+from app.api.endpoints import contracts, auth, risks, team, archive, overview, knowledge, demo, system
 
 api_router = APIRouter()
 
@@ -11,3 +11,4 @@ api_router.include_router(team.router, prefix="/team", tags=["team"])
 api_router.include_router(archive.router, prefix="/archive", tags=["archive"])
 api_router.include_router(overview.router, prefix="/overview", tags=["overview"])
 api_router.include_router(knowledge.router, prefix="/knowledge", tags=["knowledge"])
+api_router.include_router(system.router, prefix="/system", tags=["system"])
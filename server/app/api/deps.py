@@ -1,14 +1,17 @@
-from typing import Generator
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, Generator, Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core import security
-from app.core.database import SessionLocal
+from app.core.database import SessionLocal, AsyncSessionLocal, ReadSessionLocal, reads_pinned
 from app.models import user as user_model
 from app.schemas import user as user_schema
+from app.services.user_cache import user_cache
 
 # Note: The tokenUrl should be relative to the frontend or absolute API URL.
 # Since we are mounting api at /api/v1, and auth at /auth, the full path is /api/v1/auth/login
@@ -21,26 +24,90 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> user_model.User:
-    credentials_exception = HTTPException(
+def request_subject(request: Request) -> Optional[str]:
+    """Token subject (email) of the request's bearer token, None if absent or invalid."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return token_email(token)
+    except HTTPException:
+        return None
+
+def get_read_db(request: Request) -> Generator:
+    """
+    Session for read-only endpoints: served by a replica, unless the caller wrote
+    something in the last REPLICA_STICKY_SECONDS (then the primary, so they see it).
+    """
+    subject = request_subject(request)
+    db = SessionLocal() if subject is None or reads_pinned(subject) else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Session for `async def` endpoints; sync service helpers run on it via `await db.run_sync(...)`."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def token_email(token: str) -> str:
+    """Email (sub) of a valid access token; raises 401 otherwise."""
     try:
         payload = jwt.decode(
             token, security.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise _credentials_exception()
         token_data = user_schema.TokenData(email=email)
     except (jwt.JWTError, ValidationError):
-        raise credentials_exception
-    user = db.query(user_model.User).filter(user_model.User.email == token_data.email).first()
+        raise _credentials_exception()
+    return token_data.email
+
+def _resolve_user(db: Session, token: str) -> user_model.User:
+    email = token_email(token)
+    # The token is verified above on every request; only the users lookup is cached
+    user = user_cache.resolve(
+        email, lambda: db.query(user_model.User).filter(user_model.User.email == email).first()
+    )
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+) -> user_model.User:
+    return _resolve_user(db, token)
+
+def get_current_reader(token: str = Depends(oauth2_scheme)) -> user_model.User:
+    """
+    get_current_user for get_read_db endpoints. Cache misses still read the primary
+    (a replica may not have a new signup yet, or may hand back a row the cache just
+    dropped), but on a session that only connects when there is a miss.
+    """
+    db = SessionLocal()
+    try:
+        return _resolve_user(db, token)
+    finally:
+        db.close()
+
+async def get_user_from_token(db: AsyncSession, token: str) -> user_model.User:
+    """Async variant for SSE endpoints that take the token as a query parameter."""
+    email = token_email(token)
+
+    async def load():
+        return (await db.execute(select(user_model.User).where(user_model.User.email == email))).scalars().first()
+
+    user = await user_cache.aresolve(email, load)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
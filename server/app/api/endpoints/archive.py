@@ -2,76 +2,59 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 from datetime import datetime
-import re
 
 from app.api import deps
 from app.models.user import User
 from app.models.contract import Contract
+from app.services.dashboard_stats_service import dashboard_stats, UNCATEGORIZED, STORAGE_QUOTA_MB
+from app.utils.file_size import format_size
 
 router = APIRouter()
 
-def parse_size(size_str: str) -> float:
-    """Parse size string (e.g., '1.2 MB') to bytes."""
-    if not size_str:
-        return 0
-    
-    units = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
-    match = re.match(r"([\d.]+)\s*([A-Za-z]+)", size_str)
-    if match:
-        value, unit = match.groups()
-        return float(value) * units.get(unit.upper(), 1)
-    return 0
-
-def format_size(size_bytes: float) -> str:
-    """Format bytes to string."""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.1f} TB"
-
 @router.get("/")
 def get_archive_data(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_reader)
 ):
-    contracts = db.query(Contract).filter(Contract.user_id == current_user.id).all()
-    
-    # 1. Stats
-    total_bytes = 0
-    new_this_month = 0
-    total_age_days = 0
-    count = len(contracts)
-    
+    # Stats and folders come from the running aggregates; only the listing reads contracts
+    totals = dashboard_stats.totals(db, current_user.id)
+    count = totals["contracts"]
+    new_this_month = dashboard_stats.new_this_month(db, current_user.id)["contracts"]
+
     now = datetime.utcnow()
     month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # 2. Folders (Group by Contract Type)
-    # If contract_type is None, we can try to guess or put in "Other"
-    folders_map = {} # name -> {count, size_bytes}
-    
-    # 3. Process Contracts
+
+    avg_age_years = 0
+    if count > 0:
+        # Average upload timestamp = upload_ts_sum / count
+        avg_age_days = (now.timestamp() - totals["upload_ts_sum"] / count) / 86400
+        avg_age_years = max(avg_age_days, 0) / 365.0
+
+    stats = [
+        {"name": "总存储量", "value": format_size(totals["storage_bytes"])},
+        {"name": "合同数量", "value": str(count)},
+        {"name": "本月新增", "value": str(new_this_month)},
+        {"name": "平均保存", "value": f"{avg_age_years:.1f} 年"},
+    ]
+
+    # Folders (Group by Contract Type)
+    folders_list = []
+    for i, folder in enumerate(dashboard_stats.folders(db, current_user.id)):
+        folders_list.append({
+            "id": i + 1, # Frontend uses ID for selection
+            "name": folder.name,
+            "count": folder.contracts,
+            "size": format_size(folder.storage_bytes)
+        })
+
+    # Metadata columns only: cold (tiered) contracts are listed without touching their payload or file
+    contracts = db.query(
+        Contract.id, Contract.name, Contract.contract_type, Contract.upload_date, Contract.file_size_bytes, Contract.status,
+        Contract.file_tier
+    ).filter(Contract.user_id == current_user.id).order_by(Contract.upload_date.desc()).all()
+
     formatted_contracts = []
-    
     for c in contracts:
-        # Stats
-        size = parse_size(c.file_size)
-        total_bytes += size
-        
-        if c.upload_date and c.upload_date >= month_start:
-            new_this_month += 1
-            
-        if c.upload_date:
-            age = (now - c.upload_date).days
-            total_age_days += age
-            
-        # Folders
-        ctype = c.contract_type or "未分类"
-        if ctype not in folders_map:
-            folders_map[ctype] = {"count": 0, "size": 0}
-        folders_map[ctype]["count"] += 1
-        folders_map[ctype]["size"] += size
-        
         # Formatted Contract
         # Generate tags based on status/date
         tags = []
@@ -85,43 +68,35 @@ def get_archive_data(
         # Check if "New" (this month)
         if c.upload_date and c.upload_date >= month_start:
             tags.append("本月")
+
+        if c.file_tier == "cold":
+            tags.append("已归档")
             
         formatted_contracts.append({
             "id": c.id,
             "name": c.name,
-            "folder": ctype,
+            "folder": c.contract_type or UNCATEGORIZED,
             "date": c.upload_date.isoformat() if c.upload_date else "",
-            "size": c.file_size,
+            "size": format_size(c.file_size_bytes, 2),
             "tags": tags
         })
         
-    # Finalize Stats
-    avg_age_years = 0
-    if count > 0:
-        avg_age_years = (total_age_days / count) / 365.0
-        
-    stats = [
-        {"name": "总存储量", "value": format_size(total_bytes)},
-        {"name": "合同数量", "value": str(count)},
-        {"name": "本月新增", "value": str(new_this_month)},
-        {"name": "平均保存", "value": f"{avg_age_years:.1f} 年"},
-    ]
-    
-    # Finalize Folders
-    folders_list = []
-    for i, (name, data) in enumerate(folders_map.items()):
-        folders_list.append({
-            "id": i + 1, # Frontend uses ID for selection
-            "name": name,
-            "count": data["count"],
-            "size": format_size(data["size"])
-        })
-        
     # Available tags (static for now + dynamic ones we used)
-    all_tags = ['全部', '已完成', '上传中', '分析中', '本月']
+    all_tags = ['全部', '已完成', '上传中', '分析中', '本月', '已归档']
         
+    # Quota is checked against the authoritative SQL sum, not the running aggregate
+    used_bytes = dashboard_stats.storage_used(db, current_user.id)
+    limit_bytes = STORAGE_QUOTA_MB * 1024 * 1024
+    quota = {
+        "used_bytes": used_bytes,
+        "limit_bytes": limit_bytes or None,
+        "used": format_size(used_bytes),
+        "limit": format_size(limit_bytes) if limit_bytes else None,
+    }
+
     return {
         "stats": stats,
+        "quota": quota,
         "folders": folders_list,
         "contracts": formatted_contracts,
         "tags": all_tags
@@ -5,6 +5,7 @@ from app.core import security
 from app.models import user as user_model
 from app.schemas import user as user_schema
 from app.api import deps
+from app.services.team_analytics_service import team_analytics
 
 router = APIRouter()
 
@@ -24,6 +25,7 @@ def register(user: user_schema.UserCreate, db: Session = Depends(deps.get_db)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    team_analytics.invalidate()
     return db_user
 
 @router.post("/login", response_model=user_schema.Token)
@@ -1,43 +1,119 @@
 import os
-import shutil
 import time
 import asyncio
 import json
-from typing import List
-
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.orm.attributes import set_committed_value
 from sse_starlette.sse import EventSourceResponse
 
 from app.api import deps
-from app.models.activity import Activity
 from app.models.contract import Contract
 from app.models.user import User
-from app.schemas.contract import UploadResponse, ContractAnalysisResponse, Contract as ContractSchema
-from app.services.ai_service import AIService
-from app.services.export_service import ExportService
+from app.schemas.contract import UploadResponse, ContractAnalysisResponse, Contract as ContractSchema, ContractSummary, BatchExportRequest
+from app.services.ai_service import get_ai_service
+from app.services.report_cache import report_cache
+from app.services.risk_service import risk_service
+from app.services.tiering_service import tiering, COLD
+from app.services.activity_log import activity_log
+from app.services.dashboard_stats_service import dashboard_stats
+from app.services.batch_export_service import batch_export_service
+from app.services.structured_export_service import structured_export_service, FORMATS as STRUCTURED_FORMATS
+from app.services.browser_pool import BrowserPoolBusy, get_browser_pool
 from app.utils.log_utils import log
+from app.utils.file_size import format_size
+from app.core.database import SessionLocal, AsyncSessionLocal
 from app.core.redis import get_redis_client
+from app.core.storage import get_storage, storage_key_for, LocalStorage, HashingReader
+from app.services.text_artifact_service import text_artifact_service
+from app.api.file_response import storage_file_response, etag_matches, content_disposition
 
 router = APIRouter()
-ai_service = AIService()
-export_service = ExportService()
-
-UPLOAD_DIR = "uploads"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
 
-def get_file_size(size_in_bytes):
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size_in_bytes < 1024.0:
-            return f"{size_in_bytes:.2f} {unit}"
-        size_in_bytes /= 1024.0
-    return f"{size_in_bytes:.2f} TB"
+def new_storage_key(filename: Optional[str], prefix: str = "") -> str:
+    """Unique storage key for a client-supplied filename; 400 if the name is unusable."""
+    try:
+        return storage_key_for(filename, prefix)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+
+def save_upload(storage_key: str, fileobj):
+    """Stream an uploaded file into storage. Returns (size_in_bytes, sha256)."""
+    reader = HashingReader(fileobj)
+    size = get_storage().save(storage_key, reader)
+    return size, reader.hexdigest()
+
+def copy_sample(sample_path: str, storage_key: str):
+    with open(sample_path, "rb") as sample_file:
+        return save_upload(storage_key, sample_file)
+
+async def contract_status(contract_id: int) -> Optional[str]:
+    """Current status straight from the DB, on a short-lived session (for SSE loops)."""
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(Contract.status).where(Contract.id == contract_id))).scalar_one_or_none()
+
+def check_quota_after_save(db: Session, user_id: int, storage_key: str, size: int):
+    """The real size is only known once stored: drop the file again if it breaks the quota."""
+    if dashboard_stats.quota_exceeded(db, user_id, size):
+        get_storage().delete(storage_key)
+        raise HTTPException(status_code=413, detail="Storage quota exceeded")
+
+async def get_user_contract(db: AsyncSession, contract_id: int, user_id: int) -> Contract:
+    contract = (await db.execute(
+        select(Contract).where(Contract.id == contract_id, Contract.user_id == user_id)
+    )).scalar_one_or_none()
+    if not contract:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    return contract
+
+async def contract_results(db: AsyncSession, contract: Contract) -> list:
+    """analysis_results of a contract being opened, rehydrated first if it was tiered cold."""
+    def load(session: Session):
+        touched = tiering.touch(session, contract)
+        if contract.results_tier == COLD:
+            tiering.rehydrate_results(session, contract)
+            return True
+        return touched
+
+    if await db.run_sync(load):
+        await db.commit()
+    return contract.analysis_results or []
+
+async def ensure_hot_file(db: AsyncSession, contract: Contract):
+    """Bring the original back from cold storage before it is read."""
+    restored = contract.file_tier == COLD
+    if restored:
+        await run_in_threadpool(tiering.restore_file, contract.file_path)
+        # Again under the row lock: the tiering job may have deleted the hot copy we just found
+        await db.run_sync(tiering.lock_file_tier, contract)
+        await run_in_threadpool(tiering.restore_file, contract.file_path)
+        await db.run_sync(tiering.mark_file_hot, contract)
+    if await db.run_sync(tiering.touch, contract) or restored:
+        await db.commit()
+
+def run_contract_analysis(contract_id: int, file_path: str):
+    """Background task entry: analysis runs in the threadpool on its own sync session."""
+    db = SessionLocal()
+    try:
+        contract = db.query(Contract).filter(Contract.id == contract_id).first()
+        if contract and contract.file_tier == COLD:
+            tiering.ensure_file(db, contract)
+            db.commit()
+        process_contract_background(contract_id, file_path, db)
+    finally:
+        db.close()
 
 def process_contract_background(contract_id: int, file_path: str, db: Session):
     """
     Background task to parse file and run AI analysis.
+    file_path is the storage key of the uploaded contract.
     """
     redis_client = get_redis_client()
     try:
@@ -53,7 +129,16 @@ def process_contract_background(contract_id: int, file_path: str, db: Session):
             log.info(f"Contract {contract_id} not found during background processing")
             return
 
+        # Baseline for the dashboard aggregates once results are saved
+        started = time.monotonic()
+        previous_type = contract.contract_type
+        previous_counts = dashboard_stats.risk_counts(db, contract.id)
+
+        dashboard_stats.analysis_started(db, contract)
         contract.status = "analyzing"
+        if not contract.file_hash:
+            # Contracts uploaded before text artifacts existed
+            contract.file_hash = get_storage().sha256(file_path)
         db.commit()
         
         # Simulate progress update since AI service is blocking/blackbox
@@ -77,7 +162,12 @@ def process_contract_background(contract_id: int, file_path: str, db: Session):
             return False
 
         # ai_service.process_file now returns a dict { "risks": [...], "type": "..." }
-        analysis_output = ai_service.process_file(file_path, progress_callback=update_progress, cancel_check=check_cancel)
+        analysis_output = get_ai_service().process_file(
+            file_path,
+            progress_callback=update_progress,
+            cancel_check=check_cancel,
+            file_hash=contract.file_hash
+        )
         
         results = analysis_output.get("risks", [])
         contract_type = analysis_output.get("type", "通用合同")
@@ -94,12 +184,25 @@ def process_contract_background(contract_id: int, file_path: str, db: Session):
                      if r_type in risk_summary:
                          risk_summary[r_type] += 1
 
-        # Save Results
+        # Save Results (a cold copy from an earlier run is superseded)
+        if contract.results_tier == COLD:
+            tiering.forget_results(db, contract)
         contract.analysis_results = results
+        contract.last_accessed_at = datetime.utcnow()
         contract.contract_type = contract_type
         contract.risk_summary = risk_summary
         contract.status = "analyzed" # or "completed"
+        # New document: versions handed out for the old one must no longer match
+        contract.version = Contract.version + 1
+        # Same transaction: the risks table never disagrees with analysis_results
+        risk_service.sync_contract(db, contract)
+        db.flush()
+        dashboard_stats.contract_analyzed(
+            db, contract, previous_type, previous_counts,
+            dashboard_stats.risk_counts(db, contract.id), time.monotonic() - started
+        )
         db.commit()
+        risk_service.invalidate_stats(contract.user_id)
         
         if redis_client:
             redis_client.set(f"contract:{contract_id}:progress", 100, ex=3600)
@@ -107,6 +210,9 @@ def process_contract_background(contract_id: int, file_path: str, db: Session):
             # Store results briefly in Redis if needed for fast retrieval, but DB is fine
             
         log.info(f"Analysis completed for contract {contract_id}")
+
+        # Warm the report cache so the first export click is instant
+        report_cache.pregenerate_from_thread(contract.name, results)
         
     except InterruptedError:
         log.info(f"Analysis cancelled for contract {contract_id}")
@@ -127,71 +233,90 @@ def process_contract_background(contract_id: int, file_path: str, db: Session):
             redis_client.set(f"contract:{contract_id}:status", "failed", ex=3600)
 
 
-@router.get("/", response_model=List[ContractSchema])
+# Columns the list view needs; the analysis_results JSON stays in the database
+CONTRACT_LIST_COLUMNS = (
+    Contract.id, Contract.name, Contract.contract_type, Contract.file_size_bytes,
+    Contract.upload_date, Contract.status, Contract.risk_summary,
+)
+CONTRACT_LIST_INCLUDES = {"analysis_results"}
+
+@router.get("/", response_model=None, responses={200: {"model": List[ContractSummary]}})
 async def get_contracts(
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    include: Optional[str] = Query(None, description="Comma-separated extras, e.g. analysis_results")
 ):
     """
-    Retrieve contracts for the current user.
+    Retrieve contracts for the current user (summaries). Full results come from
+    /{id}/analysis; pass include=analysis_results to inline them anyway.
     """
-    contracts = db.query(Contract).filter(Contract.user_id == current_user.id).offset(skip).limit(limit).all()
-    return contracts
+    extras = {part.strip() for part in include.split(",") if part.strip()} if include else set()
+    unknown = extras - CONTRACT_LIST_INCLUDES
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(sorted(unknown))}")
+
+    query = select(Contract).where(Contract.user_id == current_user.id)
+    if "analysis_results" not in extras:
+        query = query.options(load_only(*CONTRACT_LIST_COLUMNS))
+    contracts = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
+    if "analysis_results" in extras:
+        # Decoded for the response only: listing a page is no reason to move it back to the hot tier
+        cold = [contract.id for contract in contracts if contract.results_tier == COLD]
+        if cold:
+            results = await db.run_sync(tiering.cold_results, cold)
+            for contract in contracts:
+                if contract.id in results:
+                    set_committed_value(contract, "analysis_results", results[contract.id])
+
+    schema = ContractSchema if "analysis_results" in extras else ContractSummary
+    return [schema.model_validate(contract) for contract in contracts]
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_contract(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Upload a contract file for analysis.
     """
-    # Save file
-    safe_filename = f"{int(time.time())}_{file.filename}"
-    file_location = os.path.join(UPLOAD_DIR, safe_filename)
-    
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
-    
-    file_size_bytes = os.path.getsize(file_location)
-    file_size_str = get_file_size(file_size_bytes)
+    # Reject early when the declared size already exceeds the quota
+    if await db.run_sync(dashboard_stats.quota_exceeded, current_user.id, file.size or 0):
+        raise HTTPException(status_code=413, detail="Storage quota exceeded")
+
+    # Save file (streamed into the configured storage backend, off the event loop)
+    storage_key = new_storage_key(file.filename)
+    file_size_bytes, file_hash = await run_in_threadpool(save_upload, storage_key, file.file)
+    await db.run_sync(check_quota_after_save, current_user.id, storage_key, file_size_bytes)
     
     # Create DB record
     db_contract = Contract(
         name=file.filename,
-        file_path=file_location,
-        file_size=file_size_str,
+        file_path=storage_key,
+        file_size_bytes=file_size_bytes,
+        file_hash=file_hash,
         status="pending", # Changed from uploading to pending
         user_id=current_user.id
     )
     db.add(db_contract)
-    db.commit()
-    db.refresh(db_contract)
+    await db.flush()
+    await db.run_sync(lambda session: dashboard_stats.contract_added(session, db_contract, file_size_bytes))
+    await db.commit()
+    await db.refresh(db_contract)
     
-    # Add Activity Log
-    try:
-        activity = Activity(
-            user_id=current_user.id,
-            user_name=current_user.full_name or current_user.email.split('@')[0],
-            action="上传了",
-            target=db_contract.name
-        )
-        db.add(activity)
-        db.commit()
-    except Exception as e:
-        log.info(f"Failed to log activity: {e}")
+    # Add Activity Log (buffered, written in batches)
+    activity_log.record(current_user, "上传了", db_contract.name)
 
     # Don't trigger background analysis here!
-    # background_tasks.add_task(process_contract_background, db_contract.id, file_location, db)
+    # background_tasks.add_task(run_contract_analysis, db_contract.id, storage_key)
     
     return {
         "id": db_contract.id,
         "name": db_contract.name,
-        "size": db_contract.file_size,
+        "size": format_size(db_contract.file_size_bytes, 2),
         "status": db_contract.status
     }
 
@@ -199,138 +324,338 @@ async def upload_contract(
 async def start_contract_analysis(
     contract_id: int,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Manually trigger contract analysis.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id, Contract.user_id == current_user.id).first()
-    
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
+    contract = await get_user_contract(db, contract_id, current_user.id)
         
     if contract.status in ["analyzing", "analyzed", "completed"]:
          return {"message": "Analysis already started or completed", "status": contract.status}
 
     # Trigger background analysis
-    background_tasks.add_task(process_contract_background, contract.id, contract.file_path, db)
+    background_tasks.add_task(run_contract_analysis, contract.id, contract.file_path)
     
     return {"message": "Analysis started", "status": "analyzing"}
 
 @router.get("/{contract_id}/analysis", response_model=ContractAnalysisResponse)
 async def get_analysis(
     contract_id: int,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Get the analysis results for a contract.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id, Contract.user_id == current_user.id).first()
-    
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
+    contract = await get_user_contract(db, contract_id, current_user.id)
 
     return {
         "contract_id": contract.id,
         "status": contract.status,
-        "results": contract.analysis_results or []
+        "results": await contract_results(db, contract)
+    }
+
+@router.get("/{contract_id}/text")
+async def get_contract_text(
+    contract_id: int,
+    start_page: int = Query(1, ge=1),
+    end_page: int = Query(None, ge=1),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Get the extracted text of pages start_page..end_page (1-based, inclusive).
+    Served from the persisted text artifact, so viewers can page through a
+    contract without downloading the original file.
+    """
+    contract = await get_user_contract(db, contract_id, current_user.id)
+    # The text artifact stays hot; the original is only needed if it was never parsed
+    if contract.file_tier == COLD and not (
+        contract.file_hash and await run_in_threadpool(text_artifact_service.load, contract.file_hash)
+    ):
+        await ensure_hot_file(db, contract)
+
+    document = await run_in_threadpool(text_artifact_service.get_document, contract.file_path, contract.file_hash)
+    if not document.page_count:
+        raise HTTPException(status_code=404, detail="No text could be extracted from this contract")
+
+    end_page = min(end_page or start_page, document.page_count)
+    if start_page > end_page:
+        raise HTTPException(status_code=416, detail=f"Contract has only {document.page_count} pages")
+
+    start, end = document.page_span(start_page, end_page)
+    return {
+        "contract_id": contract.id,
+        "page_count": document.page_count,
+        "start_page": start_page,
+        "end_page": end_page,
+        "offset": start,
+        "page_offsets": [o - start for o in document.page_offsets[start_page - 1:end_page]],
+        "text": document.text[start:end]
+    }
+
+@router.get("/export/stats")
+def export_stats(current_user: User = Depends(deps.get_current_user)):
+    """
+    PDF export throughput and latency of this worker's browser pool.
+    """
+    return get_browser_pool().metrics.snapshot()
+
+@router.post("/export/batch")
+async def create_batch_export(
+    payload: BatchExportRequest,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Start a portfolio export of many contracts (explicit ids and/or filters)
+    into one merged PDF or a ZIP. Returns a job id to poll or stream.
+    """
+    if not payload.contract_ids and not payload.filters:
+        raise HTTPException(status_code=400, detail="Provide contract_ids or filters")
+
+    filters = payload.filters.model_dump(exclude_none=True) if payload.filters else None
+    contract_ids = await db.run_sync(
+        batch_export_service.resolve_contract_ids, current_user.id, payload.contract_ids, filters
+    )
+    if not contract_ids:
+        raise HTTPException(status_code=404, detail="No contracts match")
+
+    job_id = await batch_export_service.create_job(current_user.id, contract_ids, payload.format)
+    return {"job_id": job_id, "total": len(contract_ids), "status": "pending"}
+
+async def _get_export_job(job_id: str, user_id: int) -> dict:
+    job = await batch_export_service.get_job(job_id)
+    if not job or job.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+@router.get("/export/batch/{job_id}")
+async def get_batch_export(
+    job_id: str,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Get the status and progress of a batch export job.
+    """
+    job = await _get_export_job(job_id, current_user.id)
+    return {k: v for k, v in job.items() if k != "user_id"}
+
+@router.get("/export/batch/{job_id}/stream")
+async def stream_batch_export_progress(
+    job_id: str,
+    request: Request,
+    token: str,
+    db: AsyncSession = Depends(deps.get_async_db)
+):
+    """
+    Stream batch export progress using SSE (same shape as analysis progress).
+    """
+    try:
+        user = await deps.get_user_from_token(db, token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    await _get_export_job(job_id, user.id)
+
+    stages = {"pending": "排队中...", "exporting": "生成审查报告...", "assembling": "合并文件...",
+              "completed": "已完成", "failed": "导出失败"}
+
+    async def event_generator():
+        while True:
+            if await request.is_disconnected():
+                break
+            job = await batch_export_service.get_job(job_id) or {"status": "failed", "progress": 0}
+            status = job.get("status", "pending")
+            yield {"event": "message", "data": json.dumps({
+                "status": status,
+                "progress": job.get("progress", 0),
+                "stage": stages.get(status, status),
+                "done": job.get("done", 0),
+                "total": job.get("total", 0),
+            })}
+            if status in ["completed", "failed"]:
+                break
+            await asyncio.sleep(1)
+
+    return EventSourceResponse(event_generator())
+
+@router.get("/export/batch/{job_id}/download")
+async def download_batch_export(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Download the merged PDF / ZIP of a completed batch export.
+    """
+    job = await _get_export_job(job_id, current_user.id)
+    if job.get("status") != "completed":
+        raise HTTPException(status_code=409, detail="Export not finished")
+
+    fmt = job.get("format", "pdf")
+    return await storage_file_response(
+        request,
+        batch_export_service.storage,
+        job["filename"],
+        filename=f"合同审查报告汇总_{job_id[:8]}.{fmt}",
+        media_type="application/pdf" if fmt == "pdf" else "application/zip",
+    )
+
+def _structured_export_response(fmt: str, contracts, filename: str) -> StreamingResponse:
+    media_type, ext = STRUCTURED_FORMATS[fmt]
+    return StreamingResponse(
+        structured_export_service.export(fmt, contracts),
+        media_type=media_type,
+        headers={"Content-Disposition": content_disposition(f"{filename}.{ext}")},
+    )
+
+@router.get("/export/risks")
+def export_risks(
+    format: Literal['xlsx', 'csv', 'jsonl', 'docx'] = 'xlsx',
+    contract_ids: Optional[List[int]] = Query(None),
+    status: Optional[str] = None,
+    contract_type: Optional[str] = None,
+    risk_level: Optional[Literal['high', 'medium', 'low']] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    keyword: Optional[str] = None,
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Export the risks of all matching contracts as XLSX / CSV / JSONL, or a DOCX redline.
+    No browser involved; the file is streamed while the contracts are read.
+    """
+    filters = {
+        "status": status, "contract_type": contract_type, "risk_level": risk_level,
+        "date_from": date_from, "date_to": date_to, "keyword": keyword,
     }
+    contracts = structured_export_service.iter_contracts(current_user.id, contract_ids, filters)
+    return _structured_export_response(format, contracts, f"合同风险清单_{datetime.now():%Y%m%d}")
 
 @router.get("/{contract_id}/export/pdf")
 async def export_pdf(
     contract_id: int,
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Export analysis report as PDF.
+    Reports are cached by content hash, which is also the ETag.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id, Contract.user_id == current_user.id).first()
-    
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
-        
-    output_filename = f"report_{contract_id}.pdf"
-    output_path = os.path.join(UPLOAD_DIR, output_filename)
-    
-    # Generate PDF
-    success = await export_service.generate_pdf(
-        contract_name=contract.name,
-        analysis_results=contract.analysis_results or [],
-        output_path=output_path
-    )
-    
-    if not success:
+    contract = await get_user_contract(db, contract_id, current_user.id)
+
+    analysis_results = await contract_results(db, contract)
+    key = report_cache.report_key(contract.name, analysis_results)
+    etag = f'"{key}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    filename = f"审查报告_{contract.name}.pdf"
+    if report_cache.lookup(key):
+        try:
+            return await storage_file_response(
+                request,
+                report_cache.storage,
+                report_cache.filename(key),
+                filename=filename,
+                media_type="application/pdf",
+                etag=etag,
+            )
+        except HTTPException as e:
+            # Evicted since the lookup: render it again below
+            if e.status_code != 404:
+                raise
+
+    # Cache miss: render in memory and send the bytes directly
+    try:
+        pdf = await report_cache.render(key, contract.name, analysis_results)
+    except BrowserPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        log.error(f"Failed to generate PDF for contract {contract_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate PDF")
-        
-    return FileResponse(
-        output_path, 
-        media_type='application/pdf', 
-        filename=f"审查报告_{contract.name}.pdf"
+
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"ETag": etag, "Content-Disposition": content_disposition(filename)},
     )
 
-@router.get("/{contract_id}/download")
-async def download_file(
+@router.get("/{contract_id}/export/{fmt}")
+def export_structured(
+    fmt: Literal['xlsx', 'csv', 'jsonl', 'docx'],
     contract_id: int,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
-    Download the original uploaded contract file.
+    Export one contract's analysis as XLSX / CSV / JSONL, or a DOCX redline.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id, Contract.user_id == current_user.id).first()
-    
+    contract = db.query(Contract.id, Contract.name).filter(
+        Contract.id == contract_id, Contract.user_id == current_user.id
+    ).first()
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
-        
-    if not os.path.exists(contract.file_path):
-        raise HTTPException(status_code=404, detail="File not found on server")
 
-    return FileResponse(
+    contracts = structured_export_service.iter_contracts(current_user.id, [contract_id])
+    return _structured_export_response(fmt, contracts, f"审查报告_{contract.name}")
+
+@router.get("/{contract_id}/download")
+async def download_file(
+    contract_id: int,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Download the original uploaded contract file.
+    Supports Range requests and If-None-Match revalidation.
+    """
+    contract = await get_user_contract(db, contract_id, current_user.id)
+    await ensure_hot_file(db, contract)
+
+    return await storage_file_response(
+        request,
+        get_storage(),
         contract.file_path,
-        media_type='application/octet-stream',
-        filename=contract.name
+        filename=contract.name,
+        media_type='application/octet-stream'
     )
 
 @router.delete("/{contract_id}")
 async def delete_contract(
     contract_id: int,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Delete a contract and its associated file.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id, Contract.user_id == current_user.id).first()
-    
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
+    contract = await get_user_contract(db, contract_id, current_user.id)
         
-    # Delete file from disk
-    if contract.file_path and os.path.exists(contract.file_path):
+    # Delete file from storage
+    if contract.file_path:
         try:
-            os.remove(contract.file_path)
+            await run_in_threadpool(tiering.delete_file, contract.file_path)
         except Exception as e:
             log.info(f"Error deleting file {contract.file_path}: {e}")
             # Continue to delete DB record even if file deletion fails
             
-    db.delete(contract)
-    db.commit()
+    def remove(session: Session):
+        dashboard_stats.contract_removed(session, contract, dashboard_stats.risk_counts(session, contract.id))
+        risk_service.delete_contract(session, contract.id)
+        tiering.forget_results(session, contract)
+        session.delete(contract)
+
+    await db.run_sync(remove)
+    await db.commit()
+    risk_service.invalidate_stats(current_user.id)
 
     # Log Activity
-    try:
-        activity = Activity(
-            user_id=current_user.id,
-            user_name=current_user.full_name or current_user.email.split('@')[0],
-            action="删除了",
-            target=contract.name
-        )
-        db.add(activity)
-        db.commit()
-    except Exception as e:
-        log.info(f"Failed to log activity: {e}")
+    activity_log.record(current_user, "删除了", contract.name)
     
     return {"message": "Contract deleted successfully"}
 
@@ -339,7 +664,7 @@ async def stream_analysis_progress(
     contract_id: int,
     request: Request,
     token: str,
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """
     Stream analysis progress using SSE.
@@ -347,15 +672,13 @@ async def stream_analysis_progress(
     # Simple auth check using the token from query param
     # In production, use proper dependency injection for this
     try:
-        user = deps.get_current_user(db=db, token=token)
+        user = await deps.get_user_from_token(db, token)
     except Exception:
         # If auth fails, we return a 401, but for SSE it's tricky. 
         # We'll just close the connection or yield an error.
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    contract = db.query(Contract).filter(Contract.id == contract_id, Contract.user_id == user.id).first()
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
+    await get_user_contract(db, contract_id, user.id)
 
     redis_client = get_redis_client()
     
@@ -376,13 +699,11 @@ async def stream_analysis_progress(
                     progress = int(r_progress) if r_progress else 0
                 else:
                     # Fallback to DB
-                    db.refresh(contract)
-                    status = contract.status
+                    status = await contract_status(contract_id)
                     progress = 100 if status in ["analyzed", "completed"] else 0
             else:
                  # Fallback to DB
-                db.refresh(contract)
-                status = contract.status
+                status = await contract_status(contract_id)
                 progress = 100 if status in ["analyzed", "completed"] else 0
             
             # Determine stage based on progress
@@ -414,16 +735,13 @@ async def stream_analysis_progress(
 @router.post("/{contract_id}/cancel")
 async def cancel_contract_analysis(
     contract_id: int,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Cancel a running analysis.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id, Contract.user_id == current_user.id).first()
-    
-    if not contract:
-        raise HTTPException(status_code=404, detail="Contract not found")
+    await get_user_contract(db, contract_id, current_user.id)
 
     redis_client = get_redis_client()
     if redis_client:
@@ -434,6 +752,7 @@ async def cancel_contract_analysis(
 # --- Sample Contracts Endpoints ---
 
 SAMPLES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../assets/sample_contracts"))
+sample_storage = LocalStorage(SAMPLES_DIR)
 
 @router.get("/samples")
 async def get_samples():
@@ -453,59 +772,59 @@ async def get_samples():
     return samples
 
 @router.get("/samples/{filename}/download")
-async def download_sample(filename: str):
+async def download_sample(filename: str, request: Request):
     """
     Download a sample contract.
     """
-    file_path = os.path.join(SAMPLES_DIR, filename)
-    if not os.path.exists(file_path):
+    if not sample_storage.exists(filename):
         raise HTTPException(status_code=404, detail="Sample not found")
-        
-    return FileResponse(
-        file_path,
-        media_type='application/pdf',
-        filename=filename
+
+    return await storage_file_response(
+        request,
+        sample_storage,
+        filename,
+        filename=filename,
+        media_type='application/pdf'
     )
 
 @router.post("/samples/{filename}/import", response_model=UploadResponse)
 async def import_sample(
     filename: str,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(deps.get_current_user)
 ):
     """
     Import a sample contract to user's workspace.
     """
-    sample_path = os.path.join(SAMPLES_DIR, filename)
-    if not os.path.exists(sample_path):
+    sample_path = sample_storage.local_path(filename)
+    if not sample_path:
         raise HTTPException(status_code=404, detail="Sample not found")
         
-    # Copy to uploads
-    safe_filename = f"{int(time.time())}_{filename}"
-    dest_path = os.path.join(UPLOAD_DIR, safe_filename)
-    
-    shutil.copy2(sample_path, dest_path)
-    
-    file_size_bytes = os.path.getsize(dest_path)
-    file_size_str = get_file_size(file_size_bytes)
+    # Copy into contract storage
+    storage_key = new_storage_key(filename)
+    file_size_bytes, file_hash = await run_in_threadpool(copy_sample, sample_path, storage_key)
+    await db.run_sync(check_quota_after_save, current_user.id, storage_key, file_size_bytes)
     
     # Create Contract
     db_contract = Contract(
         name=filename,
-        file_path=dest_path,
-        file_size=file_size_str,
+        file_path=storage_key,
+        file_size_bytes=file_size_bytes,
+        file_hash=file_hash,
         status="pending",
         user_id=current_user.id,
         contract_type="Sample"
     )
     db.add(db_contract)
-    db.commit()
-    db.refresh(db_contract)
+    await db.flush()
+    await db.run_sync(lambda session: dashboard_stats.contract_added(session, db_contract, file_size_bytes))
+    await db.commit()
+    await db.refresh(db_contract)
     
     return {
         "id": db_contract.id,
         "name": db_contract.name,
-        "size": db_contract.file_size,
+        "size": format_size(db_contract.file_size_bytes, 2),
         "status": db_contract.status
     }
 
@@ -1,24 +1,26 @@
 import os
-import shutil
-import time
 import asyncio
 import json
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Request
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sse_starlette.sse import EventSourceResponse
 
 from app.api import deps
 from app.models.contract import Contract
 from app.schemas.contract import UploadResponse, ContractAnalysisResponse
-from app.services.ai_service import AIService
 from app.utils.log_utils import log
 from app.core.redis import get_redis_client
-from app.api.endpoints.contracts import process_contract_background, get_file_size, UPLOAD_DIR, SAMPLES_DIR
+from app.utils.file_size import format_size
+from app.api.endpoints.contracts import run_contract_analysis, new_storage_key, save_upload, copy_sample, contract_status, contract_results, SAMPLES_DIR, sample_storage
 
 router = APIRouter()
-ai_service = AIService()
+
+async def get_demo_contract(db: AsyncSession, contract_id: int) -> Optional[Contract]:
+    return (await db.execute(select(Contract).where(Contract.id == contract_id))).scalar_one_or_none()
 
 @router.get("/samples")
 async def get_public_samples():
@@ -41,41 +43,36 @@ async def get_public_samples():
 async def upload_demo_contract(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """
     Upload a contract file for public demo analysis (no auth required).
     """
     # Save file
-    safe_filename = f"demo_{int(time.time())}_{file.filename}"
-    file_location = os.path.join(UPLOAD_DIR, safe_filename)
-    
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
-    
-    file_size_bytes = os.path.getsize(file_location)
-    file_size_str = get_file_size(file_size_bytes)
+    storage_key = new_storage_key(file.filename, "demo_")
+    file_size_bytes, file_hash = await run_in_threadpool(save_upload, storage_key, file.file)
     
     # Create DB record with user_id=None
     db_contract = Contract(
         name=file.filename,
-        file_path=file_location,
-        file_size=file_size_str,
+        file_path=storage_key,
+        file_size_bytes=file_size_bytes,
+        file_hash=file_hash,
         status="pending",
         user_id=None, # Public contract
         contract_type="Demo"
     )
     db.add(db_contract)
-    db.commit()
-    db.refresh(db_contract)
+    await db.commit()
+    await db.refresh(db_contract)
     
     # Trigger analysis immediately for demo
-    background_tasks.add_task(process_contract_background, db_contract.id, file_location, db)
+    background_tasks.add_task(run_contract_analysis, db_contract.id, storage_key)
     
     return {
         "id": db_contract.id,
         "name": db_contract.name,
-        "size": db_contract.file_size,
+        "size": format_size(db_contract.file_size_bytes, 2),
         "status": db_contract.status
     }
 
@@ -83,57 +80,53 @@ async def upload_demo_contract(
 async def import_demo_sample(
     filename: str,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """
     Import a sample contract for public demo (no auth required).
     """
-    sample_path = os.path.join(SAMPLES_DIR, filename)
-    if not os.path.exists(sample_path):
+    sample_path = sample_storage.local_path(filename)
+    if not sample_path:
         raise HTTPException(status_code=404, detail="Sample not found")
         
-    # Copy to uploads
-    safe_filename = f"demo_{int(time.time())}_{filename}"
-    dest_path = os.path.join(UPLOAD_DIR, safe_filename)
-    
-    shutil.copy2(sample_path, dest_path)
-    
-    file_size_bytes = os.path.getsize(dest_path)
-    file_size_str = get_file_size(file_size_bytes)
+    # Copy into contract storage
+    storage_key = new_storage_key(filename, "demo_")
+    file_size_bytes, file_hash = await run_in_threadpool(copy_sample, sample_path, storage_key)
     
     # Create Contract
     db_contract = Contract(
         name=filename,
-        file_path=dest_path,
-        file_size=file_size_str,
+        file_path=storage_key,
+        file_size_bytes=file_size_bytes,
+        file_hash=file_hash,
         status="pending",
         user_id=None,
         contract_type="Demo Sample"
     )
     db.add(db_contract)
-    db.commit()
-    db.refresh(db_contract)
+    await db.commit()
+    await db.refresh(db_contract)
     
     # Trigger analysis immediately
-    background_tasks.add_task(process_contract_background, db_contract.id, dest_path, db)
+    background_tasks.add_task(run_contract_analysis, db_contract.id, storage_key)
     
     return {
         "id": db_contract.id,
         "name": db_contract.name,
-        "size": db_contract.file_size,
+        "size": format_size(db_contract.file_size_bytes, 2),
         "status": db_contract.status
     }
 
 @router.get("/{contract_id}/analysis", response_model=ContractAnalysisResponse)
 async def get_demo_analysis(
     contract_id: int,
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """
     Get the analysis results for a demo contract.
     Only allows accessing contracts with user_id=None.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id).first()
+    contract = await get_demo_contract(db, contract_id)
     
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
@@ -144,19 +137,19 @@ async def get_demo_analysis(
     return {
         "contract_id": contract.id,
         "status": contract.status,
-        "results": contract.analysis_results or []
+        "results": await contract_results(db, contract)
     }
 
 @router.get("/{contract_id}/analysis/stream")
 async def stream_demo_analysis(
     contract_id: int,
     request: Request,
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """
     Stream analysis progress for demo contract using SSE.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id).first()
+    contract = await get_demo_contract(db, contract_id)
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
         
@@ -187,8 +180,7 @@ async def stream_demo_analysis(
             
             # Fallback to DB if Redis is empty
             if not status:
-                db.refresh(contract)
-                status = contract.status
+                status = await contract_status(contract_id)
                 # Estimate progress based on status if not in Redis
                 if status in ["completed", "analyzed"]:
                     progress = 100
@@ -230,12 +222,12 @@ async def stream_demo_analysis(
 @router.post("/{contract_id}/cancel")
 async def cancel_demo_analysis(
     contract_id: int,
-    db: Session = Depends(deps.get_db)
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """
     Cancel a running analysis for demo contract.
     """
-    contract = db.query(Contract).filter(Contract.id == contract_id).first()
+    contract = await get_demo_contract(db, contract_id)
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
         
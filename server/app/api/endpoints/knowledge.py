@@ -16,8 +16,8 @@ class ArticleCreate(BaseModel):
 
 @router.get("/")
 def get_articles(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_reader),
     category: str = None,
     search: str = None,
     skip: int = 0,
@@ -75,14 +75,18 @@ def create_article(
 @router.get("/{article_id}")
 def get_article(
     article_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_reader),
 ):
     article = db.query(KnowledgeArticle).filter(KnowledgeArticle.id == article_id).first()
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     
-    article.views += 1
+    views = (article.views or 0) + 1
+    # Atomic increment on the primary; the article itself may have been read from a replica
+    db.query(KnowledgeArticle).filter(KnowledgeArticle.id == article_id).update(
+        {KnowledgeArticle.views: KnowledgeArticle.views + 1}, synchronize_session=False
+    )
     db.commit()
     
     return {
@@ -93,5 +97,5 @@ def get_article(
         "author_name": article.author.full_name if article.author else "Unknown",
         "created_at": article.created_at,
         "updated_at": article.updated_at,
-        "views": article.views
+        "views": views
     }
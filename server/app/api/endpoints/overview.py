@@ -7,83 +7,91 @@ import random
 from app.api import deps
 from app.models.user import User
 from app.models.contract import Contract
+from app.models.risk import Risk
+from app.services.dashboard_stats_service import dashboard_stats
 
 router = APIRouter()
 
+def signed(value) -> str:
+    value = int(value)
+    return f"+{value}" if value > 0 else str(value)
+
+def average_seconds(counters: dict):
+    if not counters["analysis_count"]:
+        return None
+    return counters["analysis_seconds"] / counters["analysis_count"]
+
+def format_duration(seconds: float, show_sign: bool = False) -> str:
+    """45s / 3.2min / 1.5h"""
+    sign = ("+" if seconds > 0 else "-") if show_sign and seconds else ""
+    seconds = abs(seconds)
+    if seconds < 60:
+        text = f"{seconds:.0f}s"
+    elif seconds < 3600:
+        text = f"{seconds / 60:.1f}min"
+    else:
+        text = f"{seconds / 3600:.1f}h"
+    return sign + text
+
 @router.get("/")
 def get_overview_data(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_reader)
 ):
-    contracts = db.query(Contract).filter(Contract.user_id == current_user.id).order_by(Contract.upload_date.desc()).all()
-    
-    # 1. Stats Calculation
-    total_contracts = len(contracts)
-    reviewed_contracts = sum(1 for c in contracts if c.status == 'analyzed')
-    
-    pending_risks_count = 0
-    recent_risks_list = []
-    
-    # Collect risks
-    for c in contracts:
-        if c.analysis_results and isinstance(c.analysis_results, list):
-            for risk in c.analysis_results:
-                if isinstance(risk, dict) and risk.get('status', 'pending') == 'pending':
-                    pending_risks_count += 1
-                    recent_risks_list.append({
-                        "id": risk.get('id', 0),
-                        "title": risk.get('title', '未知风险'),
-                        "level": risk.get('type', 'medium'), # high, medium, low
-                        "contract": c.name,
-                        "contract_id": c.id
-                    })
-    
-    # Mock comparisons for now (random variations for demo feel)
-    # In a real app, we'd query last month's data to compare
-    
+    # 1. Stats: running totals and week-over-week deltas, no scan of the user's contracts
+    totals = dashboard_stats.totals(db, current_user.id)
+    week, previous_week = dashboard_stats.week_over_week(db, current_user.id)
+
+    avg_time = average_seconds(totals)
+    avg_change = None
+    if week["analysis_count"] and previous_week["analysis_count"]:
+        avg_change = average_seconds(week) - average_seconds(previous_week)
+
     stats = [
         { 
             "name": '合同总数', 
-            "value": str(total_contracts), 
-            "change": '+2', 
-            "changeType": 'positive',
+            "value": str(totals["contracts"]), 
+            "change": signed(week["contracts"]), 
+            "changeType": 'positive' if week["contracts"] >= 0 else 'negative',
             "icon": "FileText",
             "color": 'blue'
         },
         { 
             "name": '待处理风险', 
-            "value": str(pending_risks_count), 
-            "change": '-1' if pending_risks_count < 5 else '+3', 
-            "changeType": 'positive' if pending_risks_count < 5 else 'negative',
+            "value": str(totals["risks_pending"]), 
+            "change": signed(week["risks_pending"]), 
+            "changeType": 'positive' if week["risks_pending"] <= 0 else 'negative',
             "icon": "AlertTriangle",
             "color": 'orange'
         },
         { 
             "name": '已审核合同', 
-            "value": str(reviewed_contracts), 
-            "change": '+5', 
-            "changeType": 'positive',
+            "value": str(totals["analyzed"]), 
+            "change": signed(week["analyzed"]), 
+            "changeType": 'positive' if week["analyzed"] >= 0 else 'negative',
             "icon": "CheckCircle",
             "color": 'green'
         },
         { 
             "name": '平均处理时间', 
-            "value": '1.5h', 
-            "change": '-0.2h', 
-            "changeType": 'positive',
+            "value": format_duration(avg_time) if avg_time is not None else '-', 
+            "change": format_duration(avg_change, show_sign=True) if avg_change is not None else '0', 
+            "changeType": 'positive' if not avg_change or avg_change <= 0 else 'negative',
             "icon": "Clock",
             "color": 'purple'
         },
     ]
     
     # 2. Recent Contracts (Top 4)
+    recent_contracts = db.query(
+        Contract.id, Contract.name, Contract.status, Contract.upload_date, Contract.risk_summary
+    ).filter(Contract.user_id == current_user.id).order_by(Contract.upload_date.desc()).limit(4).all()
+
     recent_contracts_data = []
-    for c in contracts[:4]:
+    for c in recent_contracts:
         risk_count = 0
         if c.risk_summary and isinstance(c.risk_summary, dict):
              risk_count = sum(c.risk_summary.values())
-        elif c.analysis_results:
-             risk_count = len(c.analysis_results)
 
         recent_contracts_data.append({
             "id": c.id,
@@ -93,9 +101,23 @@ def get_overview_data(
             "date": c.upload_date.strftime("%Y-%m-%d %H:%M:%S") if c.upload_date else ""
         })
         
-    # 3. Recent Risks (Top 3)
-    # Since we collected them from most recent contracts first, just take top 3
-    recent_risks_data = recent_risks_list[:3]
+    # 3. Recent Risks (Top 3): pending risks of the most recent contracts
+    recent_risks = db.query(
+        Risk.risk_no, Risk.title, Risk.type, Risk.contract_id, Contract.name
+    ).join(Contract, Contract.id == Risk.contract_id).filter(
+        Risk.user_id == current_user.id, Risk.status == 'pending'
+    ).order_by(Contract.upload_date.desc(), Risk.contract_id.desc(), Risk.id).limit(3).all()
+
+    recent_risks_data = [
+        {
+            "id": r.risk_no,
+            "title": r.title or '未知风险',
+            "level": r.type or 'medium', # high, medium, low
+            "contract": r.name,
+            "contract_id": r.contract_id
+        }
+        for r in recent_risks
+    ]
     
     return {
         "stats": stats,
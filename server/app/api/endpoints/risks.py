@@ -1,139 +1,177 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks, Query
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
 from app.api import deps
 from app.models.user import User
 from app.models.contract import Contract
-from app.models.activity import Activity
+from app.services.activity_log import activity_log
+from app.schemas.risk import BulkRiskStatusUpdate
+from app.core.database import SessionLocal
+from app.services.risk_service import risk_service, VersionConflict, RISK_STATUSES, RISK_PAGE_MAX
+from app.services.report_cache import report_cache
+from app.services.dashboard_stats_service import dashboard_stats
 from datetime import datetime, timedelta
 
 router = APIRouter()
 
 @router.get("/")
 def get_risks(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    status: Optional[Literal['pending', 'processing', 'resolved']] = None,
+    type: Optional[Literal['high', 'medium', 'low']] = None,
+    category: Optional[str] = None,
+    contract_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    q: Optional[str] = Query(None, max_length=100),
+    limit: int = Query(50, ge=1, le=RISK_PAGE_MAX),
+    cursor: Optional[str] = None,
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_reader)
 ):
-    contracts = db.query(Contract).filter(Contract.user_id == current_user.id).all()
-    
-    all_risks = []
-    stats = {
-        "pending": 0,
-        "processing": 0,
-        "resolved": 0,
-        "new_this_month": 0
+    """
+    One page of the user's risks, filtered in SQL. Pass next_cursor back as
+    cursor for the following page; it is null on the last page.
+    """
+    filters = {
+        "status": status, "type": type, "category": category, "contract_id": contract_id,
+        "date_from": date_from, "date_to": date_to, "q": q,
     }
-    
-    now = datetime.utcnow()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    for contract in contracts:
-        if not contract.analysis_results:
-            continue
-            
-        results = contract.analysis_results
-        if isinstance(results, list):
-            for i, risk in enumerate(results):
-                # Ensure risk has necessary fields
-                if not isinstance(risk, dict):
-                    continue
-                
-                # Default status if not present
-                status = risk.get("status", "pending")
-                risk_type = risk.get("type", "medium")
-                
-                # Update stats
-                if status in stats:
-                    stats[status] += 1
-                
-                if contract.upload_date and contract.upload_date >= month_start:
-                    stats["new_this_month"] += 1
-
-                # Construct frontend-friendly risk object
-                # Use index as fallback for ID
-                risk_id = risk.get('id', i)
-                
-                risk_obj = {
-                    "id": f"{contract.id}_{risk_id}", # Unique combined ID
-                    "original_id": risk_id,
-                    "contract_id": contract.id,
-                    "title": risk.get("title", "Unknown Risk"),
-                    "contract": contract.name,
-                    "type": risk_type,
-                    "category": risk.get("category", "其他"),
-                    "status": status,
-                    "date": contract.upload_date.strftime("%Y-%m-%d") if contract.upload_date else now.strftime("%Y-%m-%d"),
-                    "aiConfidence": risk.get("aiConfidence", 90), # Mock confidence if missing
-                    "description": risk.get("description", ""),
-                    "suggestion": risk.get("suggestion", ""),
-                    "clause": risk.get("clause", "")
-                }
-                all_risks.append(risk_obj)
+    try:
+        risks, next_cursor = risk_service.list_risks(db, current_user.id, filters, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"risks": risks, "next_cursor": next_cursor}
 
+@router.get("/stats")
+def get_risk_stats(
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_reader)
+):
+    """
+    Risk center cards (running totals, change over the last 7 days) plus
+    type / category facet counts, cached briefly.
+    """
+    totals = dashboard_stats.totals(db, current_user.id)
+    week, _ = dashboard_stats.week_over_week(db, current_user.id)
+    new_this_month = dashboard_stats.new_this_month(db, current_user.id)["risks"]
+    status = {s: totals[f"risks_{s}"] for s in RISK_STATUSES}
+
+    facets = risk_service.stats(db, current_user.id)
+    facets.update(total=sum(status.values()), status=status, new_this_month=new_this_month)
     return {
         "stats": [
-            { "name": '待处理', "value": stats["pending"], "change": 0, "color": 'red' },
-            { "name": '处理中', "value": stats["processing"], "change": 0, "color": 'orange' },
-            { "name": '已解决', "value": stats["resolved"], "change": 0, "color": 'green' },
-            { "name": '本月新增', "value": stats["new_this_month"], "change": 0, "color": 'blue' },
+            { "name": '待处理', "value": status["pending"], "change": week["risks_pending"], "color": 'red' },
+            { "name": '处理中', "value": status["processing"], "change": week["risks_processing"], "color": 'orange' },
+            { "name": '已解决', "value": status["resolved"], "change": week["risks_resolved"], "color": 'green' },
+            { "name": '本月新增', "value": new_this_month, "change": week["new_risks"], "color": 'blue' },
         ],
-        "risks": all_risks
+        "facets": facets
     }
 
+def pregenerate_report(contract_id: int):
+    """Background task: re-render the report from the patched document."""
+    db = SessionLocal()
+    try:
+        contract = db.query(Contract.name, Contract.analysis_results).filter(Contract.id == contract_id).first()
+    finally:
+        db.close()
+    if contract:
+        report_cache.pregenerate_from_thread(contract.name, contract.analysis_results or [])
+
+def apply_status(db: Session, user: User, contract_id: int, risk_nos: List[int], status: str,
+                 expected_version: Optional[int]):
+    """Patch one contract's risks and its dashboard counters; 409 on a stale version."""
+    try:
+        previous, version = risk_service.patch_status(db, contract_id, risk_nos, status, expected_version)
+    except VersionConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail={
+            "message": "Contract was modified by someone else, reload and retry",
+            "contract_id": contract_id, "version": e.current_version,
+        })
+    for old_status in previous:
+        dashboard_stats.risk_status_changed(db, user.id, old_status, status)
+    return len(previous), version
+
+@router.patch("/status")
+def bulk_update_risk_status(
+    payload: BulkRiskStatusUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Set one status on many risks. One JSON_SET per contract, all in one
+    transaction: any version conflict rolls the whole request back.
+    """
+    by_contract: Dict[int, List[int]] = {}
+    for item in payload.items:
+        by_contract.setdefault(item.contract_id, []).append(item.risk_id)
+
+    contracts = dict(db.query(Contract.id, Contract.name).filter(
+        Contract.id.in_(by_contract), Contract.user_id == current_user.id
+    ).all())
+    missing = set(by_contract) - set(contracts)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Contracts not found: {sorted(missing)}")
+
+    updated, versions = 0, {}
+    # Fixed order so two bulk requests lock the same contracts in the same order
+    for contract_id in sorted(by_contract):
+        count, version = apply_status(
+            db, current_user, contract_id, by_contract[contract_id], payload.status,
+            payload.versions.get(contract_id)
+        )
+        updated += count
+        if version is not None:
+            versions[contract_id] = version
+    db.commit()
+    risk_service.invalidate_stats(current_user.id)
+
+    if updated:
+        action = "修复了" if payload.status == 'resolved' else "更新了"
+        activity_log.record(current_user, action, f"{updated} 个风险")
+        for contract_id in versions:
+            background_tasks.add_task(pregenerate_report, contract_id)
+    return {"updated": updated, "versions": versions}
+
 @router.patch("/{contract_id}/{risk_id}/status")
 def update_risk_status(
     contract_id: int,
     risk_id: int,
+    background_tasks: BackgroundTasks,
     status: str = Body(..., embed=True),
+    version: Optional[int] = Body(None, embed=True),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    contract = db.query(Contract).filter(Contract.id == contract_id, Contract.user_id == current_user.id).first()
+    """
+    Set a risk's status. Pass the contract version last seen to fail with 409
+    instead of applying the change on top of someone else's edit.
+    """
+    if status not in RISK_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+
+    contract = db.query(Contract.id, Contract.name).filter(
+        Contract.id == contract_id, Contract.user_id == current_user.id
+    ).first()
     if not contract:
         raise HTTPException(status_code=404, detail="Contract not found")
-    
-    if not contract.analysis_results or not isinstance(contract.analysis_results, list):
-         raise HTTPException(status_code=404, detail="No risks found for this contract")
-
-    updated = False
-    new_results = []
-    
-    # Create a deep copy or new list to ensure SQLAlchemy detects change
-    for risk in contract.analysis_results:
-        # Match by ID. Note: risk['id'] from AI might be int.
-        if isinstance(risk, dict) and risk.get('id') == risk_id:
-            risk['status'] = status
-            updated = True
-        new_results.append(risk)
-    
+
+    # Row locks on the matched risks keep the dashboard counters right when two
+    # reviewers change the same risk; the JSON is patched in place, never rewritten
+    updated, new_version = apply_status(db, current_user, contract_id, [risk_id], status, version)
     if not updated:
-        # Fallback: try matching by index if risk_id is large? 
-        # Actually, let's just rely on ID. If ID logic in get_risks uses index fallback, 
-        # we might have mismatch. But AI service generates IDs.
-        pass
+        raise HTTPException(status_code=404, detail="Risk not found")
 
-    if updated:
-        contract.analysis_results = new_results
-        # Also need to flag modified because it's JSON
-        from sqlalchemy.orm.attributes import flag_modified
-        flag_modified(contract, "analysis_results")
-        
-        db.commit()
-
-        # Log Activity
-        try:
-             action = "修复了" if status == 'resolved' else "更新了"
-             activity = Activity(
-                 user_id=current_user.id,
-                 user_name=current_user.full_name or current_user.email.split('@')[0],
-                 action=action,
-                 target=f"{contract.name} 中的风险"
-             )
-             db.add(activity)
-             db.commit()
-        except Exception as e:
-             print(f"Log error: {e}")
-        
-        return {"message": "Status updated"}
-    
-    raise HTTPException(status_code=404, detail="Risk not found")
+    db.commit()
+    risk_service.invalidate_stats(current_user.id)
+
+    # Log Activity
+    action = "修复了" if status == 'resolved' else "更新了"
+    activity_log.record(current_user, action, f"{contract.name} 中的风险")
+
+    # Re-render the report for the new statuses after the response is sent
+    background_tasks.add_task(pregenerate_report, contract_id)
+
+    return {"message": "Status updated", "version": new_version}
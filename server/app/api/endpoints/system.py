@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+
+from app.api import deps
+from app.core.database import engines
+from app.core.db_pool import pool_snapshot
+from app.models.user import User
+from app.services.user_cache import user_cache
+
+router = APIRouter()
+
+@router.get("/db/pool")
+def db_pool_stats(current_user: User = Depends(deps.get_current_user)):
+    """
+    Connection pool occupancy and checkout wait times of this worker, per engine.
+    """
+    return {name: pool_snapshot(engine) for name, engine in engines().items()}
+
+@router.get("/cache/users")
+def user_cache_stats(current_user: User = Depends(deps.get_current_user)):
+    """
+    Hit rate and size of this worker's token -> user cache.
+    """
+    return user_cache.snapshot()
@@ -1,100 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+from datetime import datetime
 from app.api import deps
 from app.models.user import User
-from app.models.contract import Contract
-from app.models.activity import Activity
 from app.core.security import get_password_hash
-import random
+from app.services.activity_log import activity_log
+from app.services.team_analytics_service import team_analytics, time_ago, TEAM_PAGE_MAX
 
 router = APIRouter()
 
+def parse_iso(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
 @router.get("/members")
 def get_members(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    response: Response,
+    q: Optional[str] = None,
+    sort: str = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(50, ge=1, le=TEAM_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_reader)
 ):
-    users = db.query(User).all()
-    members_data = []
-    
-    for user in users:
-        # Count contracts for this user
-        contract_count = db.query(Contract).filter(Contract.user_id == user.id).count()
-        
-        # Format last active
-        last_active_str = "从未登录"
-        if user.last_active:
-            diff = datetime.utcnow() - user.last_active
-            if diff.days > 0:
-                last_active_str = f"{diff.days} 天前"
-            elif diff.seconds > 3600:
-                last_active_str = f"{diff.seconds // 3600} 小时前"
-            elif diff.seconds > 60:
-                last_active_str = f"{diff.seconds // 60} 分钟前"
-            else:
-                last_active_str = "刚刚"
+    """
+    One page of members; the total is returned in X-Total-Count. Sort on
+    name, email, role, department, status, lastActive or contracts.
+    """
+    try:
+        page = team_analytics.members(db, q=q, sort=sort, order=order, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        members_data.append({
-            "id": user.id,
-            "name": user.full_name or user.email.split('@')[0],
-            "email": user.email,
-            "role": user.role,
-            "department": user.department,
-            "status": user.status,
-            "contracts": contract_count,
-            "lastActive": last_active_str,
-            "avatar": user.avatar
-        })
-    
-    return members_data
+    response.headers["X-Total-Count"] = str(page["total"])
+    now = datetime.utcnow()
+    # Cached rows carry timestamps; the relative strings are formatted per response
+    return [
+        {
+            **member,
+            "lastActive": time_ago(parse_iso(member["lastActiveAt"]), now),
+            "lastActivity": time_ago(parse_iso(member["lastActivityAt"]), now, never="暂无动态"),
+        }
+        for member in page["members"]
+    ]
 
 @router.get("/stats")
 def get_stats(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: Session = Depends(deps.get_read_db),
+    current_user: User = Depends(deps.get_current_reader)
 ):
-    total_members = db.query(User).count()
-    pending_review = db.query(User).filter(User.status == "pending").count()
-    admins = db.query(User).filter(User.role == "admin").count()
-    
-    now = datetime.utcnow()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    active_this_month = db.query(User).filter(User.last_active >= month_start).count()
-    
+    stats = team_analytics.stats(db)
     return [
-        { "name": '团队成员', "value": total_members, "color": 'blue' },
-        { "name": '待审核', "value": pending_review, "color": 'orange' },
-        { "name": '管理员', "value": admins, "color": 'purple' },
-        { "name": '本月活跃', "value": active_this_month, "color": 'green' },
+        { "name": '团队成员', "value": stats["members"], "color": 'blue' },
+        { "name": '待审核', "value": stats["pending"], "color": 'orange' },
+        { "name": '管理员', "value": stats["admins"], "color": 'purple' },
+        { "name": '本月活跃', "value": stats["active_this_month"], "color": 'green' },
     ]
 
 @router.get("/activities")
 def get_activities(
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_current_reader)
 ):
-    activities = db.query(Activity).order_by(Activity.timestamp.desc()).limit(10).all()
+    # Latest entries from the Redis list (rebuilt from the primary's table when missing)
+    activities = activity_log.recent(limit=10)
     result = []
+    now = datetime.utcnow()
     for act in activities:
-        # Format time
-        diff = datetime.utcnow() - act.timestamp
-        if diff.days > 0:
-            time_str = f"{diff.days} 天前"
-        elif diff.seconds > 3600:
-            time_str = f"{diff.seconds // 3600} 小时前"
-        elif diff.seconds > 60:
-            time_str = f"{diff.seconds // 60} 分钟前"
-        else:
-            time_str = "刚刚"
-            
         result.append({
-            "id": act.id,
-            "user": act.user_name,
-            "action": act.action,
-            "target": act.target,
-            "time": time_str
+            "id": act["event_id"],
+            "user": act["user_name"],
+            "action": act["action"],
+            "target": act["target"],
+            "time": time_ago(act["timestamp"], now)
         })
         
     return result
@@ -127,15 +105,9 @@ def invite_member(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    team_analytics.invalidate()
     
     # Log activity
-    activity = Activity(
-        user_id=current_user.id,
-        user_name=current_user.full_name or current_user.email,
-        action="邀请了",
-        target=email
-    )
-    db.add(activity)
-    db.commit()
+    activity_log.record(current_user, "邀请了", email)
     
     return {"message": "Invitation sent (simulated). User created with status pending."}
@@ -0,0 +1,167 @@
+import os
+import re
+from email.utils import formatdate
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.storage import StorageBackend, CHUNK_SIZE
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "Range: bytes=..." header into an inclusive (start, end).
+    Returns None when the header is absent or not something we serve partially
+    (multi-range, other units); raises ValueError when the range is unsatisfiable.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def content_disposition(filename: str) -> str:
+    # RFC 5987 form so Chinese contract names survive the header
+    return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+class ZeroCopyFileResponse(Response):
+    """
+    Send a byte range of a local file.
+    Uses the ASGI "http.response.zerocopysend" extension (os.sendfile) when the server
+    advertises it, otherwise falls back to chunked reads off the event loop.
+    """
+
+    def __init__(self, path: str, offset: int, count: int, status_code: int, headers: dict):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.offset = offset
+        self.count = count
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope.get("method") == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+                return
+
+            f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; terminate the body cleanly
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers etag."""
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")])
+
+
+async def storage_file_response(
+    request: Request,
+    storage: StorageBackend,
+    key: str,
+    filename: str,
+    media_type: str = "application/octet-stream",
+    etag: Optional[str] = None,
+) -> Response:
+    """
+    Build a download response for an object in storage with ETag/If-None-Match,
+    Range/If-Range and streaming (or zero-copy) bodies.
+    etag overrides the storage-derived one, e.g. with a content hash known up front.
+    """
+    # stat is a network round trip for S3 (head_object): keep it off the event loop
+    stat = await anyio.to_thread.run_sync(storage.stat, key)
+    if stat is None:
+        raise HTTPException(status_code=404, detail="File not found on server")
+    etag = etag or stat.etag
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": content_disposition(filename),
+    }
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), stat.size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{stat.size}"})
+
+    status_code = 200
+    start, end = 0, stat.size - 1
+    if byte_range:
+        status_code = 206
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+
+    if stat.size == 0:
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    local_path = storage.local_path(key)
+    if local_path:
+        x_accel_prefix = getattr(storage, "x_accel_prefix", None)
+        if x_accel_prefix:
+            # nginx does sendfile and Range itself from the internal location
+            rel = os.path.relpath(local_path, storage.root).replace(os.sep, "/")
+            offload_headers = {k: v for k, v in headers.items() if k not in ("Content-Length", "Content-Range")}
+            offload_headers["X-Accel-Redirect"] = f"{x_accel_prefix}/{quote(rel)}"
+            return Response(status_code=200, headers=offload_headers, media_type=media_type)
+
+        headers["Content-Type"] = media_type
+        return ZeroCopyFileResponse(local_path, start, end - start + 1, status_code, headers)
+
+    return StreamingResponse(
+        storage.iter_range(key, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
@@ -0,0 +1,80 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolWaitMetrics:
+    """Rolling window of how long checkouts waited for a connection."""
+
+    def __init__(self, window: int = 1000):
+        self._waits: Deque[float] = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        self.checkouts += 1
+        if timed_out:
+            self.timeouts += 1
+        self._waits.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 2)
+
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_p50_ms": percentile(0.50),
+            "wait_p95_ms": percentile(0.95),
+            "wait_max_ms": round(waits[-1] * 1000, 2) if waits else None,
+        }
+
+
+class _TimedMixin:
+    """Times QueuePool._do_get, i.e. the wait for a free (or new overflow) connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolWaitMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class TimedQueuePool(_TimedMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_snapshot(engine) -> Dict[str, Any]:
+    pool = engine.pool
+    snapshot = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        snapshot.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    metrics = getattr(pool, "metrics", None)
+    if metrics:
+        snapshot.update(metrics.snapshot())
+    return snapshot
@@ -0,0 +1,55 @@
+import os
+import logging
+
+from sqlalchemy import text
+
+# Set by gunicorn.conf.py once the master has run the startup tasks, so the
+# forked workers inherit it and skip them in their own lifespan.
+STARTUP_DONE_ENV = "NEXDOC_STARTUP_DONE"
+
+
+def startup_already_done() -> bool:
+    return os.getenv(STARTUP_DONE_ENV) == "1"
+
+
+def run_startup_tasks():
+    """
+    One-off deployment tasks: ensure tables exist, check DB connectivity and
+    make sure bcrypt works. Safe to run repeatedly; meant to run once per deployment.
+    """
+    from app.core.database import engine, Base, SessionLocal
+    from app.models import user, contract, activity, knowledge  # Import models to register them
+    from app.core import security
+
+    # 1. Create tables (if not exist)
+    try:
+        logging.info("Ensuring database tables exist...")
+        Base.metadata.create_all(bind=engine)
+    except Exception as e:
+        logging.info(f"Error creating tables: {e}")
+
+    # 2. Check Database Connection
+    try:
+        logging.info("Checking database connection...")
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT 1"))
+            logging.info("Database connection established.")
+        except Exception as e:
+            logging.info(f"Database warmup failed: {e}")
+        finally:
+            db.close()
+    except Exception as e:
+        logging.info(f"Database session creation failed: {e}")
+    finally:
+        # Never hand pooled connections from the gunicorn master to forked workers
+        engine.dispose()
+
+    # 3. Check Password Hashing (bcrypt)
+    try:
+        logging.info("Checking security module (bcrypt)...")
+        h = security.get_password_hash("warmup")
+        security.verify_password("warmup", h)
+        logging.info("Security module ready.")
+    except Exception as e:
+        logging.info(f"Security warmup failed: {e}")
@@ -0,0 +1,314 @@
+import os
+import io
+import hashlib
+import shutil
+import uuid
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional
+
+from dotenv import load_dotenv
+from app.utils.log_utils import log
+
+load_dotenv()
+
+# "local" keeps files on the app disk, "s3" targets any S3-compatible store (AWS, MinIO, OBS...)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "uploads")
+# Optional nginx offload for the local backend (internal location, e.g. "/protected-uploads")
+STORAGE_X_ACCEL_PREFIX = os.getenv("STORAGE_X_ACCEL_PREFIX", "").rstrip("/") or None
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # e.g. http://127.0.0.1:9000 for MinIO
+S3_BUCKET = os.getenv("S3_BUCKET", "nexdoc")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY") or None
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY") or None
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+# Cold tier for originals of contracts nobody opened in a while (see tiering_service)
+COLD_STORAGE_BACKEND = os.getenv("COLD_STORAGE_BACKEND", "local")
+COLD_STORAGE_LOCAL_ROOT = os.getenv("COLD_STORAGE_LOCAL_ROOT", "cold_uploads")
+COLD_S3_BUCKET = os.getenv("COLD_S3_BUCKET", "nexdoc-cold")
+# e.g. STANDARD_IA / GLACIER_IR on AWS; empty = bucket default
+COLD_S3_STORAGE_CLASS = os.getenv("COLD_S3_STORAGE_CLASS") or None
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ObjectStat:
+    size: int
+    mtime: float
+    etag: str  # Quoted, ready to be used as an HTTP ETag header
+
+
+class HashingReader:
+    """File-like wrapper that computes the SHA-256 of everything read through it."""
+
+    def __init__(self, fileobj: BinaryIO):
+        self._fileobj = fileobj
+        self._hasher = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self._hasher.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+
+def storage_key_for(filename: Optional[str], prefix: str = "") -> str:
+    """
+    New unique storage key for a client-supplied filename: only its basename is
+    kept, behind a random id so same-named uploads never overwrite each other.
+    Raises ValueError for names with nothing usable left.
+    """
+    name = (filename or "").replace("\\", "/").rsplit("/", 1)[-1]
+    name = "".join(ch for ch in name if ch.isprintable()).strip()
+    if not name or name in (".", ".."):
+        raise ValueError(f"Invalid filename: {filename!r}")
+    return f"{prefix}{uuid.uuid4().hex}_{name}"
+
+
+class StorageBackend(ABC):
+    """
+    Minimal object-storage interface.
+    Keys are flat relative names (e.g. "<uuid hex>_合同.pdf", see storage_key_for); they are what
+    Contract.file_path stores.
+    """
+
+    @abstractmethod
+    def save(self, key: str, fileobj: BinaryIO) -> int:
+        """Stream fileobj into the store under key. Returns the stored size in bytes."""
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        """Return size/mtime/etag of key, or None if it does not exist."""
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield the bytes of key from start to end (inclusive) in chunks."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key; a missing key is not an error."""
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def put_bytes(self, key: str, data: bytes) -> int:
+        return self.save(key, io.BytesIO(data))
+
+    def get_bytes(self, key: str) -> bytes:
+        return b"".join(self.iter_range(key))
+
+    def sha256(self, key: str) -> str:
+        hasher = hashlib.sha256()
+        for chunk in self.iter_range(key):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Absolute path on this host if the object lives on local disk, else None."""
+        return None
+
+    @contextmanager
+    def local_copy(self, key: str):
+        """
+        Yield a local file path for key.
+        Parsers (pypdf, unstructured) need a real file; remote objects are
+        streamed to a temp file that is removed afterwards.
+        """
+        path = self.local_path(key)
+        if path:
+            yield path
+            return
+
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.iter_range(key):
+                    f.write(chunk)
+            yield tmp_path
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str, x_accel_prefix: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.x_accel_prefix = x_accel_prefix
+        # Rows written before the storage layer stored "uploads/<name>" instead of a bare key
+        self._legacy_prefix = root.replace("\\", "/").rstrip("/") + "/"
+        os.makedirs(self.root, exist_ok=True)
+
+    def _resolve(self, key: str) -> str:
+        rel = key.replace("\\", "/")
+        if rel.startswith(self._legacy_prefix):
+            rel = rel[len(self._legacy_prefix):]
+        path = os.path.abspath(os.path.join(self.root, rel))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def save(self, key: str, fileobj: BinaryIO) -> int:
+        path = self._resolve(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write next to the target and rename, so readers never see a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(fileobj, f, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return os.path.getsize(path)
+
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        try:
+            st = os.stat(self._resolve(key))
+        except (OSError, ValueError):
+            return None
+        return ObjectStat(
+            size=st.st_size,
+            mtime=st.st_mtime,
+            etag=f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        )
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self._resolve(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = f.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        path = self._resolve(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def local_path(self, key: str) -> Optional[str]:
+        try:
+            path = self._resolve(key)
+        except ValueError:
+            return None
+        return path if os.path.exists(path) else None
+
+
+class S3Storage(StorageBackend):
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 region: Optional[str] = None, storage_class: Optional[str] = None):
+        # boto3 is only required when the S3 backend is enabled
+        import boto3
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.extra_args = {"StorageClass": storage_class} if storage_class else None
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+            # Path-style addressing is what MinIO and most self-hosted stores expect
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"})
+        )
+        try:
+            self.client.head_bucket(Bucket=bucket)
+        except ClientError:
+            log.info(f"Bucket {bucket} not found, creating it")
+            self.client.create_bucket(Bucket=bucket)
+
+    def save(self, key: str, fileobj: BinaryIO) -> int:
+        # upload_fileobj streams in multipart chunks instead of buffering the whole file
+        self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=self.extra_args)
+        return self.stat(key).size
+
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except self._client_error:
+            return None
+        return ObjectStat(
+            size=head["ContentLength"],
+            mtime=head["LastModified"].timestamp(),
+            etag=head["ETag"]
+        )
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        kwargs = {"Bucket": self.bucket, "Key": key}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(**kwargs)["Body"]
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+class StorageFactory:
+    _instance = None
+    _cold_instance = None
+
+    @staticmethod
+    def _create(backend: str, local_root: str, bucket: str, storage_class: Optional[str] = None,
+                x_accel_prefix: Optional[str] = None) -> StorageBackend:
+        if backend == "s3":
+            storage = S3Storage(
+                bucket=bucket,
+                endpoint_url=S3_ENDPOINT_URL,
+                access_key=S3_ACCESS_KEY,
+                secret_key=S3_SECRET_KEY,
+                region=S3_REGION,
+                storage_class=storage_class
+            )
+            log.info(f"Using S3 storage: bucket={bucket}, endpoint={S3_ENDPOINT_URL}")
+        else:
+            storage = LocalStorage(local_root, x_accel_prefix=x_accel_prefix)
+            log.info(f"Using local storage at {storage.root}")
+        return storage
+
+    @classmethod
+    def get_instance(cls) -> StorageBackend:
+        if cls._instance is None:
+            cls._instance = cls._create(
+                STORAGE_BACKEND, STORAGE_LOCAL_ROOT, S3_BUCKET, x_accel_prefix=STORAGE_X_ACCEL_PREFIX
+            )
+        return cls._instance
+
+    @classmethod
+    def get_cold_instance(cls) -> StorageBackend:
+        if cls._cold_instance is None:
+            cls._cold_instance = cls._create(
+                COLD_STORAGE_BACKEND, COLD_STORAGE_LOCAL_ROOT, COLD_S3_BUCKET, storage_class=COLD_S3_STORAGE_CLASS
+            )
+        return cls._cold_instance
+
+
+def get_storage() -> StorageBackend:
+    return StorageFactory.get_instance()
+
+
+def get_cold_storage() -> StorageBackend:
+    return StorageFactory.get_cold_instance()
@@ -6,63 +6,53 @@ import platform
 if platform.system() == 'Windows':
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import os
 from contextlib import asynccontextmanager
-from sqlalchemy import text
 
 # Load environment variables
 load_dotenv()
 
 from app.api.api import api_router
-from app.core.database import engine, Base, SessionLocal
-from app.models import user, contract, activity  # Import models to register them
-from app.core import security
+from app.core.startup import run_startup_tasks, startup_already_done
+from app.core.database import async_engine, replica_engines, mark_primary
+from app.api.deps import request_subject
+from app.services.activity_log import activity_log
+from app.services.pdf_parser import PdfParsePool
+from app.services.ocr_service import OcrPool
+from app.services.browser_pool import BROWSER_POOL_PRELAUNCH, get_browser_pool
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Warmup tasks
-    logging.info("--- Startup: Warming up resources ---")
-    
-    # 1. Create tables (if not exist)
-    try:
-        logging.info("Ensuring database tables exist...")
-        Base.metadata.create_all(bind=engine)
-    except Exception as e:
-        logging.info(f"Error creating tables: {e}")
+    # Startup: under gunicorn the master already ran these (see gunicorn.conf.py);
+    # with plain uvicorn (development) run them here.
+    if startup_already_done():
+        logging.info("--- Startup: tasks already run by the master process ---")
+    else:
+        logging.info("--- Startup: Running startup tasks ---")
+        run_startup_tasks()
+        logging.info("--- Startup: Complete ---")
 
-    # 2. Warmup Database Connection
-    try:
-        logging.info("Warming up database connection...")
-        db = SessionLocal()
+    if BROWSER_POOL_PRELAUNCH:
         try:
-            db.execute(text("SELECT 1"))
-            logging.info("Database connection established.")
+            await get_browser_pool().start()
         except Exception as e:
-            logging.info(f"Database warmup failed: {e}")
-        finally:
-            db.close()
-    except Exception as e:
-        logging.info(f"Database session creation failed: {e}")
-
-    # 3. Warmup Password Hashing (bcrypt)
-    try:
-        logging.info("Warming up security module (bcrypt)...")
-        # Perform a dummy hash and verify to load libraries
-        h = security.get_password_hash("warmup")
-        security.verify_password("warmup", h)
-        logging.info("Security module ready.")
-    except Exception as e:
-        logging.info(f"Security warmup failed: {e}")
-
-    logging.info("--- Startup: Complete ---")
+            # Exports retry the launch lazily; the API itself must still come up
+            logging.error(f"Browser pool failed to start: {e}")
     
     yield
     
     # Shutdown logic (if any)
     logging.info("--- Shutdown ---")
+    PdfParsePool.shutdown()
+    OcrPool.shutdown()
+    await get_browser_pool().shutdown()
+    # Write buffered activity events before the worker exits
+    activity_log.shutdown()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="NexDoc AI API",
@@ -89,6 +79,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    # After a successful write, that user's dashboard reads stay on the primary for a few seconds
+    response = await call_next(request)
+    if replica_engines and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        subject = request_subject(request)
+        if subject:
+            # Sync Redis client: keep it off the event loop
+            await run_in_threadpool(mark_primary, subject)
+    return response
+
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/")
@@ -1,4 +1,6 @@
 from .user import User
-from .contract import Contract
+from .contract import Contract, ContractColdResults
 from .activity import Activity
 from .knowledge import KnowledgeArticle
+from .risk import Risk
+from .stats import UserStats, UserDailyStats, UserFolderStats
@@ -12,3 +12,4 @@ class Activity(Base):
     action = Column(String(100)) # e.g. "上传了", "审核了"
     target = Column(String(255)) # e.g. "Contract Name"
     timestamp = Column(DateTime, default=datetime.utcnow)
+    event_id = Column(String(32)) # Id handed out by activity_log before the row exists
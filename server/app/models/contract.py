@@ -1,15 +1,21 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, BigInteger, Index, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
 
 class Contract(Base):
     __tablename__ = "contracts"
+    __table_args__ = (
+        # Covers SUM(file_size_bytes) per user and per folder (contract_type)
+        Index("ix_contracts_user_type_size", "user_id", "contract_type", "file_size_bytes"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     file_path = Column(String(512), nullable=False)  # Local storage path
-    file_size = Column(String(50))
+    file_size_bytes = Column(BigInteger, nullable=False, default=0)  # Formatted only in responses
+    file_hash = Column(String(64), index=True, nullable=True)  # SHA-256 of the original, keys the text artifact
     upload_date = Column(DateTime, default=datetime.utcnow)
     status = Column(String(50), default="uploading")  # uploading, analyzing, analyzed, failed
     contract_type = Column(String(100), nullable=True) # e.g., "Service Agreement"
@@ -19,10 +25,28 @@ class Contract(Base):
     
     # Full analysis results
     analysis_results = Column(JSON, default=[])
+    # Bumped on every write to analysis_results; clients send it back for optimistic concurrency
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Hot/cold tiering: "cold" analysis_results live zstd-compressed in contract_cold_results
+    # (the column is NULL), cold originals in the cold storage backend under the same key
+    results_tier = Column(String(10), nullable=False, default="hot", server_default="hot")
+    file_tier = Column(String(10), nullable=False, default="hot", server_default="hot")
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)  # Drives the tiering job
 
     user_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="contracts")
 
+class ContractColdResults(Base):
+    """Compressed analysis_results of a contract moved to the cold tier."""
+    __tablename__ = "contract_cold_results"
+
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String(10), nullable=False)  # zstd (zlib when the zstandard package is missing)
+    payload = Column(LargeBinary().with_variant(LONGBLOB(), "mysql"), nullable=False)
+    raw_bytes = Column(Integer, nullable=False)  # Size of the JSON before compression
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 # Update User model to include relationship
 from app.models.user import User
 User.contracts = relationship("Contract", back_populates="owner")
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
+from datetime import datetime
+from app.core.database import Base
+
+class Risk(Base):
+    """
+    One row per analysed risk. Contract.analysis_results stays the document the
+    reports are rendered from; this table is what lists, filters and stats query.
+    """
+    __tablename__ = "risks"
+    __table_args__ = (
+        Index("ix_risks_user_status", "user_id", "status"),
+        Index("ix_risks_user_created", "user_id", "created_at", "id"),  # Keyset pagination order
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Owner of the contract (NULL for demo uploads)
+    risk_no = Column(Integer, nullable=False)  # The risk's "id" inside analysis_results
+    json_index = Column(Integer, nullable=True)  # Position inside analysis_results, for JSON_SET patches
+    type = Column(String(20), index=True, default="medium")  # high, medium, low
+    category = Column(String(100), default="其他")
+    status = Column(String(20), default="pending")  # pending, processing, resolved
+    title = Column(String(255))
+    description = Column(Text)
+    suggestion = Column(Text)
+    clause = Column(Text)
+    clause_id = Column(String(64), nullable=True)  # Clause tree id from the segmenter
+    clause_start = Column(Integer, nullable=True)  # Offsets into the contract text
+    clause_end = Column(Integer, nullable=True)
+    ai_confidence = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)  # Upload date of the contract
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, BigInteger, Float
+from datetime import datetime
+from app.core.database import Base
+
+class UserStats(Base):
+    """
+    Running dashboard totals per user, adjusted in the same transaction as the
+    change they count (upload, delete, analysis, risk status).
+    """
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    contracts = Column(Integer, default=0, nullable=False)
+    analyzed = Column(Integer, default=0, nullable=False)
+    storage_bytes = Column(BigInteger, default=0, nullable=False)
+    upload_ts_sum = Column(BigInteger, default=0, nullable=False)  # Sum of upload timestamps: average age without a scan
+    risks_pending = Column(Integer, default=0, nullable=False)
+    risks_processing = Column(Integer, default=0, nullable=False)
+    risks_resolved = Column(Integer, default=0, nullable=False)
+    analysis_seconds = Column(Float, default=0, nullable=False)
+    analysis_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserDailyStats(Base):
+    """
+    Net change of each UserStats counter per day, for period-over-period deltas.
+    uploads / new_risks are booked on the contract's upload day (and taken back
+    from it on delete), so summing them gives "new this month" exactly.
+    """
+    __tablename__ = "user_daily_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    contracts = Column(Integer, default=0, nullable=False)
+    analyzed = Column(Integer, default=0, nullable=False)
+    storage_bytes = Column(BigInteger, default=0, nullable=False)
+    risks_pending = Column(Integer, default=0, nullable=False)
+    risks_processing = Column(Integer, default=0, nullable=False)
+    risks_resolved = Column(Integer, default=0, nullable=False)
+    analysis_seconds = Column(Float, default=0, nullable=False)
+    analysis_count = Column(Integer, default=0, nullable=False)
+    uploads = Column(Integer, default=0, nullable=False)
+    new_risks = Column(Integer, default=0, nullable=False)
+
+class UserFolderStats(Base):
+    """Contract count and size per archive folder (contract_type)."""
+    __tablename__ = "user_folder_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    name = Column(String(100), primary_key=True)
+    contracts = Column(Integer, default=0, nullable=False)
+    storage_bytes = Column(BigInteger, default=0, nullable=False)
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import List, Optional, Literal, Dict
 from datetime import datetime
 
+from app.utils.file_size import format_size
+
 class AnalysisResult(BaseModel):
     id: int
     title: str
@@ -28,14 +30,35 @@ class ContractBase(BaseModel):
 class ContractCreate(ContractBase):
     pass
 
-class Contract(ContractBase):
+class ContractSummary(ContractBase):
+    """List view: no analysis_results (the list query doesn't load that column)."""
     id: int
-    file_size: str
+    file_size_bytes: int = 0
     upload_date: datetime
     status: str
     risk_summary: Dict[str, int] = {}
-    analysis_results: List[AnalysisResult] = []
+
+    @computed_field
+    @property
+    def file_size(self) -> str:
+        return format_size(self.file_size_bytes, 2)
     
     class Config:
         from_attributes = True
 
+class Contract(ContractSummary):
+    analysis_results: List[AnalysisResult] = []
+
+
+class BatchExportFilter(BaseModel):
+    status: Optional[str] = None
+    contract_type: Optional[str] = None
+    risk_level: Optional[Literal['high', 'medium', 'low']] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    keyword: Optional[str] = None
+
+class BatchExportRequest(BaseModel):
+    contract_ids: Optional[List[int]] = None
+    filters: Optional[BatchExportFilter] = None
+    format: Literal['pdf', 'zip'] = 'pdf'
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal
+
+class RiskRef(BaseModel):
+    contract_id: int
+    risk_id: int
+
+class BulkRiskStatusUpdate(BaseModel):
+    status: Literal['pending', 'processing', 'resolved']
+    items: List[RiskRef] = Field(..., min_length=1, max_length=500)
+    # contract_id -> version the client last saw; contracts left out are not version-checked
+    versions: Dict[int, int] = {}
@@ -0,0 +1,211 @@
+import os
+import json
+import atexit
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import insert
+
+from app.core.database import SessionLocal
+from app.core.redis import get_redis_client
+from app.models.activity import Activity
+from app.utils.log_utils import log
+
+# Milliseconds between flushes of the in-process buffer
+ACTIVITY_FLUSH_MS = int(os.getenv("ACTIVITY_FLUSH_MS", 500))
+# Rows per multi-row INSERT
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", 200))
+# Latest entries kept in the Redis list behind /team/activities
+ACTIVITY_RECENT_MAX = 50
+
+_RECENT_KEY = "activity:recent"
+# Bumped before and after every flush: a rebuild of the list that overlaps one is retried
+_VERSION_KEY = "activity:recent:version"
+
+
+class ActivityLog:
+    """
+    Write-behind activity log. record() only appends to an in-process buffer (no
+    I/O, safe on the event loop); a daemon thread writes the buffer to the
+    activities table in multi-row INSERTs every ACTIVITY_FLUSH_MS and then pushes
+    the batch onto the Redis "recent" list. A failed batch goes back to the buffer,
+    and shutdown() drains it, so every event is written at least once unless the
+    process is killed.
+    """
+
+    def __init__(self):
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    # --- Write ---
+
+    def record(self, user, action: str, target: str):
+        """user: the acting User (id, full_name, email)."""
+        event = {
+            "event_id": uuid.uuid4().hex,
+            "user_id": user.id,
+            "user_name": user.full_name or user.email.split('@')[0],
+            "action": action,
+            "target": (target or "")[:255],
+            "timestamp": datetime.utcnow(),
+        }
+        with self._lock:
+            self._buffer.append(event)
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Started lazily (and again after a fork) so the gunicorn master never owns it
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="activity-log", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(ACTIVITY_FLUSH_MS / 1000)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered so far. Returns the number of rows inserted."""
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self._buffer.popleft() for _ in range(min(ACTIVITY_BATCH_SIZE, len(self._buffer)))]
+            if not batch:
+                return written
+            self._bump_version()
+            try:
+                self._insert(batch)
+            except Exception as e:
+                log.error(f"Activity flush failed, {len(batch)} events requeued: {e}")
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch))
+                return written
+            written += len(batch)
+            self._push_recent(batch)
+
+    @staticmethod
+    def _insert(batch: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(Activity), [
+                {k: event[k] for k in ("event_id", "user_id", "user_name", "action", "target", "timestamp")}
+                for event in batch
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+    def shutdown(self):
+        """Stop the flusher and write what is left (call on worker shutdown)."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        written = self.flush()
+        if written:
+            log.info(f"Activity log: flushed {written} events on shutdown")
+
+    # --- Read ---
+
+    @staticmethod
+    def _encode(event: Dict[str, Any]) -> str:
+        return json.dumps({**event, "timestamp": event["timestamp"].isoformat()}, ensure_ascii=False)
+
+    @staticmethod
+    def _bump_version():
+        redis_client = get_redis_client()
+        if not redis_client:
+            return
+        try:
+            redis_client.incr(_VERSION_KEY)
+        except RedisError as e:
+            log.error(f"Activity recent list version not bumped: {e}")
+
+    def _push_recent(self, batch: List[Dict[str, Any]]):
+        """Prepend a written batch (oldest first) to the recent list; runs on the flusher thread."""
+        redis_client = get_redis_client()
+        if not redis_client:
+            return
+        try:
+            # MULTI: the version bump and the push are one step for a concurrent rebuild.
+            # LPUSHX leaves a missing list alone; the next read rebuilds it from the table.
+            pipe = redis_client.pipeline()
+            pipe.incr(_VERSION_KEY)
+            pipe.lpushx(_RECENT_KEY, *[self._encode(event) for event in batch])
+            pipe.ltrim(_RECENT_KEY, 0, ACTIVITY_RECENT_MAX - 1)
+            pipe.execute()
+        except RedisError as e:
+            # The rows are in the table; drop the list so the next read rebuilds it
+            log.error(f"Activity recent list not updated: {e}")
+            try:
+                redis_client.delete(_RECENT_KEY)
+            except RedisError:
+                pass
+
+    @staticmethod
+    def _load_recent() -> List[Dict[str, Any]]:
+        # Always the primary: a replica may not have the latest batches yet
+        db = SessionLocal()
+        try:
+            rows = db.query(Activity).order_by(
+                Activity.timestamp.desc(), Activity.id.desc()
+            ).limit(ACTIVITY_RECENT_MAX).all()
+        finally:
+            db.close()
+        return [
+            {"event_id": row.event_id or str(row.id), "user_id": row.user_id, "user_name": row.user_name,
+             "action": row.action, "target": row.target, "timestamp": row.timestamp}
+            for row in rows
+        ]
+
+    def recent(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Latest events, newest first: the Redis list, (re)built from the table when missing."""
+        limit = min(limit, ACTIVITY_RECENT_MAX)
+        redis_client = get_redis_client()
+        if redis_client:
+            cached = redis_client.lrange(_RECENT_KEY, 0, limit - 1)
+            if cached:
+                events = [json.loads(item) for item in cached]
+                for event in events:
+                    event["timestamp"] = datetime.fromisoformat(event["timestamp"])
+                return events
+
+        self.flush()  # so the table includes anything still buffered in this worker
+        if not redis_client:
+            return self._load_recent()[:limit]
+        for _ in range(3):
+            try:
+                with redis_client.pipeline() as pipe:
+                    # Any flush between WATCH and EXEC bumps the version and aborts the rebuild,
+                    # so a batch can't land in the table after the query yet miss the list
+                    pipe.watch(_VERSION_KEY)
+                    events = self._load_recent()
+                    pipe.multi()
+                    pipe.delete(_RECENT_KEY)
+                    if events:
+                        pipe.rpush(_RECENT_KEY, *[self._encode(event) for event in events])
+                    pipe.execute()
+                return events[:limit]
+            except WatchError:
+                continue
+        # Flushes keep racing us: serve from the table, the next read tries again
+        return self._load_recent()[:limit]
+
+activity_log = ActivityLog()
+# Last resort for processes that never run the FastAPI lifespan (scripts, killed reloaders)
+atexit.register(activity_log.shutdown)
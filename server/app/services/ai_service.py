@@ -1,22 +1,41 @@
 import asyncio
+import concurrent.futures
 import json
 import os
+import threading
 from typing import List, Dict, Any, TypedDict, Annotated
-from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app.services.file_parser import FileParser
+from app.services.text_artifact_service import text_artifact_service
+from app.services.clause_segmenter import ClauseChunker, locate_risk, split_clauses
+from app.services.file_parser import PAGE_SEPARATOR
 from app.utils.llm_factory import LLMFactory
 from app.utils.log_utils import log
 
+# "batch": parse -> split -> map strictly in sequence
+# "streaming": pages, chunks and map calls overlap through bounded queues
+ANALYSIS_PIPELINE_MODE = os.getenv("ANALYSIS_PIPELINE_MODE", "batch")
+PIPELINE_PAGE_QUEUE_SIZE = int(os.getenv("PIPELINE_PAGE_QUEUE_SIZE", 8))
+PIPELINE_CHUNK_QUEUE_SIZE = int(os.getenv("PIPELINE_CHUNK_QUEUE_SIZE", 4))
+# Max in-flight map-stage LLM calls in streaming mode
+PIPELINE_MAP_CONCURRENCY = int(os.getenv("PIPELINE_MAP_CONCURRENCY", 8))
+TYPE_SAMPLE_CHARS = 3000
+
+_END_OF_STREAM = object()
+
+
+def _messages(system: str, human: str):
+    # langchain is imported on first LLM call, not when the API module loads
+    from langchain_core.messages import SystemMessage, HumanMessage
+    return [SystemMessage(content=system), HumanMessage(content=human)]
+
 
 # 定义 State 类型
 class AgentState(TypedDict):
-    file_path: str
+    file_path: str  # Storage key of the original file
+    file_hash: str
     contract_text: str
     contract_type: str
-    text_chunks: List[str]
+    text_chunks: List[Any]  # ClauseChunk
+    clauses: Any  # ClauseSegmenter: clause tree of contract_text
     chunk_risks: List[Dict[str, Any]]
     risks: List[Dict[str, Any]]
     error: str
@@ -51,8 +70,21 @@ class AIService:
 
     def _build_graph(self):
         """Build the LangGraph workflow."""
+        from langgraph.graph import StateGraph, END
+
         workflow = StateGraph(AgentState)
 
+        if ANALYSIS_PIPELINE_MODE == "streaming":
+            workflow.add_node("stream_map", self._stream_map_node)
+            workflow.add_node("reduce_risks", self._reduce_risks_node)
+            workflow.add_node("validate_format", self._validate_format_node)
+
+            workflow.set_entry_point("stream_map")
+            workflow.add_edge("stream_map", "reduce_risks")
+            workflow.add_edge("reduce_risks", "validate_format")
+            workflow.add_edge("validate_format", END)
+            return workflow.compile()
+
         # Define nodes
         workflow.add_node("parse_file", self._parse_file_node)
         workflow.add_node("identify_type", self._identify_type_node)
@@ -73,14 +105,14 @@ class AIService:
         return workflow.compile()
 
     def _parse_file_node(self, state: AgentState):
-        """Node: Parse file content using FileParser."""
+        """Node: Load the persisted text artifact, parsing the file only on first use."""
         log.info("--- Node: Parsing File ---")
         self._check_cancel(state)
         self._update_progress(state, 10)
         file_path = state["file_path"]
         
         try:
-            text = FileParser.extract_text(file_path)
+            text = text_artifact_service.get_document(file_path, state.get("file_hash") or None).text
             if not text:
                 return {"error": f"Failed to extract text from {file_path}", "contract_text": ""}
             self._update_progress(state, 20)
@@ -100,8 +132,19 @@ class AIService:
             
         text = state["contract_text"]
         # Use first 3000 chars for identification
-        sample_text = text[:3000]
+        sample_text = text[:TYPE_SAMPLE_CHARS]
         
+        try:
+            response = self.llm.invoke(self._type_messages(sample_text))
+            contract_type = self._clean_contract_type(response.content)
+            log.info(f"Identified contract type: {contract_type}")
+            return {"contract_type": contract_type}
+            
+        except Exception as e:
+            log.info(f"Error identifying contract type: {e}")
+            return {"contract_type": "未知类型"}
+
+    def _type_messages(self, sample_text: str):
         prompt = f"""
         请根据以下合同文本的前半部分，判断该合同的类型。
         
@@ -112,24 +155,14 @@ class AIService:
         如果无法判断，请输出 "通用合同"。
         不要输出任何其他解释性文字。
         """
-        
-        try:
-            response = self.llm.invoke([
-                SystemMessage(content="You are a helpful legal assistant."),
-                HumanMessage(content=prompt)
-            ])
-            
-            contract_type = response.content.strip().replace('"', '').replace("'", "")
-            # Basic cleanup
-            if len(contract_type) > 20 or "\n" in contract_type:
-                contract_type = "通用合同"
-                
-            log.info(f"Identified contract type: {contract_type}")
-            return {"contract_type": contract_type}
-            
-        except Exception as e:
-            log.info(f"Error identifying contract type: {e}")
-            return {"contract_type": "未知类型"}
+        return _messages("You are a helpful legal assistant.", prompt)
+
+    def _clean_contract_type(self, content: str) -> str:
+        contract_type = content.strip().replace('"', '').replace("'", "")
+        # Basic cleanup
+        if len(contract_type) > 20 or "\n" in contract_type:
+            contract_type = "通用合同"
+        return contract_type
 
     def _split_text_node(self, state: AgentState):
         """Node: Split text into chunks."""
@@ -140,19 +173,11 @@ class AIService:
             return {"text_chunks": []}
             
         text = state["contract_text"]
-        # Use a large chunk size to fit context but allow parallel processing
-        # 10k characters is roughly 5k-7k tokens depending on language (Chinese is denser)
-        # Moonshot-8k can handle ~8k tokens. 
-        # Safe bet: 6000 chars with overlap.
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=6000,
-            chunk_overlap=1000,
-            separators=["\n\n", "\n", "。", "；", ".", ";", " ", ""]
-        )
-        chunks = splitter.split_text(text)
-        log.info(f"Split text into {len(chunks)} chunks.")
+        # Whole clauses packed into the token budget, no overlap
+        chunks, segmenter = split_clauses(text)
+        log.info(f"Split text into {len(segmenter.clauses)} clauses, {len(chunks)} chunks.")
         self._update_progress(state, 30)
-        return {"text_chunks": chunks}
+        return {"text_chunks": chunks, "clauses": segmenter}
 
     async def _map_risks_node(self, state: AgentState):
         """Node: Analyze each chunk in parallel."""
@@ -167,29 +192,7 @@ class AIService:
              return {"chunk_risks": []}
 
         # Prepare batch prompts
-        prompts = []
-        for i, chunk in enumerate(chunks):
-            prompt_content = f"""
-            你是一个专业的法律合同审查智能体。请分析以下合同文本片段（这是完整合同的一部分），识别其中的法律风险点。
-            
-            合同文本片段 ({i+1}/{len(chunks)})：
-            {chunk}
-            
-            请输出 JSON 格式的结果，包含一个列表，每个元素包含以下字段：
-            - title: 风险标题 (简短)
-            - type: 风险等级 (只能是 "high", "medium", "low" 之一)
-            - category: 风险类别
-            - description: 详细的风险描述
-            - suggestion: 修改建议
-            - clause: 相关的原文条款片段
-            
-            如果该片段中没有明显的法律风险，请返回空列表 []。
-            请只输出纯 JSON 数组，不要包含 markdown ```json 标记。
-            """
-            prompts.append([
-                SystemMessage(content="You are a helpful legal assistant that outputs raw JSON."),
-                HumanMessage(content=prompt_content)
-            ])
+        prompts = [self._chunk_messages(chunk.annotated(), f"{i+1}/{len(chunks)}") for i, chunk in enumerate(chunks)]
 
         try:
             self._check_cancel(state)
@@ -209,20 +212,9 @@ class AIService:
             self._update_progress(state, 75)
             
             all_chunk_risks = []
-            for response in responses:
-                content = response.content
-                # Cleanup
-                if content.startswith("```json"):
-                    content = content[7:]
-                if content.endswith("```"):
-                    content = content[:-3]
-                try:
-                    risks = json.loads(content)
-                    if isinstance(risks, list):
-                        all_chunk_risks.extend(risks)
-                except json.JSONDecodeError:
-                    log.info(f"Failed to parse JSON from chunk response: {content[:100]}...")
-                    continue
+            for chunk, response in zip(chunks, responses):
+                for risk in self._parse_chunk_response(response.content):
+                    all_chunk_risks.append(locate_risk(risk, state["contract_text"], state["clauses"], chunk))
             
             return {"chunk_risks": all_chunk_risks}
         
@@ -232,6 +224,177 @@ class AIService:
             log.info(f"Error in map_risks: {e}")
             return {"error": str(e), "chunk_risks": []}
 
+    def _chunk_messages(self, chunk: str, position: str):
+        prompt_content = f"""
+            你是一个专业的法律合同审查智能体。请分析以下合同文本片段（这是完整合同的一部分），识别其中的法律风险点。
+            片段中每个条款前的【编号】是系统添加的条款 ID，不属于原文。
+            
+            合同文本片段 ({position})：
+            {chunk}
+            
+            请输出 JSON 格式的结果，包含一个列表，每个元素包含以下字段：
+            - title: 风险标题 (简短)
+            - type: 风险等级 (只能是 "high", "medium", "low" 之一)
+            - category: 风险类别
+            - description: 详细的风险描述
+            - suggestion: 修改建议
+            - clause: 相关的原文条款片段（逐字引用原文，不要包含【编号】）
+            - clause_id: 该片段所在条款的 ID（即【】中的编号）
+            
+            如果该片段中没有明显的法律风险，请返回空列表 []。
+            请只输出纯 JSON 数组，不要包含 markdown ```json 标记。
+            """
+        return _messages("You are a helpful legal assistant that outputs raw JSON.", prompt_content)
+
+    def _parse_chunk_response(self, content: str) -> List[Dict[str, Any]]:
+        # Cleanup
+        if content.startswith("```json"):
+            content = content[7:]
+        if content.endswith("```"):
+            content = content[:-3]
+        try:
+            risks = json.loads(content)
+            if isinstance(risks, list):
+                return risks
+        except json.JSONDecodeError:
+            log.info(f"Failed to parse JSON from chunk response: {content[:100]}...")
+        return []
+
+    async def _stream_map_node(self, state: AgentState):
+        """
+        Node (streaming mode): parse, chunk and map concurrently.
+        A parser thread feeds pages into a bounded queue, the chunker turns them into
+        token-bounded chunks on a second bounded queue, and each chunk is sent to the
+        LLM as soon as a map slot is free. Full queues block the upstream stage.
+        """
+        log.info("--- Node: Streaming Parse -> Chunk -> Map ---")
+        self._check_cancel(state)
+        self._update_progress(state, 10)
+
+        loop = asyncio.get_running_loop()
+        page_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_PAGE_QUEUE_SIZE)
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_CHUNK_QUEUE_SIZE)
+        stop = threading.Event()
+        text_parts: List[str] = []
+        chunks = []
+        chunker = ClauseChunker()
+        progress = {"done": 0}
+        type_task = None
+
+        def put_page(item):
+            # Blocking put from the parser thread; waits while the page queue is full
+            future = asyncio.run_coroutine_threadsafe(page_queue.put(item), loop)
+            while True:
+                try:
+                    return future.result(timeout=0.5)
+                except concurrent.futures.TimeoutError:
+                    if stop.is_set():
+                        future.cancel()
+                        raise InterruptedError("Pipeline stopped")
+
+        def produce_pages():
+            try:
+                for page_text in text_artifact_service.iter_pages(state["file_path"], state.get("file_hash") or None):
+                    self._check_cancel(state)
+                    put_page(page_text)
+            finally:
+                if not stop.is_set():
+                    put_page(_END_OF_STREAM)
+
+        async def chunk_pages():
+            nonlocal type_task
+            length = 0
+            while True:
+                page_text = await page_queue.get()
+                if page_text is _END_OF_STREAM:
+                    break
+                text_parts.append(page_text)
+                if not page_text:
+                    continue
+                length += len(page_text)
+                if type_task is None and length >= TYPE_SAMPLE_CHARS:
+                    # Enough text to classify; run it alongside the map calls
+                    type_task = asyncio.create_task(self._identify_type_async(PAGE_SEPARATOR.join(text_parts)))
+                # Same joining as ParsedDocument, so clause offsets match the stored text
+                for chunk in chunker.feed((PAGE_SEPARATOR if chunker.text else "") + page_text):
+                    await chunk_queue.put(chunk)
+            for chunk in chunker.flush():
+                await chunk_queue.put(chunk)
+            await chunk_queue.put(_END_OF_STREAM)
+
+        async def analyze_chunk(index: int, chunk, slots: asyncio.Semaphore):
+            try:
+                response = await self.llm.ainvoke(self._chunk_messages(chunk.annotated(), f"第 {index + 1} 段"))
+                return [locate_risk(risk, chunker.text, chunker.segmenter, chunk)
+                        for risk in self._parse_chunk_response(response.content)]
+            finally:
+                slots.release()
+                progress["done"] += 1
+                self._update_progress(state, min(75, 35 + progress["done"] * 5))
+
+        async def map_chunks():
+            slots = asyncio.Semaphore(PIPELINE_MAP_CONCURRENCY)
+            tasks = []
+            while True:
+                # Take a slot first so a saturated map stage stops draining the chunk queue
+                await slots.acquire()
+                chunk = await chunk_queue.get()
+                if chunk is _END_OF_STREAM:
+                    slots.release()
+                    break
+                self._check_cancel(state)
+                chunks.append(chunk)
+                tasks.append(asyncio.create_task(analyze_chunk(len(chunks) - 1, chunk, slots)))
+            return await asyncio.gather(*tasks)
+
+        producer = loop.run_in_executor(None, produce_pages)
+        stages = [asyncio.ensure_future(chunk_pages()), asyncio.ensure_future(map_chunks())]
+        try:
+            # Any stage failing aborts the rest; stop unblocks the parser thread
+            _, _, chunk_results = await asyncio.gather(producer, *stages)
+            self._update_progress(state, 75)
+
+            contract_text = chunker.text
+            if not contract_text:
+                return {"error": f"Failed to extract text from {state['file_path']}", "contract_text": "", "chunk_risks": []}
+
+            if type_task is None:
+                type_task = asyncio.create_task(self._identify_type_async(contract_text))
+            contract_type = await type_task
+
+            all_chunk_risks = []
+            for risks in chunk_results:
+                all_chunk_risks.extend(risks)
+            log.info(f"Streamed {len(text_parts)} pages into {len(chunks)} chunks.")
+            return {
+                "contract_text": contract_text,
+                "contract_type": contract_type,
+                "text_chunks": chunks,
+                "clauses": chunker.segmenter,
+                "chunk_risks": all_chunk_risks
+            }
+
+        except InterruptedError as e:
+            raise e
+        except Exception as e:
+            log.info(f"Error in stream_map: {e}")
+            return {"error": str(e), "chunk_risks": []}
+        finally:
+            stop.set()
+            for task in stages + ([type_task] if type_task else []):
+                if not task.done():
+                    task.cancel()
+
+    async def _identify_type_async(self, text: str) -> str:
+        try:
+            response = await self.llm.ainvoke(self._type_messages(text[:TYPE_SAMPLE_CHARS]))
+            contract_type = self._clean_contract_type(response.content)
+            log.info(f"Identified contract type: {contract_type}")
+            return contract_type
+        except Exception as e:
+            log.info(f"Error identifying contract type: {e}")
+            return "未知类型"
+
     def _reduce_risks_node(self, state: AgentState):
         """Node: Aggregate and deduplicate risks."""
         log.info("--- Node: Reducing Risks (Aggregation) ---")
@@ -264,6 +427,7 @@ class AIService:
             - description: 详细描述
             - suggestion: 修改建议
             - clause: 引用原文
+            - clause_id, clause_start, clause_end: 原样保留被合并条目中的值（合并时取第一条）
             
         请只输出纯 JSON 数组。
         """
@@ -271,10 +435,7 @@ class AIService:
         try:
             self._check_cancel(state)
             
-            response = self.llm.invoke([
-                SystemMessage(content="You are a helpful legal assistant that outputs raw JSON."),
-                HumanMessage(content=prompt)
-            ])
+            response = self.llm.invoke(_messages("You are a helpful legal assistant that outputs raw JSON.", prompt))
             
             self._update_progress(state, 95)
             
@@ -316,25 +477,35 @@ class AIService:
             risks = []
 
         # Ensure all required fields exist
+        contract_text = state.get("contract_text", "")
+        segmenter = state.get("clauses")
         validated_risks = []
         for idx, risk in enumerate(risks):
             if not isinstance(risk, dict):
                 continue
+            if segmenter is not None and not isinstance(risk.get("clause_start"), int):
+                # The merge step may drop or garble the offsets; resolve them again from the quote
+                locate_risk(risk, contract_text, segmenter)
                 
             validated_risks.append({
                 "id": risk.get("id", idx + 1),
                 "title": risk.get("title", "Unknown Risk"),
                 "type": risk.get("type", "medium"), # Default to medium
+                "category": risk.get("category", "其他"),
                 "description": risk.get("description", "No description provided"),
                 "suggestion": risk.get("suggestion", ""),
-                "clause": risk.get("clause", "")
+                "clause": risk.get("clause", ""),
+                "clause_id": risk.get("clause_id"),
+                "clause_start": risk.get("clause_start"),
+                "clause_end": risk.get("clause_end")
             })
             
         return {"risks": validated_risks}
 
-    def process_file(self, file_path: str, progress_callback=None, cancel_check=None) -> Dict[str, Any]:
+    def process_file(self, file_path: str, progress_callback=None, cancel_check=None, file_hash: str = None) -> Dict[str, Any]:
         """
-        Public entry point to run the graph starting from a file path.
+        Public entry point to run the graph starting from a stored file.
+        file_path is the storage key; file_hash (if known) avoids re-hashing it.
         """
         if not self.llm:
             log.info("Warning: No API Key provided. Returning mock data.")
@@ -342,9 +513,11 @@ class AIService:
 
         initial_state = {
             "file_path": file_path, 
+            "file_hash": file_hash or "",
             "contract_text": "",
             "contract_type": "",
             "text_chunks": [],
+            "clauses": None,
             "chunk_risks": [],
             "risks": [], 
             "error": "",
@@ -391,3 +564,20 @@ class AIService:
             "clause": "System Config Error",
           }
         ]
+
+
+_ai_service = None
+_ai_service_lock = threading.Lock()
+
+
+def get_ai_service() -> AIService:
+    """
+    Process-wide AIService, built (LLM client + compiled graph) on first use
+    rather than when the API modules are imported.
+    """
+    global _ai_service
+    if _ai_service is None:
+        with _ai_service_lock:
+            if _ai_service is None:
+                _ai_service = AIService()
+    return _ai_service
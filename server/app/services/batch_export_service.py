@@ -0,0 +1,321 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import zipfile
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Integer, cast, func
+
+from app.core.database import SessionLocal
+from app.core.redis import get_redis_client
+from app.core.storage import LocalStorage
+from app.models.contract import Contract
+from app.services.browser_pool import BROWSER_POOL_SIZE, BrowserPoolBusy
+from app.services.report_cache import report_cache
+from app.services.tiering_service import tiering
+from app.utils.log_utils import log
+
+BATCH_EXPORT_DIR = os.getenv("BATCH_EXPORT_DIR", "uploads/exports")
+BATCH_EXPORT_MAX_CONTRACTS = int(os.getenv("BATCH_EXPORT_MAX_CONTRACTS", 500))
+# Reports rendered at once; more than the browser pool size only queues on the pool
+BATCH_EXPORT_CONCURRENCY = int(os.getenv("BATCH_EXPORT_CONCURRENCY", BROWSER_POOL_SIZE))
+# Finished exports (and their job state) are kept this long, in seconds
+BATCH_EXPORT_TTL = int(os.getenv("BATCH_EXPORT_TTL", 24 * 3600))
+
+_JOB_KEY = "export_job:{}"
+_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def _risk_count(level: str):
+    # risk_summary is a JSON column: {"high": 1, "medium": 2, "low": 0}
+    return func.coalesce(cast(func.json_unquote(func.json_extract(Contract.risk_summary, f"$.{level}")), Integer), 0)
+
+
+def filter_contracts(query, contract_ids: Optional[List[int]] = None, filters: Optional[Dict[str, Any]] = None):
+    """Narrow a Contract query to an explicit id list and/or BatchExportFilter fields."""
+    if contract_ids:
+        query = query.filter(Contract.id.in_(contract_ids))
+    filters = filters or {}
+    if filters.get("status"):
+        query = query.filter(Contract.status == filters["status"])
+    if filters.get("contract_type"):
+        query = query.filter(Contract.contract_type == filters["contract_type"])
+    if filters.get("risk_level") in ("high", "medium", "low"):
+        query = query.filter(_risk_count(filters["risk_level"]) > 0)
+    if filters.get("date_from"):
+        query = query.filter(Contract.upload_date >= filters["date_from"])
+    if filters.get("date_to"):
+        query = query.filter(Contract.upload_date <= filters["date_to"])
+    if filters.get("keyword"):
+        query = query.filter(Contract.name.like(f"%{filters['keyword']}%"))
+    return query
+
+
+class BatchExportService:
+    """
+    Portfolio export: renders the reports of many contracts on the shared browser
+    pool (through the report cache) and assembles them into one merged PDF with
+    bookmarks or a ZIP, behind a cover page with a cross-contract summary.
+    Job state lives in Redis (falls back to this process) so progress can be
+    polled or streamed like analysis progress.
+    """
+
+    def __init__(self, export_dir: str = BATCH_EXPORT_DIR):
+        self.export_dir = export_dir
+        self.storage = LocalStorage(export_dir)
+        self._local_jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    # --- Job state ---
+
+    # The Redis client is synchronous: callers on the event loop go through a thread
+
+    def _write_job(self, job_id: str, fields: Dict[str, Any]):
+        redis_client = get_redis_client()
+        if redis_client:
+            key = _JOB_KEY.format(job_id)
+            pipe = redis_client.pipeline()
+            pipe.hset(key, mapping={k: json.dumps(v, ensure_ascii=False) for k, v in fields.items()})
+            pipe.expire(key, BATCH_EXPORT_TTL)
+            pipe.execute()
+        else:
+            self._local_jobs.setdefault(job_id, {}).update(fields)
+
+    def _read_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        redis_client = get_redis_client()
+        if redis_client:
+            raw = redis_client.hgetall(_JOB_KEY.format(job_id))
+            return {k: json.loads(v) for k, v in raw.items()} if raw else None
+        job = self._local_jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def _save_job(self, job_id: str, **fields):
+        await asyncio.to_thread(self._write_job, job_id, fields)
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._read_job, job_id)
+
+    # --- SQL ---
+
+    @staticmethod
+    def resolve_contract_ids(db, user_id: int, contract_ids: Optional[List[int]] = None,
+                             filters: Optional[Dict[str, Any]] = None) -> List[int]:
+        """Contract ids owned by user_id matching an explicit id list and/or filters, newest first."""
+        query = filter_contracts(db.query(Contract.id).filter(Contract.user_id == user_id), contract_ids, filters)
+        rows = query.order_by(Contract.upload_date.desc(), Contract.id.desc()).limit(BATCH_EXPORT_MAX_CONTRACTS).all()
+        return [row.id for row in rows]
+
+    @staticmethod
+    def summarize(db, user_id: int, contract_ids: List[int]) -> Dict[str, Any]:
+        """Cross-contract risk summary, aggregated by the database."""
+        high, medium, low = _risk_count("high"), _risk_count("medium"), _risk_count("low")
+        scope = (Contract.user_id == user_id, Contract.id.in_(contract_ids))
+
+        total_contracts, total_high, total_medium, total_low = db.query(
+            func.count(Contract.id), func.sum(high), func.sum(medium), func.sum(low)
+        ).filter(*scope).one()
+
+        contract_type = func.coalesce(Contract.contract_type, "未分类")
+        by_type = db.query(
+            contract_type, func.count(Contract.id), func.sum(high), func.sum(medium), func.sum(low)
+        ).filter(*scope).group_by(contract_type).order_by(func.sum(high).desc()).all()
+
+        total_high, total_medium, total_low = int(total_high or 0), int(total_medium or 0), int(total_low or 0)
+        return {
+            "total_contracts": total_contracts,
+            "total_risks": total_high + total_medium + total_low,
+            "high": total_high,
+            "medium": total_medium,
+            "low": total_low,
+            "by_type": [
+                {"contract_type": t, "count": c, "high": int(h or 0), "medium": int(m or 0), "low": int(lo or 0)}
+                for t, c, h, m, lo in by_type
+            ],
+        }
+
+    @staticmethod
+    def load_entries(db, user_id: int, contract_ids: List[int]) -> List[Dict[str, Any]]:
+        rows = db.query(
+            Contract.id, Contract.name, Contract.contract_type, Contract.analysis_results,
+            _risk_count("high"), _risk_count("medium"), _risk_count("low")
+        ).filter(Contract.user_id == user_id, Contract.id.in_(contract_ids)).all()
+        by_id = {row[0]: row for row in rows}
+        # Cold contracts: decoded for the export only, they stay in the cold tier
+        cold = tiering.cold_results(db, [row[0] for row in rows if row[3] is None])
+        entries = []
+        for contract_id in contract_ids:
+            if contract_id not in by_id:
+                continue
+            _, name, contract_type, results, high, medium, low = by_id[contract_id]
+            if results is None:
+                results = cold.get(contract_id)
+            entries.append({
+                "id": contract_id, "name": name, "contract_type": contract_type,
+                "results": results or [], "high": int(high), "medium": int(medium), "low": int(low),
+                "exported": bool(results), "failed": False, "page": None, "filename": None,
+            })
+        return entries
+
+    # --- Jobs ---
+
+    async def create_job(self, user_id: int, contract_ids: List[int], fmt: str) -> str:
+        job_id = uuid.uuid4().hex
+        await self._save_job(
+            job_id, user_id=user_id, format=fmt, status="pending", progress=0,
+            done=0, total=len(contract_ids), error="", filename=""
+        )
+        await asyncio.to_thread(self._cleanup_expired)
+        task = asyncio.get_running_loop().create_task(self._run(job_id, user_id, contract_ids, fmt))
+        # Keep a reference so the task isn't garbage collected mid-run
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return job_id
+
+    def _load(self, user_id: int, contract_ids: List[int]):
+        db = SessionLocal()
+        try:
+            return self.summarize(db, user_id, contract_ids), self.load_entries(db, user_id, contract_ids)
+        finally:
+            db.close()
+
+    async def _run(self, job_id: str, user_id: int, contract_ids: List[int], fmt: str):
+        job_dir = os.path.join(self.export_dir, job_id)
+        try:
+            await self._save_job(job_id, status="exporting", progress=5)
+            summary, entries = await asyncio.to_thread(self._load, user_id, contract_ids)
+            os.makedirs(job_dir, exist_ok=True)
+
+            to_render = [e for e in entries if e["exported"]]
+            slots = asyncio.Semaphore(max(1, BATCH_EXPORT_CONCURRENCY))
+            done = 0
+
+            async def render(index: int, entry: Dict[str, Any]):
+                nonlocal done
+                try:
+                    async with slots:
+                        path = await self._render_report(entry)
+                    # Private copy: the report cache may evict the file before assembly
+                    entry["path"] = os.path.join(job_dir, f"{index:04d}.pdf")
+                    await asyncio.to_thread(shutil.copyfile, path, entry["path"])
+                except Exception as e:
+                    # One broken report shouldn't sink a 200-contract export; the TOC marks it
+                    log.error(f"Batch export {job_id}: report for contract {entry['id']} failed: {e}")
+                    entry["exported"], entry["failed"] = False, True
+                entry["results"] = None
+                done += 1
+                await self._save_job(job_id, done=done, progress=5 + int(85 * done / max(len(to_render), 1)))
+
+            await asyncio.gather(*[render(i, e) for i, e in enumerate(to_render)])
+
+            await self._save_job(job_id, status="assembling", progress=90)
+            filename = f"{job_id}.{fmt}"
+            if fmt == "pdf":
+                await self._assemble_pdf(entries, summary, os.path.join(self.export_dir, filename))
+            else:
+                await self._assemble_zip(entries, summary, os.path.join(self.export_dir, filename))
+
+            await self._save_job(job_id, status="completed", progress=100, filename=filename)
+            log.info(f"Batch export {job_id} completed: {len(to_render)}/{len(entries)} reports")
+        except Exception as e:
+            log.error(f"Batch export {job_id} failed: {e}")
+            await self._save_job(job_id, status="failed", error=str(e))
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    @staticmethod
+    async def _render_report(entry: Dict[str, Any], attempts: int = 3) -> str:
+        for attempt in range(attempts):
+            try:
+                return await report_cache.get_or_render(entry["name"], entry["results"])
+            except BrowserPoolBusy:
+                # Interactive exports got the pages first; back off and retry
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+    async def _render_cover(self, entries: List[Dict[str, Any]], summary: Dict[str, Any], show_pages: bool) -> bytes:
+        context = {
+            "summary": summary,
+            "entries": entries,
+            "show_pages": show_pages,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        pdf, _ = await report_cache.export_service.render_template_pdf("batch_cover.html", context)
+        return pdf
+
+    async def _assemble_pdf(self, entries: List[Dict[str, Any]], summary: Dict[str, Any], output_path: str):
+        from pypdf import PdfReader
+
+        page_counts = await asyncio.to_thread(
+            lambda: {e["id"]: len(PdfReader(e["path"]).pages) for e in entries if e["exported"]}
+        )
+        # The TOC needs page numbers, which depend on the cover's own length: settle in two passes
+        cover_pages = 1
+        for _ in range(2):
+            page = cover_pages + 1
+            for entry in entries:
+                if entry["exported"]:
+                    entry["page"] = page
+                    page += page_counts[entry["id"]]
+            cover = await self._render_cover(entries, summary, show_pages=True)
+            actual = await asyncio.to_thread(lambda: len(PdfReader(BytesIO(cover)).pages))
+            if actual == cover_pages:
+                break
+            cover_pages = actual
+
+        def merge():
+            from pypdf import PdfWriter
+            writer = PdfWriter()
+            writer.append(BytesIO(cover), import_outline=False)
+            writer.add_outline_item("风险审查汇总", 0)
+            for entry in entries:
+                if entry["exported"]:
+                    start = len(writer.pages)
+                    writer.append(entry["path"], import_outline=False)
+                    writer.add_outline_item(entry["name"], start)
+            tmp_path = f"{output_path}.part"
+            with open(tmp_path, "wb") as f:
+                writer.write(f)
+            os.replace(tmp_path, output_path)
+
+        await asyncio.to_thread(merge)
+
+    async def _assemble_zip(self, entries: List[Dict[str, Any]], summary: Dict[str, Any], output_path: str):
+        for index, entry in enumerate(entries, 1):
+            if entry["exported"]:
+                name = _UNSAFE_FILENAME.sub("_", os.path.splitext(entry["name"])[0])[:80]
+                entry["filename"] = f"{index:03d}_{name}.pdf"
+        cover = await self._render_cover(entries, summary, show_pages=False)
+
+        def pack():
+            tmp_path = f"{output_path}.part"
+            # PDFs are already compressed: store them as-is
+            with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as archive:
+                archive.writestr("000_风险审查汇总.pdf", cover)
+                for entry in entries:
+                    if entry["exported"]:
+                        archive.write(entry["path"], entry["filename"])
+            os.replace(tmp_path, output_path)
+
+        await asyncio.to_thread(pack)
+
+    def _cleanup_expired(self):
+        cutoff = time.time() - BATCH_EXPORT_TTL
+        if not os.path.isdir(self.export_dir):
+            return
+        for name in os.listdir(self.export_dir):
+            path = os.path.join(self.export_dir, name)
+            try:
+                if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+batch_export_service = BatchExportService()
@@ -0,0 +1,212 @@
+import os
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.utils.log_utils import log
+
+# Warm browser contexts (each with one page) kept per worker process
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 2))
+# Recycle a context after this many renders to cap Chromium memory growth
+BROWSER_PAGE_MAX_RENDERS = int(os.getenv("BROWSER_PAGE_MAX_RENDERS", 50))
+# Exports allowed to wait for a free page; more are rejected right away
+BROWSER_QUEUE_LIMIT = int(os.getenv("BROWSER_QUEUE_LIMIT", 16))
+# Seconds an export waits for a page before giving up
+BROWSER_LEASE_TIMEOUT = float(os.getenv("BROWSER_LEASE_TIMEOUT", 30))
+# Launch the browser in lifespan instead of on the first export
+BROWSER_POOL_PRELAUNCH = os.getenv("BROWSER_POOL_PRELAUNCH", "1") == "1"
+
+
+class BrowserPoolBusy(Exception):
+    """All pages are leased and the wait queue is full (or the wait timed out)."""
+
+
+class RenderMetrics:
+    """Rolling window of export durations for throughput / latency reporting."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=window)  # (finished_at, seconds, ok)
+        self._phases: Dict[str, Deque[float]] = {}  # phase name -> durations in ms
+        self.total = 0
+        self.failed = 0
+
+    def record(self, seconds: float, ok: bool = True, phases: Optional[Dict[str, float]] = None):
+        self._samples.append((time.monotonic(), seconds, ok))
+        self.total += 1
+        if not ok:
+            self.failed += 1
+        for name, ms in (phases or {}).items():
+            self._phases.setdefault(name, deque(maxlen=self.window)).append(ms)
+
+    def snapshot(self, period: float = 60.0) -> Dict[str, Any]:
+        now = time.monotonic()
+        durations = sorted(seconds for _, seconds, ok in self._samples if ok)
+        recent = [1 for finished_at, _, _ in self._samples if now - finished_at <= period]
+
+        def percentile(values: List[float], p: float, scale: float = 1.0) -> Optional[float]:
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(p * len(values)))] * scale, 1)
+
+        return {
+            "total": self.total,
+            "failed": self.failed,
+            "exports_per_sec": round(len(recent) / period, 3),
+            "p50_ms": percentile(durations, 0.50, 1000),
+            "p95_ms": percentile(durations, 0.95, 1000),
+            "phases": {
+                name: {"p50_ms": percentile(sorted(values), 0.50), "p95_ms": percentile(sorted(values), 0.95)}
+                for name, values in self._phases.items()
+            },
+        }
+
+
+class _Slot:
+    __slots__ = ("context", "page", "renders", "generation")
+
+    def __init__(self, context=None, page=None, generation: int = -1):
+        self.context = context
+        self.page = page
+        self.renders = 0
+        self.generation = generation
+
+
+class BrowserPool:
+    """
+    One long-lived headless Chromium per worker process with a fixed set of warm
+    contexts. Exports lease a page through a bounded queue; a page is replaced
+    after BROWSER_PAGE_MAX_RENDERS renders or any failure, and a crashed browser
+    is relaunched on the next lease.
+    """
+    _instance: Optional["BrowserPool"] = None
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_renders: int = BROWSER_PAGE_MAX_RENDERS,
+                 queue_limit: int = BROWSER_QUEUE_LIMIT, lease_timeout: float = BROWSER_LEASE_TIMEOUT):
+        self.size = size
+        self.max_renders = max_renders
+        self.queue_limit = queue_limit
+        self.lease_timeout = lease_timeout
+        self.metrics = RenderMetrics()
+        self._playwright = None
+        self._browser = None
+        self._generation = 0
+        self._idle: Optional[asyncio.Queue] = None
+        self._waiting = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._closed = False
+
+    @classmethod
+    def get_instance(cls) -> "BrowserPool":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    async def start(self):
+        if self._idle is not None:
+            return
+        self._lock = self._lock or asyncio.Lock()
+        async with self._lock:
+            if self._idle is not None:
+                return
+            await self._ensure_browser()
+            idle: asyncio.Queue = asyncio.Queue()
+            for _ in range(self.size):
+                idle.put_nowait(await self._new_slot())
+            self._idle = idle
+            self._closed = False
+            log.info(f"Browser pool started with {self.size} warm contexts")
+
+    async def _ensure_browser(self):
+        if self._browser is not None and self._browser.is_connected():
+            return
+        if self._playwright is None:
+            # Playwright is only needed once a PDF is actually exported
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        if self._browser is not None:
+            log.warning("Browser disconnected, relaunching")
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        # Slots created for an older browser are discarded on their next lease
+        self._generation += 1
+
+    async def _new_slot(self) -> _Slot:
+        context = await self._browser.new_context()
+        page = await context.new_page()
+        return _Slot(context, page, self._generation)
+
+    @staticmethod
+    async def _close_slot(slot: _Slot):
+        if slot.context is not None:
+            try:
+                await slot.context.close()
+            except Exception:
+                # Already gone with a crashed browser
+                pass
+
+    async def _acquire(self) -> _Slot:
+        if not self._idle.empty():
+            return self._idle.get_nowait()
+        if self._waiting >= self.queue_limit:
+            raise BrowserPoolBusy(f"{self._waiting} exports already waiting for a browser page")
+        self._waiting += 1
+        try:
+            return await asyncio.wait_for(self._idle.get(), timeout=self.lease_timeout)
+        except asyncio.TimeoutError:
+            raise BrowserPoolBusy(f"No browser page free after {self.lease_timeout}s")
+        finally:
+            self._waiting -= 1
+
+    async def _ready(self, slot: _Slot) -> _Slot:
+        async with self._lock:
+            await self._ensure_browser()
+            if slot.generation == self._generation and slot.page is not None and not slot.page.is_closed():
+                return slot
+            await self._close_slot(slot)
+            return await self._new_slot()
+
+    async def _release(self, slot: _Slot, healthy: bool):
+        if self._closed:
+            await self._close_slot(slot)
+            return
+        if not healthy or slot.renders >= self.max_renders:
+            await self._close_slot(slot)
+            # Replaced lazily by _ready() on the next lease, so a dead browser doesn't block release
+            slot = _Slot()
+        self._idle.put_nowait(slot)
+
+    @asynccontextmanager
+    async def lease(self):
+        """Lease a warm page: `async with pool.lease() as page: ...`"""
+        await self.start()
+        slot = await self._acquire()
+        healthy = False
+        try:
+            slot = await self._ready(slot)
+            slot.renders += 1
+            yield slot.page
+            healthy = True
+        finally:
+            await self._release(slot, healthy)
+
+    async def shutdown(self):
+        self._closed = True
+        idle, self._idle = self._idle, None
+        while idle is not None and not idle.empty():
+            await self._close_slot(idle.get_nowait())
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                log.error(f"Error closing browser: {e}")
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        log.info("Browser pool shut down")
+
+
+def get_browser_pool() -> BrowserPool:
+    return BrowserPool.get_instance()
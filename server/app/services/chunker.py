@@ -0,0 +1,26 @@
+import os
+
+from app.utils.log_utils import log
+
+# Token budget for one map-stage prompt chunk (the prompt template adds ~300 tokens on top)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 4000))
+
+
+class TokenCounter:
+    """tiktoken-based counter, falling back to one token per character if tiktoken is unavailable."""
+    _encoding = None
+    _loaded = False
+
+    @classmethod
+    def count(cls, text: str) -> int:
+        if not cls._loaded:
+            cls._loaded = True
+            try:
+                import tiktoken
+                cls._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                log.info(f"tiktoken unavailable, counting characters instead: {e}")
+        if cls._encoding is None:
+            # Over-estimates English, roughly right for Chinese: a safe upper bound
+            return len(text)
+        return len(cls._encoding.encode(text, disallowed_special=()))
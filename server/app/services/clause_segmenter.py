@@ -0,0 +1,341 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.services.chunker import CHUNK_MAX_TOKENS, TokenCounter
+
+# Break after paragraph/line ends and Chinese/English sentence terminators, keeping the terminator
+_SEGMENT_RE = re.compile(r"(?<=\n)|(?<=[。；;！？!?])|(?<=\. )")
+
+_CN_NUM = "[一二三四五六七八九十百千零〇两]+"
+
+# (pattern, level): 0 = chapter/part, 1 = article (第X条, Article 3, 一、, 1.), 2/3 = sub-clauses.
+# Dotted numbers ("1.1", "1.1.1") take their level from the number of components.
+_HEADING_PATTERNS: List[Tuple[re.Pattern, Optional[int]]] = [
+    (re.compile(rf"^第\s*(?:{_CN_NUM}|\d+)\s*(?:章|编|部分)"), 0),
+    (re.compile(r"^(?:CHAPTER|Chapter|PART|Part)\s+(?:\d+|[IVXLC]+)\b"), 0),
+    (re.compile(rf"^第\s*(?:{_CN_NUM}|\d+)\s*条"), 1),
+    (re.compile(r"^(?:ARTICLE|Article|SECTION|Section)\s+(?:\d+|[IVXLC]+)\b"), 1),
+    (re.compile(r"^\d{1,3}(?:\.\d{1,3})+(?![\d.])(?=\s|[一-鿿])"), None),
+    (re.compile(rf"^{_CN_NUM}\s*、"), 1),
+    (re.compile(r"^\d{1,3}\s*[、.．](?!\d)(?=\s*\S)"), 1),
+    (re.compile(rf"^[（(]{_CN_NUM}[）)]"), 2),
+    (re.compile(r"^[（(](?:\d{1,3}|[a-z])[）)]"), 3),
+]
+_MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(?=\S)")
+
+# A heading title is the short rest of the line ("第一条 服务内容"), not a sentence
+_TITLE_MAX_CHARS = 30
+_TITLE_STRIP = " \t　:：.、"
+
+PREAMBLE_ID = "0"
+
+
+@dataclass
+class Clause:
+    """
+    One node of the clause tree. start/end are character offsets [start, end) into
+    the contract text (the same text the /text endpoint serves) and cover the
+    heading line, the clause body and all nested sub-clauses.
+    """
+    id: str  # Position in the tree: "3", "3.1", "3.1.2"; "0" is the text before the first heading
+    number: str  # Label as written in the document: "第三条", "3.1", "Article 3"
+    title: str
+    level: int
+    start: int
+    end: int = -1
+    children: List["Clause"] = field(default_factory=list)
+
+    @property
+    def body_end(self) -> int:
+        """End of the clause's own text, before its first sub-clause."""
+        return self.children[0].start if self.children else self.end
+
+    def walk(self) -> Iterable["Clause"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "number": self.number,
+            "title": self.title,
+            "level": self.level,
+            "start": self.start,
+            "end": self.end,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+def match_heading(line: str) -> Optional[Tuple[int, str, str]]:
+    """Return (level, number, title) if line starts a clause, else None."""
+    stripped = line.strip()
+    if not stripped:
+        return None
+    markdown = _MARKDOWN_HEADING.match(stripped)
+    if markdown:
+        # "## 第一条 ..." carries its own numbering; otherwise use the markdown level
+        inner = match_heading(stripped[markdown.end():])
+        if inner:
+            return inner
+        return len(markdown.group(1)) - 1, "", stripped[markdown.end():].strip()[:_TITLE_MAX_CHARS]
+
+    for pattern, level in _HEADING_PATTERNS:
+        match = pattern.match(stripped)
+        if not match:
+            continue
+        number = match.group(0).strip()
+        if level is None:
+            level = number.count(".") + 1
+        rest = stripped[match.end():].strip(_TITLE_STRIP)
+        title = rest if rest and len(rest) <= _TITLE_MAX_CHARS and rest[-1] not in "。；;，," else ""
+        return level, number.rstrip("、.．"), title
+    return None
+
+
+class ClauseSegmenter:
+    """
+    Builds the clause tree line by line, so it can run on streamed pages.
+    add_line() / close() return the top-level clauses they completed.
+    """
+
+    def __init__(self):
+        self.roots: List[Clause] = []
+        self.clauses: List[Clause] = []  # Document order
+        self._open: List[Clause] = []
+
+    def _close_until(self, level: int, offset: int) -> List[Clause]:
+        completed = []
+        while self._open and (self._open[-1].level >= level or self._open[-1].id == PREAMBLE_ID):
+            clause = self._open.pop()
+            clause.end = offset
+            if not self._open:
+                completed.append(clause)
+        return completed
+
+    def _start(self, level: int, number: str, title: str, offset: int, clause_id: Optional[str] = None):
+        parent = self._open[-1] if self._open else None
+        if clause_id is None:
+            if parent is None:
+                ordinal = sum(1 for root in self.roots if root.id != PREAMBLE_ID) + 1
+                clause_id = str(ordinal)
+            else:
+                clause_id = f"{parent.id}.{len(parent.children) + 1}"
+        clause = Clause(id=clause_id, number=number, title=title, level=level, start=offset)
+        (parent.children if parent else self.roots).append(clause)
+        self.clauses.append(clause)
+        self._open.append(clause)
+
+    def add_line(self, line: str, offset: int) -> List[Clause]:
+        heading = match_heading(line)
+        if heading is None:
+            if not self._open and not self.clauses and line.strip():
+                self._start(0, "", "", offset, clause_id=PREAMBLE_ID)
+            return []
+        level, number, title = heading
+        completed = self._close_until(level, offset)
+        self._start(level, number, title, offset)
+        return completed
+
+    def close(self, offset: int) -> List[Clause]:
+        return self._close_until(-1, offset)
+
+    def clause_at(self, offset: int) -> Optional[Clause]:
+        """Innermost clause containing offset."""
+        found = None
+        for clause in self.clauses:
+            if clause.start > offset:
+                break
+            if clause.end < 0 or offset < clause.end:
+                found = clause
+        return found
+
+
+@dataclass
+class ClauseChunk:
+    """A contiguous span of whole clauses (or pieces of one oversized clause) sized for one LLM call."""
+    start: int
+    end: int
+    text: str
+    clause_ids: List[str]
+    markers: List[Tuple[int, str]]  # (offset, clause id) where each clause begins inside the chunk
+
+    def annotated(self) -> str:
+        """Chunk text with a 【id】 marker in front of every clause, for the map prompt."""
+        parts = []
+        cursor = self.start
+        for offset, clause_id in self.markers:
+            parts.append(self.text[cursor - self.start:offset - self.start])
+            parts.append(f"【{clause_id}】")
+            cursor = offset
+        parts.append(self.text[cursor - self.start:])
+        return "".join(parts).strip()
+
+
+class ClauseChunker:
+    """
+    Packs whole clauses into token-bounded chunks without overlap.
+    A top-level clause that does not fit is broken into its own text and its
+    sub-clauses; only a single leaf clause larger than the budget is split at
+    sentence boundaries. feed() returns the chunks completed by the new text;
+    flush() returns the rest.
+    """
+
+    def __init__(self, max_tokens: int = CHUNK_MAX_TOKENS,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens or TokenCounter.count
+        self.text = ""
+        self.segmenter = ClauseSegmenter()
+        self._scanned = 0
+        # Pending pieces: (start, end, clause ids)
+        self._buffer: List[Tuple[int, int, List[str]]] = []
+        self._buffer_tokens = 0
+
+    def _emit(self) -> List[ClauseChunk]:
+        if not self._buffer:
+            return []
+        start, end = self._buffer[0][0], self._buffer[-1][1]
+        clause_ids = []
+        for _, _, ids in self._buffer:
+            clause_ids.extend(i for i in ids if i not in clause_ids)
+        self._buffer = []
+        self._buffer_tokens = 0
+        text = self.text[start:end]
+        if not text.strip():
+            return []
+        markers = []
+        for clause_id in clause_ids:
+            clause = self._by_id[clause_id]
+            markers.append((max(clause.start, start), clause_id))
+        markers.sort()
+        return [ClauseChunk(start=start, end=end, text=text, clause_ids=clause_ids, markers=markers)]
+
+    @property
+    def _by_id(self) -> Dict[str, Clause]:
+        return {clause.id: clause for clause in self.segmenter.clauses}
+
+    def _add_piece(self, start: int, end: int, ids: List[str], tokens: int) -> List[ClauseChunk]:
+        chunks = []
+        if self._buffer_tokens + tokens > self.max_tokens:
+            chunks.extend(self._emit())
+        self._buffer.append((start, end, ids))
+        self._buffer_tokens += tokens
+        return chunks
+
+    def _split_span(self, start: int, end: int) -> List[Tuple[int, int, int]]:
+        """Split an oversized leaf span at sentence boundaries into (start, end, tokens) pieces."""
+        pieces = []
+        piece_start, piece_tokens = start, 0
+        offset = start
+        for segment in _SEGMENT_RE.split(self.text[start:end]):
+            if not segment:
+                continue
+            tokens = self.count_tokens(segment)
+            if piece_tokens and piece_tokens + tokens > self.max_tokens:
+                pieces.append((piece_start, offset, piece_tokens))
+                piece_start, piece_tokens = offset, 0
+            if tokens > self.max_tokens:
+                # One sentence over budget: fixed character windows
+                window = max(1, int(len(segment) * self.max_tokens / tokens))
+                for i in range(0, len(segment), window):
+                    piece_end = offset + min(i + window, len(segment))
+                    pieces.append((offset + i, piece_end, self.count_tokens(self.text[offset + i:piece_end])))
+                piece_start = offset + len(segment)
+            else:
+                piece_tokens += tokens
+            offset += len(segment)
+        if piece_tokens:
+            pieces.append((piece_start, end, piece_tokens))
+        return pieces
+
+    def _add_clause(self, clause: Clause) -> List[ClauseChunk]:
+        tokens = self.count_tokens(self.text[clause.start:clause.end])
+        if tokens <= self.max_tokens:
+            return self._add_piece(clause.start, clause.end, [c.id for c in clause.walk()], tokens)
+
+        chunks = []
+        if clause.body_end > clause.start:
+            body_tokens = self.count_tokens(self.text[clause.start:clause.body_end])
+            if body_tokens <= self.max_tokens:
+                chunks.extend(self._add_piece(clause.start, clause.body_end, [clause.id], body_tokens))
+            else:
+                for start, end, piece_tokens in self._split_span(clause.start, clause.body_end):
+                    chunks.extend(self._add_piece(start, end, [clause.id], piece_tokens))
+        for child in clause.children:
+            chunks.extend(self._add_clause(child))
+        return chunks
+
+    def feed(self, text: str) -> List[ClauseChunk]:
+        self.text += text
+        chunks = []
+        while True:
+            newline = self.text.find("\n", self._scanned)
+            if newline < 0:
+                break
+            for clause in self.segmenter.add_line(self.text[self._scanned:newline], self._scanned):
+                chunks.extend(self._add_clause(clause))
+            self._scanned = newline + 1
+        return chunks
+
+    def flush(self) -> List[ClauseChunk]:
+        chunks = []
+        if self._scanned < len(self.text):
+            for clause in self.segmenter.add_line(self.text[self._scanned:], self._scanned):
+                chunks.extend(self._add_clause(clause))
+            self._scanned = len(self.text)
+        for clause in self.segmenter.close(len(self.text)):
+            chunks.extend(self._add_clause(clause))
+        chunks.extend(self._emit())
+        return chunks
+
+
+def split_clauses(text: str, max_tokens: int = CHUNK_MAX_TOKENS) -> Tuple[List[ClauseChunk], ClauseSegmenter]:
+    """Non-streaming helper: segment and pack a whole text at once."""
+    chunker = ClauseChunker(max_tokens)
+    chunks = chunker.feed(text) + chunker.flush()
+    return chunks, chunker.segmenter
+
+
+def _quote_pattern(quote: str) -> Optional[re.Pattern]:
+    # LLM quotes drop or add whitespace (PDF line breaks); match ignoring it
+    chars = [re.escape(c) for c in quote if not c.isspace()][:200]
+    return re.compile(r"\s*".join(chars)) if chars else None
+
+
+def locate_risk(risk: Dict, text: str, segmenter: ClauseSegmenter,
+                chunk: Optional[ClauseChunk] = None) -> Dict:
+    """
+    Resolve a risk's quoted `clause` to character offsets in text and the
+    innermost clause containing it; sets clause_id, clause_start, clause_end.
+    Falls back to the span of the clause id the model reported.
+    """
+    by_id = {clause.id: clause for clause in segmenter.clauses}
+    clause_id = str(risk.get("clause_id") or "").strip("【】[] ")
+    claimed = by_id.get(clause_id)
+
+    spans = []
+    if claimed is not None:
+        spans.append((claimed.start, claimed.end))
+    if chunk is not None:
+        spans.append((chunk.start, chunk.end))
+    spans.append((0, len(text)))
+
+    pattern = _quote_pattern(str(risk.get("clause") or ""))
+    if pattern is not None:
+        for start, end in spans:
+            match = pattern.search(text, start, end)
+            if match:
+                clause = segmenter.clause_at(match.start())
+                risk["clause_id"] = clause.id if clause else None
+                risk["clause_start"], risk["clause_end"] = match.start(), match.end()
+                return risk
+
+    if claimed is not None:
+        risk["clause_id"] = claimed.id
+        risk["clause_start"], risk["clause_end"] = claimed.start, claimed.end
+    else:
+        risk["clause_id"] = None
+        risk["clause_start"] = risk["clause_end"] = None
+    return risk
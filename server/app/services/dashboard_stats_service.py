@@ -0,0 +1,277 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app.models.contract import Contract
+from app.models.risk import Risk
+from app.models.stats import UserStats, UserDailyStats, UserFolderStats
+from app.utils.log_utils import log
+
+UNCATEGORIZED = "未分类"
+# Per-user storage quota for uploads, 0 disables it
+STORAGE_QUOTA_MB = int(os.getenv("STORAGE_QUOTA_MB", 0))
+# Columns shared by UserStats and UserDailyStats
+COUNTERS = (
+    "contracts", "analyzed", "storage_bytes", "risks_pending", "risks_processing", "risks_resolved",
+    "analysis_seconds", "analysis_count",
+)
+_RISK_COLUMNS = {"pending": "risks_pending", "processing": "risks_processing", "resolved": "risks_resolved"}
+
+
+def contract_size(contract: Contract) -> int:
+    return contract.file_size_bytes or 0
+
+
+def folder_name(contract_type: Optional[str]) -> str:
+    return (contract_type or UNCATEGORIZED)[:100]
+
+
+class DashboardStatsService:
+    """
+    Incrementally maintained dashboard aggregates. Every hook only adds deltas
+    inside the caller's transaction (the caller commits), so the totals move
+    atomically with the change they describe; reads are primary-key lookups.
+    """
+
+    # --- Writes ---
+
+    @staticmethod
+    def _bump(db, model, key: Dict[str, Any], deltas: Dict[str, Any]):
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+        query = db.query(model).filter_by(**key)
+        values = {getattr(model, k): getattr(model, k) + v for k, v in deltas.items()}
+        if query.update(values, synchronize_session=False):
+            return
+        try:
+            with db.begin_nested():
+                db.add(model(**key, **deltas))
+        except IntegrityError:
+            # Another transaction created the row first
+            query.update(values, synchronize_session=False)
+
+    def _apply(self, db, user_id: int, deltas: Dict[str, Any], day: Optional[date] = None):
+        """Add deltas to the user's totals and to the given day (today by default)."""
+        totals = {k: v for k, v in deltas.items() if k in COUNTERS or k == "upload_ts_sum"}
+        daily = {k: v for k, v in deltas.items() if k in COUNTERS}
+        self._bump(db, UserStats, {"user_id": user_id}, totals)
+        self._bump(db, UserDailyStats, {"user_id": user_id, "day": day or datetime.utcnow().date()}, daily)
+
+    def _folder(self, db, user_id: int, contract_type: Optional[str], contracts: int, size: int):
+        self._bump(db, UserFolderStats, {"user_id": user_id, "name": folder_name(contract_type)},
+                   {"contracts": contracts, "storage_bytes": size})
+
+    @staticmethod
+    def _upload_day(contract: Contract) -> date:
+        return (contract.upload_date or datetime.utcnow()).date()
+
+    @staticmethod
+    def _upload_ts(contract: Contract) -> int:
+        return int((contract.upload_date or datetime.utcnow()).timestamp())
+
+    def contract_added(self, db, contract: Contract, size_bytes: int):
+        if contract.user_id is None:
+            return
+        self._apply(db, contract.user_id, {
+            "contracts": 1, "storage_bytes": size_bytes, "upload_ts_sum": self._upload_ts(contract),
+        })
+        self._bump(db, UserDailyStats, {"user_id": contract.user_id, "day": self._upload_day(contract)}, {"uploads": 1})
+        self._folder(db, contract.user_id, contract.contract_type, 1, size_bytes)
+
+    @staticmethod
+    def risk_counts(db, contract_id: int) -> Dict[str, int]:
+        return dict(
+            db.query(Risk.status, func.count(Risk.id)).filter(Risk.contract_id == contract_id).group_by(Risk.status).all()
+        )
+
+    def contract_removed(self, db, contract: Contract, risk_counts: Dict[str, int]):
+        """Call before deleting the contract; risk_counts is risk_counts() of the contract."""
+        if contract.user_id is None:
+            return
+        size = contract_size(contract)
+        deltas = {
+            "contracts": -1, "storage_bytes": -size, "upload_ts_sum": -self._upload_ts(contract),
+            "analyzed": -1 if contract.status == "analyzed" else 0,
+        }
+        for status, column in _RISK_COLUMNS.items():
+            deltas[column] = -risk_counts.get(status, 0)
+        self._apply(db, contract.user_id, deltas)
+        self._bump(db, UserDailyStats, {"user_id": contract.user_id, "day": self._upload_day(contract)},
+                   {"uploads": -1, "new_risks": -sum(risk_counts.values())})
+        self._folder(db, contract.user_id, contract.contract_type, -1, -size)
+
+    def analysis_started(self, db, contract: Contract):
+        """
+        Call before a contract's status leaves "analyzed" for a re-analysis: it stops
+        counting as analyzed until contract_analyzed(), so a failed or cancelled run
+        leaves the count right.
+        """
+        if contract.user_id is None or contract.status != "analyzed":
+            return
+        self._apply(db, contract.user_id, {"analyzed": -1})
+
+    def contract_analyzed(self, db, contract: Contract, previous_type: Optional[str],
+                          previous_counts: Dict[str, int], new_counts: Dict[str, int], seconds: float):
+        """Call when analysis results are saved (contract already has its new type/status)."""
+        if contract.user_id is None:
+            return
+        deltas = {"analyzed": 1, "analysis_seconds": seconds, "analysis_count": 1}
+        for status, column in _RISK_COLUMNS.items():
+            deltas[column] = new_counts.get(status, 0) - previous_counts.get(status, 0)
+        self._apply(db, contract.user_id, deltas)
+        self._bump(db, UserDailyStats, {"user_id": contract.user_id, "day": self._upload_day(contract)},
+                   {"new_risks": sum(new_counts.values()) - sum(previous_counts.values())})
+        if folder_name(previous_type) != folder_name(contract.contract_type):
+            size = contract_size(contract)
+            self._folder(db, contract.user_id, previous_type, -1, -size)
+            self._folder(db, contract.user_id, contract.contract_type, 1, size)
+
+    def risk_status_changed(self, db, user_id: int, old_status: str, new_status: str, count: int = 1):
+        if old_status == new_status:
+            return
+        deltas = {}
+        if old_status in _RISK_COLUMNS:
+            deltas[_RISK_COLUMNS[old_status]] = -count
+        if new_status in _RISK_COLUMNS:
+            deltas[_RISK_COLUMNS[new_status]] = count
+        self._apply(db, user_id, deltas)
+
+    # --- Reads ---
+
+    @staticmethod
+    def totals(db, user_id: int) -> Dict[str, Any]:
+        row = db.get(UserStats, user_id)
+        return {k: (getattr(row, k) if row else 0) or 0 for k in COUNTERS + ("upload_ts_sum",)}
+
+    @staticmethod
+    def period(db, user_id: int, start: date, end: Optional[date] = None) -> Dict[str, Any]:
+        """Sum of the daily deltas in [start, end] (end defaults to today)."""
+        end = end or datetime.utcnow().date()
+        columns = COUNTERS + ("uploads", "new_risks")
+        sums = db.query(*[func.coalesce(func.sum(getattr(UserDailyStats, k)), 0) for k in columns]).filter(
+            UserDailyStats.user_id == user_id, UserDailyStats.day >= start, UserDailyStats.day <= end
+        ).one()
+        return dict(zip(columns, sums))
+
+    def week_over_week(self, db, user_id: int):
+        """(last 7 days, the 7 days before) daily sums."""
+        today = datetime.utcnow().date()
+        current = self.period(db, user_id, today - timedelta(days=6), today)
+        previous = self.period(db, user_id, today - timedelta(days=13), today - timedelta(days=7))
+        return current, previous
+
+    def new_this_month(self, db, user_id: int) -> Dict[str, int]:
+        month = self.period(db, user_id, datetime.utcnow().date().replace(day=1))
+        return {"contracts": int(month["uploads"]), "risks": int(month["new_risks"])}
+
+    @staticmethod
+    def folders(db, user_id: int):
+        return db.query(UserFolderStats).filter(
+            UserFolderStats.user_id == user_id, UserFolderStats.contracts > 0
+        ).order_by(UserFolderStats.contracts.desc(), UserFolderStats.name).all()
+
+    # --- Storage (SQL over ix_contracts_user_type_size) ---
+
+    @staticmethod
+    def storage_used(db, user_id: int) -> int:
+        """Authoritative byte count for quota checks, straight from the contracts index."""
+        return int(db.query(func.coalesce(func.sum(Contract.file_size_bytes), 0)).filter(
+            Contract.user_id == user_id
+        ).scalar())
+
+    @staticmethod
+    def folder_sizes(db, user_id: int) -> Dict[str, Dict[str, int]]:
+        folder = func.coalesce(Contract.contract_type, UNCATEGORIZED)
+        rows = db.query(folder, func.count(Contract.id), func.coalesce(func.sum(Contract.file_size_bytes), 0)).filter(
+            Contract.user_id == user_id
+        ).group_by(folder).all()
+        folders: Dict[str, Dict[str, int]] = {}
+        for name, count, size in rows:
+            folder_stats = folders.setdefault(folder_name(name), {"contracts": 0, "storage_bytes": 0})
+            folder_stats["contracts"] += count
+            folder_stats["storage_bytes"] += int(size)
+        return folders
+
+    @staticmethod
+    def quota_exceeded(db, user_id: int, incoming_bytes: int) -> bool:
+        if STORAGE_QUOTA_MB <= 0:
+            return False
+        return DashboardStatsService.storage_used(db, user_id) + incoming_bytes > STORAGE_QUOTA_MB * 1024 * 1024
+
+    # --- Backfill ---
+
+    def rebuild(self, db, user_id: int):
+        """
+        Recompute a user's aggregates from contracts and risks (migration / repair).
+        Daily buckets get each contract's counts on its upload day. Analysis times
+        can't be derived from the contracts, so the recorded ones are carried over.
+        """
+        timings = {
+            day: {"analysis_seconds": seconds, "analysis_count": count}
+            for day, seconds, count in db.query(
+                UserDailyStats.day, UserDailyStats.analysis_seconds, UserDailyStats.analysis_count
+            ).filter(UserDailyStats.user_id == user_id, UserDailyStats.analysis_count > 0)
+        }
+        for model in (UserStats, UserDailyStats, UserFolderStats):
+            db.query(model).filter(model.user_id == user_id).delete(synchronize_session=False)
+
+        contracts = db.query(
+            Contract.id, Contract.file_size_bytes, Contract.upload_date, Contract.status
+        ).filter(Contract.user_id == user_id).yield_per(500)
+        risk_counts: Dict[int, Dict[str, int]] = {}
+        for contract_id, status, count in db.query(Risk.contract_id, Risk.status, func.count(Risk.id)).filter(
+            Risk.user_id == user_id
+        ).group_by(Risk.contract_id, Risk.status):
+            risk_counts.setdefault(contract_id, {})[status] = count
+
+        totals: Dict[str, Any] = {k: 0 for k in COUNTERS + ("upload_ts_sum",)}
+        days: Dict[date, Dict[str, int]] = {}
+        for contract in contracts:
+            size = contract.file_size_bytes or 0
+            counts = risk_counts.get(contract.id, {})
+            deltas = {
+                "contracts": 1, "storage_bytes": size, "analyzed": 1 if contract.status == "analyzed" else 0,
+                **{column: counts.get(status, 0) for status, column in _RISK_COLUMNS.items()},
+            }
+            for k, v in deltas.items():
+                totals[k] += v
+            totals["upload_ts_sum"] += self._upload_ts(contract)
+            day = days.setdefault(self._upload_day(contract), {})
+            for k, v in {**deltas, "uploads": 1, "new_risks": sum(counts.values())}.items():
+                day[k] = day.get(k, 0) + v
+        for d, values in timings.items():
+            days.setdefault(d, {}).update(values)
+            for k, v in values.items():
+                totals[k] += v
+
+        if not totals["contracts"] and not timings:
+            return
+        db.add(UserStats(user_id=user_id, **totals))
+        db.add_all(UserDailyStats(user_id=user_id, day=d, **values) for d, values in days.items())
+        db.add_all(
+            UserFolderStats(user_id=user_id, name=name, **values)
+            for name, values in self.folder_sizes(db, user_id).items()
+        )
+
+    def rebuild_all(self, db, missing_only: bool = True) -> int:
+        """
+        Rebuild the aggregates of users with contracts. By default only users without
+        a user_stats row (the first migration, new installs) are touched; a full
+        rebuild races live uploads, so run it with uploads paused.
+        """
+        query = db.query(Contract.user_id).filter(Contract.user_id.isnot(None))
+        if missing_only:
+            query = query.filter(~db.query(UserStats).filter(UserStats.user_id == Contract.user_id).exists())
+        user_ids = [row[0] for row in query.distinct()]
+        for user_id in user_ids:
+            self.rebuild(db, user_id)
+            db.commit()
+        log.info(f"Dashboard stats rebuilt for {len(user_ids)} users")
+        return len(user_ids)
+
+
+dashboard_stats = DashboardStatsService()
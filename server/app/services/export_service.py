@@ -1,43 +1,76 @@
 import os
-from jinja2 import Environment, FileSystemLoader
+import re
+import time
+import asyncio
 from datetime import datetime
-from playwright.async_api import async_playwright
-
-import shutil
-import urllib.request
+from typing import Dict, Tuple
 
+from app.services.browser_pool import BrowserPoolBusy, get_browser_pool
+from app.services.report_fonts import ReportFonts
 from app.utils.log_utils import log
 
+# Replaced with the embedded @font-face rules once the report text is known
+FONT_FACES_PLACEHOLDER = "/*__FONT_FACES__*/"
+# Set by report.html once its fonts are loaded and laid out
+READY_SIGNAL = "window.__reportReady === true"
+PDF_OPTIONS = {
+    "format": "A4",
+    "print_background": True,
+    "margin": {"top": "1.5cm", "bottom": "1.5cm", "left": "1.5cm", "right": "1.5cm"},
+    "display_header_footer": False,  # header/footer handled via CSS @page or custom template if needed
+}
+# Control characters that are not allowed anywhere in an XML 1.0 document
+_XML_INVALID = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def xml_text(value) -> str:
+    """Jinja `xml` filter: escape text for XML parts (XLSX/DOCX) and drop invalid characters."""
+    if value is None:
+        return ""
+    text = _XML_INVALID.sub("", str(value))
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
 
 class ExportService:
     def __init__(self):
         # 1. 获取当前文件所在的绝对目录
         current_dir = os.path.dirname(os.path.abspath(__file__))
 
-        # 2. 标准化模板目录路径
-        template_path = os.path.abspath(os.path.join(current_dir, '../templates'))
-        self.template_env = Environment(
-            loader=FileSystemLoader(template_path)
-        )
+        # 2. 标准化模板目录路径 (Jinja 环境在首次导出时才创建)
+        self.template_path = os.path.abspath(os.path.join(current_dir, '../templates'))
+        self._template_env = None
 
-        # 3. 标准化资产/字体目录路径 (Playwright handles fonts via CSS, but we keep this structure)
+        # 3. 标准化资产/字体目录路径 (字体以子集化 data URL 内嵌进报告，渲染时无需网络)
         self.assets_dir = os.path.abspath(os.path.join(current_dir, '../assets/fonts'))
         if not os.path.exists(self.assets_dir):
             os.makedirs(self.assets_dir, exist_ok=True)
+        self.fonts = ReportFonts(self.assets_dir)
 
-        # Playwright doesn't need explicit font registration in Python, 
-        # it uses system fonts or web fonts defined in CSS.
+    @property
+    def template_env(self):
+        if self._template_env is None:
+            from jinja2 import Environment, FileSystemLoader
+            self._template_env = Environment(
+                loader=FileSystemLoader(self.template_path)
+            )
+            self._template_env.filters["xml"] = xml_text
+        return self._template_env
 
-    async def generate_pdf(self, contract_name: str, analysis_results: list, output_path: str):
-        """生成审查报告 PDF (使用 Playwright 渲染 HTML)"""
-        template = self.template_env.get_template('report.html')
+    def render_template(self, template_name: str, context: dict) -> str:
+        """Render a report template with its fonts embedded (no external resources)."""
+        template = self.template_env.get_template(template_name)
+        html_content = template.render(font_faces=FONT_FACES_PLACEHOLDER, **context)
+        # The rendered page is a superset of the characters the fonts must cover
+        return html_content.replace(FONT_FACES_PLACEHOLDER, self.fonts.font_faces(html_content), 1)
 
+    @staticmethod
+    def report_context(contract_name: str, analysis_results: list) -> dict:
         # Prepare data
         high_count = len([r for r in analysis_results if r['type'] == 'high'])
         medium_count = len([r for r in analysis_results if r['type'] == 'medium'])
         low_count = len([r for r in analysis_results if r['type'] == 'low'])
 
-        context = {
+        return {
             'contract_name': contract_name,
             'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             'total_risks': len(analysis_results),
@@ -47,50 +80,60 @@ class ExportService:
             'analysis_results': analysis_results,
         }
 
-        html_content = template.render(**context)
-        
-        # Save HTML to a temporary file for Playwright to load
-        temp_html_path = output_path.replace('.pdf', '.html')
+    def render_html(self, contract_name: str, analysis_results: list) -> str:
+        return self.render_template('report.html', self.report_context(contract_name, analysis_results))
+
+    async def render_template_pdf(self, template_name: str, context: dict) -> Tuple[bytes, Dict[str, float]]:
+        """
+        Render template_name to PDF bytes (不落盘).
+        Returns (pdf bytes, per-phase timings in ms: template, layout, print).
+        """
+        pool = get_browser_pool()
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
         try:
-            with open(temp_html_path, "w", encoding="utf-8") as f:
-                f.write(html_content)
-            
-            # Convert file path to file URL
-            file_url = f"file:///{os.path.abspath(temp_html_path).replace(os.sep, '/')}"
-            
-            log.info(f"Generating PDF using Playwright from {file_url}")
-
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
-                await page.goto(file_url, wait_until="networkidle")
-                
-                await page.pdf(
-                    path=output_path,
-                    format="A4",
-                    print_background=True,
-                    margin={
-                        "top": "1.5cm",
-                        "bottom": "1.5cm",
-                        "left": "1.5cm",
-                        "right": "1.5cm"
-                    },
-                    display_header_footer=False # header/footer handled via CSS @page or custom template if needed
-                )
-                await browser.close()
+            # Template rendering and font subsetting are CPU work: keep them off the event loop
+            html_content = await asyncio.to_thread(self.render_template, template_name, context)
+            timings["template"] = (time.perf_counter() - started) * 1000
 
+            async with pool.lease() as page:
+                phase = time.perf_counter()
+                # Self-contained HTML: no navigation, no network idle window to wait out
+                await page.set_content(html_content, wait_until="domcontentloaded")
+                await page.wait_for_function(READY_SIGNAL)
+                timings["layout"] = (time.perf_counter() - phase) * 1000
+
+                phase = time.perf_counter()
+                pdf = await page.pdf(**PDF_OPTIONS)
+                timings["print"] = (time.perf_counter() - phase) * 1000
+        except Exception:
+            pool.metrics.record(time.perf_counter() - started, ok=False)
+            raise
+
+        pool.metrics.record(time.perf_counter() - started, phases=timings)
+        log.info(
+            f"PDF rendered from {template_name}: {len(pdf)} bytes, "
+            + ", ".join(f"{name} {ms:.0f}ms" for name, ms in timings.items())
+        )
+        return pdf, timings
+
+    async def render_pdf(self, contract_name: str, analysis_results: list) -> Tuple[bytes, Dict[str, float]]:
+        """生成审查报告 PDF，直接返回字节"""
+        return await self.render_template_pdf('report.html', self.report_context(contract_name, analysis_results))
+
+    async def generate_pdf(self, contract_name: str, analysis_results: list, output_path: str) -> bool:
+        """生成审查报告 PDF 并写入 output_path"""
+        try:
+            pdf, _ = await self.render_pdf(contract_name, analysis_results)
+            with open(output_path, "wb") as f:
+                f.write(pdf)
             log.info(f"PDF generated successfully at {output_path}")
             return True
 
+        except BrowserPoolBusy:
+            raise
         except Exception as e:
             log.error(f"Failed to generate PDF with Playwright: {e}")
             import traceback
             log.error(traceback.format_exc())
             return False
-        finally:
-            # Clean up temp HTML
-            if os.path.exists(temp_html_path):
-                try:
-                    os.remove(temp_html_path)
-                except:
-                    pass
@@ -1,48 +1,134 @@
-from unstructured.partition.auto import partition
-from pypdf import PdfReader
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+from app.services.pdf_parser import PdfParser
+from app.services.native_readers import get_native_reader
 from app.utils.log_utils import log
 import os
 
+PAGE_SEPARATOR = "\n\n"
+
+
+@dataclass
+class ParsedDocument:
+    """
+    Extracted text plus the character offset at which each page starts.
+    Empty pages contribute no text but keep their slot, so page_offsets[i]
+    always refers to page i (0-based).
+    """
+    text: str = ""
+    page_offsets: List[int] = field(default_factory=list)
+
+    @classmethod
+    def from_pages(cls, pages: List[str]) -> "ParsedDocument":
+        parts = []
+        offsets = []
+        length = 0
+        for page_text in pages:
+            start = length + (len(PAGE_SEPARATOR) if parts else 0)
+            offsets.append(start)
+            if page_text:
+                parts.append(page_text)
+                length = start + len(page_text)
+        return cls(text=PAGE_SEPARATOR.join(parts), page_offsets=offsets)
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_offsets)
+
+    def page_span(self, start_page: int, end_page: int) -> Tuple[int, int]:
+        """Character span [start, end) covering 1-based pages start_page..end_page."""
+        start = min(self.page_offsets[start_page - 1], len(self.text))
+        end = self.page_offsets[end_page] if end_page < self.page_count else len(self.text)
+        return start, min(end, len(self.text))
+
+    def pages(self) -> List[str]:
+        """Split the text back into per-page strings (without the joining separator)."""
+        result = []
+        for page in range(1, self.page_count + 1):
+            start, end = self.page_span(page, page)
+            page_text = self.text[start:end]
+            if page_text.endswith(PAGE_SEPARATOR):
+                page_text = page_text[:-len(PAGE_SEPARATOR)]
+            result.append(page_text)
+        return result
+
+
 class FileParser:
     @staticmethod
     def extract_text(file_path: str) -> str:
         """
         Extract text from file.
         Uses pypdf for PDF files to avoid heavy dependencies and potential DLL errors.
-        Uses unstructured for other file types (DOCX, PPTX, HTML, etc.).
+        Uses native readers for DOCX/TXT/HTML and unstructured for everything else (DOC, PPTX, ...).
         """
+        return FileParser.extract_document(file_path).text
+
+    @staticmethod
+    def extract_document(file_path: str) -> ParsedDocument:
+        """Extract text together with its page offsets (non-PDF files count as one page)."""
         try:
-            # Ensure path is absolute and uses correct separators for the OS
-            file_path = os.path.abspath(file_path)
-            
-            # Specialized handling for PDF to avoid unstructured's onnxruntime dependency issues
-            if file_path.lower().endswith('.pdf'):
-                try:
-                    reader = PdfReader(file_path)
-                    text_parts = []
-                    for page in reader.pages:
-                        extracted = page.extract_text()
-                        if extracted:
-                            text_parts.append(extracted)
-                    return "\n\n".join(text_parts)
-                except Exception as e:
-                    log.error(f"pypdf extraction failed for {file_path}: {e}")
-                    # If pypdf fails, we could try unstructured as fallback, 
-                    # but if it's an environment issue, it might crash. 
-                    # Let's try it anyway as a last resort or return empty.
-                    log.info("Attempting fallback to unstructured...")
-
-            # unstructured's auto partition detects file type and uses appropriate parser
-            # strategy="fast" uses pypdf for PDFs, avoiding heavy dependencies like onnxruntime/tesseract
-            # languages=["chi_sim", "eng"] helps suppress warnings and prepare for OCR if needed
-            elements = partition(filename=file_path, strategy="fast", languages=["chi_sim", "eng"])
-            
-            # Combine all elements into a single string
-            # Elements can be Title, NarrativeText, ListItem, etc.
-            text = "\n\n".join([str(el) for el in elements])
-            return text
-            
+            return ParsedDocument.from_pages(list(FileParser.iter_pages(file_path)))
+        except TimeoutError as e:
+            log.error(str(e))
+            return ParsedDocument()
         except Exception as e:
             log.info(f"Error parsing file with unstructured: {e}")
             # Fallback or re-raise depending on requirements
-            return ""
+            return ParsedDocument()
+
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[str]:
+        """
+        Yield page texts in order as soon as they are extracted.
+        Raises TimeoutError if a PDF exceeds PDF_PARSE_TIMEOUT.
+        """
+        # Ensure path is absolute and uses correct separators for the OS
+        file_path = os.path.abspath(file_path)
+
+        # Specialized handling for PDF to avoid unstructured's onnxruntime dependency issues
+        if file_path.lower().endswith('.pdf'):
+            yielded = False
+            try:
+                # Large PDFs are extracted page-range-parallel in a process pool
+                for page_text in PdfParser.iter_pages(file_path):
+                    yielded = True
+                    yield page_text
+                return
+            except TimeoutError:
+                # unstructured would hit the same pages; don't burn more time on it
+                raise
+            except Exception as e:
+                if yielded:
+                    raise
+                log.error(f"pypdf extraction failed for {file_path}: {e}")
+                # If pypdf fails, we could try unstructured as fallback,
+                # but if it's an environment issue, it might crash.
+                # Let's try it anyway as a last resort or return empty.
+                log.info("Attempting fallback to unstructured...")
+
+        # DOCX / TXT / HTML: lightweight streaming readers, unstructured only as a fallback
+        reader = get_native_reader(file_path)
+        if reader is not None:
+            yielded = False
+            try:
+                for page_text in reader.iter_pages(file_path):
+                    yielded = True
+                    yield page_text
+                return
+            except Exception as e:
+                if yielded:
+                    raise
+                log.error(f"{reader.__name__} failed for {file_path}: {e}")
+                log.info("Attempting fallback to unstructured...")
+
+        # unstructured's auto partition detects file type and uses appropriate parser
+        # strategy="fast" uses pypdf for PDFs, avoiding heavy dependencies like onnxruntime/tesseract
+        # languages=["chi_sim", "eng"] helps suppress warnings and prepare for OCR if needed
+        # Imported lazily: unstructured pulls in hundreds of MB of models/deps at import time
+        from unstructured.partition.auto import partition
+
+        elements = partition(filename=file_path, strategy="fast", languages=["chi_sim", "eng"])
+
+        # Combine all elements into a single string
+        # Elements can be Title, NarrativeText, ListItem, etc.
+        yield "\n\n".join([str(el) for el in elements])
@@ -0,0 +1,342 @@
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PARAGRAPH_SEPARATOR = "\n\n"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P, _T, _TAB, _BR, _CR = _W + "p", _W + "t", _W + "tab", _W + "br", _W + "cr"
+_TBL, _TR, _TC, _BODY = _W + "tbl", _W + "tr", _W + "tc", _W + "body"
+_PSTYLE, _NUMID, _ILVL, _VAL, _TYPE = _W + "pStyle", _W + "numId", _W + "ilvl", _W + "val", _W + "type"
+
+_CN_DIGITS = "零一二三四五六七八九"
+_CN_UNITS = ["", "十", "百", "千"]
+
+
+def chinese_number(n: int) -> str:
+    """1 -> 一, 10 -> 十, 21 -> 二十一, 105 -> 一百零五 (up to 9999)."""
+    if n <= 0 or n >= 10000:
+        return str(n)
+    digits = [int(d) for d in str(n)]
+    result = ""
+    zero = False
+    for i, d in enumerate(digits):
+        unit = _CN_UNITS[len(digits) - i - 1]
+        if d == 0:
+            zero = True
+            continue
+        if zero:
+            result += "零"
+            zero = False
+        result += _CN_DIGITS[d] + unit
+    # 一十二 -> 十二
+    return result[1:] if result.startswith("一十") else result
+
+
+def _roman(n: int) -> str:
+    values = [(1000, "M"), (900, "CM"), (500, "D"), (400, "CD"), (100, "C"), (90, "XC"),
+              (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")]
+    result = ""
+    for value, symbol in values:
+        while n >= value:
+            result += symbol
+            n -= value
+    return result
+
+
+def _letter(n: int) -> str:
+    result = ""
+    while n > 0:
+        n, rem = divmod(n - 1, 26)
+        result = chr(ord("a") + rem) + result
+    return result
+
+
+def format_number(n: int, num_fmt: str) -> str:
+    if num_fmt in ("chineseCounting", "chineseCountingThousand", "ideographTraditional",
+                   "chineseLegalSimplified", "japaneseCounting"):
+        return chinese_number(n)
+    if num_fmt == "lowerLetter":
+        return _letter(n)
+    if num_fmt == "upperLetter":
+        return _letter(n).upper()
+    if num_fmt == "lowerRoman":
+        return _roman(n).lower()
+    if num_fmt == "upperRoman":
+        return _roman(n)
+    if num_fmt == "decimalEnclosedCircle" and 1 <= n <= 20:
+        return chr(0x2460 + n - 1)
+    if num_fmt in ("none", "bullet"):
+        return ""
+    return str(n)
+
+
+class DocxNumbering:
+    """
+    Renders Word list numbering ("第一条", "1.1", "(a)") from numbering.xml and
+    styles.xml, keeping one counter set per list instance like Word does.
+    """
+
+    def __init__(self, numbering_xml: Optional[bytes], styles_xml: Optional[bytes]):
+        # abstractNumId -> ilvl -> (numFmt, lvlText, start, isLgl)
+        self.abstract_levels: Dict[str, Dict[int, Tuple[str, str, int, bool]]] = {}
+        self.num_to_abstract: Dict[str, str] = {}
+        # styleId -> (numId, ilvl) for heading styles that carry numbering
+        self.style_numbering: Dict[str, Tuple[str, int]] = {}
+        self.counters: Dict[str, List[int]] = {}
+
+        if numbering_xml:
+            root = ET.fromstring(numbering_xml)
+            for abstract in root.iter(_W + "abstractNum"):
+                levels = {}
+                for lvl in abstract.iter(_W + "lvl"):
+                    fmt = lvl.find(_W + "numFmt")
+                    text = lvl.find(_W + "lvlText")
+                    start = lvl.find(_W + "start")
+                    levels[int(lvl.get(_W + "ilvl", 0))] = (
+                        fmt.get(_VAL) if fmt is not None else "decimal",
+                        text.get(_VAL, "") if text is not None else "",
+                        int(start.get(_VAL, 1)) if start is not None else 1,
+                        # "Legal" numbering renders every level in decimal: 第一条 -> 1.1
+                        lvl.find(_W + "isLgl") is not None,
+                    )
+                self.abstract_levels[abstract.get(_W + "abstractNumId")] = levels
+            for num in root.iter(_W + "num"):
+                abstract_id = num.find(_W + "abstractNumId")
+                if abstract_id is not None:
+                    self.num_to_abstract[num.get(_W + "numId")] = abstract_id.get(_VAL)
+
+        if styles_xml:
+            root = ET.fromstring(styles_xml)
+            for style in root.iter(_W + "style"):
+                num_pr = style.find(f"{_W}pPr/{_W}numPr")
+                if num_pr is None:
+                    continue
+                num_id = num_pr.find(_NUMID)
+                ilvl = num_pr.find(_ILVL)
+                if num_id is not None:
+                    self.style_numbering[style.get(_W + "styleId")] = (
+                        num_id.get(_VAL), int(ilvl.get(_VAL, 0)) if ilvl is not None else 0
+                    )
+
+    def label(self, num_id: Optional[str], ilvl: Optional[int], style_id: Optional[str]) -> str:
+        if num_id is None and style_id in self.style_numbering:
+            num_id, style_ilvl = self.style_numbering[style_id]
+            ilvl = style_ilvl if ilvl is None else ilvl
+        if num_id is None or num_id == "0":
+            return ""
+        levels = self.abstract_levels.get(self.num_to_abstract.get(num_id), {})
+        ilvl = ilvl or 0
+        if ilvl not in levels:
+            return ""
+
+        counters = self.counters.setdefault(num_id, [0] * 9)
+        counters[ilvl] = counters[ilvl] + 1 if counters[ilvl] else levels[ilvl][2]
+        for deeper in range(ilvl + 1, 9):
+            counters[deeper] = 0
+
+        num_fmt, lvl_text, _, is_legal = levels[ilvl]
+        if num_fmt == "bullet":
+            return "•"
+
+        def substitute(match):
+            level = int(match.group(1)) - 1
+            fmt, _, start, _ = levels.get(level, ("decimal", "", 1, False))
+            return format_number(counters[level] or start, "decimal" if is_legal else fmt)
+
+        return re.sub(r"%(\d)", substitute, lvl_text)
+
+
+class DocxReader:
+    """
+    Streaming DOCX text extraction straight from word/document.xml.
+    Paragraphs keep their list numbering, tables become "cell | cell" rows,
+    explicit page breaks start a new page. Parsed elements are discarded as
+    soon as they are consumed, so memory stays flat for large documents.
+    """
+
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[str]:
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+            numbering = DocxNumbering(
+                archive.read("word/numbering.xml") if "word/numbering.xml" in names else None,
+                archive.read("word/styles.xml") if "word/styles.xml" in names else None,
+            )
+            with archive.open("word/document.xml") as document:
+                for page in DocxReader._iter_document(document, numbering):
+                    yield page
+
+    @staticmethod
+    def _iter_document(document, numbering: DocxNumbering) -> Iterator[str]:
+        page_blocks: List[str] = []
+        # One entry per open paragraph: paragraphs nest inside text boxes (w:txbxContent)
+        paragraphs: List[Dict[str, Any]] = []
+        page_break = False
+        # One entry per open table: list of rows, each row a list of cell texts
+        tables: List[List[List[str]]] = []
+        cell_paragraphs: List[List[str]] = []
+        # Open paragraphs when each cell started, to tell which container is innermost
+        cell_depths: List[int] = []
+        body = None
+
+        def place(text: str):
+            """Add a finished paragraph/table to its innermost open container."""
+            if cell_paragraphs and cell_depths[-1] >= len(paragraphs):
+                cell_paragraphs[-1].append(text)
+            elif paragraphs:
+                # Text box content: kept in the enclosing paragraph, on its own line
+                runs = paragraphs[-1]["runs"]
+                runs.append(f"{text}\n" if runs and runs[-1].endswith("\n") else f"\n{text}\n")
+            else:
+                page_blocks.append(text)
+
+        for event, elem in ET.iterparse(document, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == _P:
+                    paragraphs.append({"runs": [], "num_id": None, "ilvl": None, "style_id": None})
+                elif tag == _TBL:
+                    tables.append([])
+                elif tag == _TR and tables:
+                    tables[-1].append([])
+                elif tag == _TC:
+                    cell_paragraphs.append([])
+                    cell_depths.append(len(paragraphs))
+                elif tag == _BODY:
+                    body = elem
+                continue
+
+            paragraph = paragraphs[-1] if paragraphs else None
+            if tag == _P:
+                paragraphs.pop()
+                text = "".join(paragraph["runs"]).strip()
+                if text:
+                    label = numbering.label(paragraph["num_id"], paragraph["ilvl"], paragraph["style_id"])
+                    if label:
+                        text = f"{label} {text}" if label != "•" else f"• {text}"
+                    place(text)
+                if page_break and not tables and not paragraphs:
+                    if page_blocks:
+                        yield PARAGRAPH_SEPARATOR.join(page_blocks)
+                    page_blocks = []
+                    page_break = False
+                elem.clear()
+            elif tag == _TC:
+                cell_text = " ".join(cell_paragraphs.pop()) if cell_paragraphs else ""
+                if cell_depths:
+                    cell_depths.pop()
+                if tables and tables[-1]:
+                    tables[-1][-1].append(cell_text)
+                elem.clear()
+            elif tag == _TBL:
+                rows = tables.pop() if tables else []
+                lines = [" | ".join(cells) for cells in rows if any(cells)]
+                table_text = "\n".join(lines)
+                if table_text:
+                    # A nested table is flattened into the enclosing cell
+                    place(table_text)
+                elem.clear()
+            elif tag in (_BR, _CR) and elem.get(_TYPE) == "page":
+                page_break = True
+            elif paragraph is None:
+                pass
+            elif tag == _T:
+                paragraph["runs"].append(elem.text or "")
+            elif tag == _TAB:
+                paragraph["runs"].append("\t")
+            elif tag in (_BR, _CR):
+                paragraph["runs"].append("\n")
+            elif tag == _PSTYLE:
+                paragraph["style_id"] = elem.get(_VAL)
+            elif tag == _NUMID:
+                paragraph["num_id"] = elem.get(_VAL)
+            elif tag == _ILVL:
+                paragraph["ilvl"] = int(elem.get(_VAL, 0))
+
+            # Drop finished top-level blocks from the tree to keep memory constant
+            if body is not None and tag in (_P, _TBL) and not tables and not paragraphs:
+                body.clear()
+
+        if page_blocks:
+            yield PARAGRAPH_SEPARATOR.join(page_blocks)
+
+
+class TextReader:
+    ENCODINGS = ("utf-8-sig", "gb18030", "utf-16")
+
+    @staticmethod
+    def read(file_path: str) -> str:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        for encoding in TextReader.ENCODINGS:
+            try:
+                text = data.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            text = data.decode("utf-8", errors="replace")
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[str]:
+        # Form feeds are the only page marker plain text has
+        for page in TextReader.read(file_path).split("\f"):
+            yield page.strip()
+
+
+class _HtmlTextParser(HTMLParser):
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+                  "section", "article", "table", "ul", "ol", "blockquote", "pre"}
+    SKIP_TAGS = {"script", "style", "head", "title", "noscript"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag in ("td", "th"):
+            self.parts.append(" | ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+class HtmlReader:
+    @staticmethod
+    def iter_pages(file_path: str) -> Iterator[str]:
+        parser = _HtmlTextParser()
+        parser.feed(TextReader.read(file_path))
+        parser.close()
+        lines = (re.sub(r"[ \t　]+", " ", line).strip(" |") for line in "".join(parser.parts).split("\n"))
+        yield PARAGRAPH_SEPARATOR.join(line for line in lines if line)
+
+
+# Extension -> reader; anything else (including legacy binary .doc) goes to unstructured
+NATIVE_READERS = {
+    ".docx": DocxReader,
+    ".txt": TextReader,
+    ".md": TextReader,
+    ".html": HtmlReader,
+    ".htm": HtmlReader,
+}
+
+
+def get_native_reader(file_path: str):
+    return NATIVE_READERS.get(os.path.splitext(file_path)[1].lower())
@@ -0,0 +1,133 @@
+import os
+import hashlib
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.log_utils import log
+
+OCR_ENABLED = os.getenv("OCR_ENABLED", "1") == "1"
+# 300 DPI is Tesseract's sweet spot for body text; lower it to trade accuracy for speed
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+OCR_LANG = os.getenv("OCR_LANG", "chi_sim+eng")
+# OCR is CPU-heavy: keep this small, it runs next to the web workers
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 2))
+# Total OCR time allowed per document, in seconds
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", 600))
+# Pages with less extracted text than this (and at least one image) are treated as scans
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", 10))
+OCR_CACHE_PREFIX = "artifacts/ocr"
+
+
+def _ocr_page(file_path: str, page_number: int, dpi: int, lang: str) -> str:
+    """Worker entry point: rasterize one page (1-based) and OCR it with local Tesseract."""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=True)
+    return "\n".join(pytesseract.image_to_string(image, lang=lang).strip() for image in images)
+
+
+class OcrPool:
+    """Bounded process pool for OCR, separate from the text-extraction pool."""
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            log.info(f"OCR pool started with {OCR_WORKERS} processes")
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls):
+        executor, cls._executor = cls._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _image_xobjects(page) -> List:
+    try:
+        resources = page.get("/Resources")
+        xobjects = resources.get_object().get("/XObject") if resources else None
+        if not xobjects:
+            return []
+        return [x.get_object() for x in xobjects.get_object().values()
+                if x.get_object().get("/Subtype") == "/Image"]
+    except Exception:
+        return []
+
+
+class OcrService:
+    @staticmethod
+    def is_image_only(page, page_text: str) -> bool:
+        return len(page_text.strip()) < OCR_MIN_TEXT_CHARS and bool(_image_xobjects(page))
+
+    @staticmethod
+    def page_fingerprint(page) -> str:
+        """Content hash of a page (drawing operators + embedded images + OCR settings)."""
+        hasher = hashlib.sha256(f"{OCR_DPI}:{OCR_LANG}".encode())
+        try:
+            contents = page.get_contents()
+            if contents is not None:
+                hasher.update(contents.get_data())
+        except Exception:
+            pass
+        for image in _image_xobjects(page):
+            hasher.update(image.get_data())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _cache_key(fingerprint: str) -> str:
+        return f"{OCR_CACHE_PREFIX}/{fingerprint}.txt"
+
+    @staticmethod
+    def fill_image_pages(file_path: str, reader, first_page: int, texts: List[str],
+                         timeout: float = OCR_TIMEOUT) -> Tuple[List[str], float]:
+        """
+        OCR the image-only pages among texts (page indexes first_page.. of reader)
+        and return (merged texts in page order, seconds spent).
+        Results are cached per page fingerprint, so re-uploads of the same scan are free.
+        """
+        started = time.monotonic()
+        targets = [i for i, text in enumerate(texts) if OcrService.is_image_only(reader.pages[first_page + i], text)]
+        if not targets:
+            return texts, 0.0
+
+        from app.core.storage import get_storage
+        storage = get_storage()
+        texts = list(texts)
+        pending: Dict[int, Tuple[str, object]] = {}
+        executor = None
+
+        for i in targets:
+            fingerprint = OcrService.page_fingerprint(reader.pages[first_page + i])
+            key = OcrService._cache_key(fingerprint)
+            if storage.exists(key):
+                texts[i] = storage.get_bytes(key).decode("utf-8")
+                continue
+            executor = executor or OcrPool.get_executor()
+            pending[i] = (key, executor.submit(_ocr_page, file_path, first_page + i + 1, OCR_DPI, OCR_LANG))
+
+        deadline = started + timeout
+        for i, (key, future) in pending.items():
+            page_number = first_page + i + 1
+            try:
+                text = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                # A failed page (timeout, missing tesseract/poppler) stays empty instead of failing the document
+                log.error(f"OCR failed for page {page_number} of {file_path}: {e!r}")
+                future.cancel()
+                continue
+            texts[i] = text
+            try:
+                storage.put_bytes(key, text.encode("utf-8"))
+            except Exception as e:
+                log.error(f"Failed to cache OCR result for page {page_number}: {e}")
+
+        log.info(f"OCR'd {len(pending)} of {len(targets)} scanned pages ({len(targets) - len(pending)} cached)")
+        return texts, time.monotonic() - started
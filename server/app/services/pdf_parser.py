@@ -0,0 +1,199 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from pypdf import PdfReader
+from app.services.ocr_service import OCR_ENABLED, OCR_TIMEOUT, OcrService
+from app.utils.log_utils import log
+
+# Number of worker processes used for per-page extraction (0/1 disables the pool)
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+# Hard limit for extracting one document, in seconds
+PDF_PARSE_TIMEOUT = float(os.getenv("PDF_PARSE_TIMEOUT", 120))
+# Pages handed to a worker per task; each task re-opens the PDF, so keep ranges coarse
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+# Below this page count a document is one pool task (still isolated and killable, just not fanned out)
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 24))
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Worker entry point: extract pages [start, end) of a PDF."""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def split_page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+
+class PdfParsePool:
+    """
+    Process pool shared by all PDF extractions in this worker process.
+    A document that times out with ranges still running retires the pool: new
+    work goes to a fresh one, and the old one's processes are killed once the
+    other documents' ranges on it are done (a pypdf loop on a malformed stream
+    never returns, and would otherwise hold its process forever).
+    """
+    _executor: Optional[ProcessPoolExecutor] = None
+    _pending: Set[Future] = set()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        with cls._lock:
+            return cls._get_executor()
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            # spawn keeps children clean of the web worker's threads and sockets
+            cls._executor = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            cls._pending = set()
+            log.info(f"PDF parse pool started with {PDF_PARSE_WORKERS} processes")
+        return cls._executor
+
+    @classmethod
+    def submit(cls, fn, *args) -> Future:
+        with cls._lock:
+            future = cls._get_executor().submit(fn, *args)
+            pending = cls._pending
+            pending.add(future)
+        future.add_done_callback(lambda done: cls._discard(pending, done))
+        return future
+
+    @classmethod
+    def _discard(cls, pending: Set[Future], future: Future):
+        with cls._lock:
+            pending.discard(future)
+
+    @classmethod
+    def retire(cls, stuck: Iterable[Future]):
+        """Take the pool running stuck (a timed-out document's ranges) out of service and reap it."""
+        stuck = set(stuck)
+        with cls._lock:
+            executor, pending = cls._executor, cls._pending
+            if executor is None or not stuck & pending:
+                # Already retired by another timed-out document
+                return
+            cls._executor, cls._pending = None, set()
+            others = pending - stuck
+        threading.Thread(
+            target=cls._reap, args=(executor, others), name="pdf-pool-reaper", daemon=True
+        ).start()
+
+    @staticmethod
+    def _reap(executor: ProcessPoolExecutor, others: Set[Future]):
+        # Other documents' ranges finish (or hit their own deadline) first
+        wait(others)
+        # No public API to kill the workers: terminate() is the only way to stop a hung range
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        log.warning("Retired a PDF parse pool with hung page ranges")
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class PdfParser:
+    @staticmethod
+    def extract_pages_serial(file_path: str, timeout: Optional[float] = None) -> List[str]:
+        """Original single-threaded loop, kept as the benchmark baseline."""
+        deadline = time.monotonic() + (timeout or PDF_PARSE_TIMEOUT)
+        reader = PdfReader(file_path)
+        pages = []
+        for page in reader.pages:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"PDF extraction exceeded {timeout or PDF_PARSE_TIMEOUT}s: {file_path}")
+            pages.append(page.extract_text() or "")
+        return pages
+
+    @staticmethod
+    def extract_pages(file_path: str, workers: Optional[int] = None, timeout: Optional[float] = None) -> List[str]:
+        """Extract the text of every page, in page order."""
+        return list(PdfParser.iter_pages(file_path, workers, timeout))
+
+    @staticmethod
+    def iter_pages(file_path: str, workers: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield page texts in page order as soon as each one is available.
+        Large documents are split into page ranges and extracted concurrently in
+        the process pool, so the pure-Python pypdf work no longer holds this
+        process's GIL; small ones are a single pool task. Image-only (scanned)
+        pages are OCR'd and merged in place.
+        Raises TimeoutError when text extraction exceeds the timeout; time the
+        caller takes to consume the pages is not counted. Ranges still running
+        then are killed with their pool (see PdfParsePool). Without a pool
+        (workers <= 1) the deadline can only be checked between pages.
+        """
+        workers = PDF_PARSE_WORKERS if workers is None else workers
+        timeout = timeout or PDF_PARSE_TIMEOUT
+        deadline = time.monotonic() + timeout
+        reader = PdfReader(file_path)
+        page_count = len(reader.pages)
+        ocr_budget = OCR_TIMEOUT
+
+        def with_ocr(first_page: int, pages: List[str]) -> List[str]:
+            # Scanned pages come back (almost) empty; OCR them and push the text
+            # deadline back by the OCR time so it only bounds text extraction
+            nonlocal deadline, ocr_budget
+            if not OCR_ENABLED or ocr_budget <= 0:
+                return pages
+            pages, spent = OcrService.fill_image_pages(file_path, reader, first_page, pages, ocr_budget)
+            deadline += spent
+            ocr_budget -= spent
+            return pages
+
+        def emit(pages: List[str]) -> Iterator[str]:
+            # Time spent suspended at a yield (the consumer's bounded queue is full)
+            # is backpressure, not extraction: push the deadline back by it
+            nonlocal deadline
+            for page_text in pages:
+                suspended = time.monotonic()
+                yield page_text
+                deadline += time.monotonic() - suspended
+
+        if workers <= 1:
+            # Batched so the scanned pages of one batch are OCR'd concurrently
+            for start, end in split_page_ranges(page_count, PDF_PAGES_PER_TASK):
+                pages = []
+                for i in range(start, end):
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"PDF extraction exceeded {timeout}s: {file_path}")
+                    pages.append(reader.pages[i].extract_text() or "")
+                yield from emit(with_ocr(start, pages))
+            return
+
+        if page_count < PDF_PARALLEL_MIN_PAGES:
+            ranges = [(0, page_count)] if page_count else []
+        else:
+            ranges = split_page_ranges(page_count, max(1, min(PDF_PAGES_PER_TASK, -(-page_count // workers))))
+        futures = [PdfParsePool.submit(_extract_page_range, file_path, start, end) for start, end in ranges]
+        timed_out = False
+        try:
+            # Ranges finish roughly in submission order; yield each as soon as its predecessors are out
+            for (start, _), future in zip(ranges, futures):
+                try:
+                    pages = future.result(timeout=max(deadline - time.monotonic(), 0))
+                except FutureTimeoutError:
+                    timed_out = True
+                    raise TimeoutError(f"PDF extraction exceeded {timeout}s: {file_path}")
+                yield from emit(with_ocr(start, pages))
+        finally:
+            # Queued ranges of this document are cancelled. Running ones left behind by a
+            # consumer that stopped early just finish; after a timeout they may never
+            # finish, so their processes are reaped with the pool
+            running = [future for future in futures if not future.cancel() and not future.done()]
+            if running and timed_out:
+                log.warning(f"{len(running)} page ranges of {file_path} still running, retiring the parse pool")
+                PdfParsePool.retire(running)
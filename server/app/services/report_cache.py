@@ -0,0 +1,176 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import time
+from typing import Dict, List, Optional
+
+from app.core.storage import LocalStorage
+from app.services.export_service import ExportService
+from app.utils.log_utils import log
+
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "uploads/reports")
+# Least recently served reports are deleted once the directory grows past this
+REPORT_CACHE_MAX_MB = int(os.getenv("REPORT_CACHE_MAX_MB", 500))
+# Reports looked up or written this recently are never evicted: a path handed out is still being served
+REPORT_CACHE_GRACE_SECONDS = int(os.getenv("REPORT_CACHE_GRACE_SECONDS", 300))
+# Render the report in the background when analysis finishes or a risk status changes
+REPORT_PREGENERATE = os.getenv("REPORT_PREGENERATE", "1") == "1"
+# Bump when the report context/rendering changes without the template file changing
+REPORT_RENDER_VERSION = 1
+
+
+class ReportCache:
+    """
+    Generated PDF reports stored under a content hash of (contract name,
+    analysis results, template), so identical inputs never render twice and
+    the hash doubles as the HTTP ETag. Files are written atomically; the
+    access time drives LRU eviction, and files used within the grace period
+    are kept even over the size limit (the atime is shared by all workers).
+    """
+
+    def __init__(self, export_service: ExportService, cache_dir: str = REPORT_CACHE_DIR,
+                 max_bytes: int = REPORT_CACHE_MAX_MB * 1024 * 1024,
+                 grace_seconds: int = REPORT_CACHE_GRACE_SECONDS):
+        self.export_service = export_service
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self.storage = LocalStorage(cache_dir)
+        self._template_version: Optional[str] = None
+        self._renders: Dict[str, asyncio.Future] = {}
+
+    @property
+    def template_version(self) -> str:
+        if self._template_version is None:
+            with open(os.path.join(self.export_service.template_path, "report.html"), "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:16]
+            self._template_version = f"{REPORT_RENDER_VERSION}:{digest}"
+        return self._template_version
+
+    def report_key(self, contract_name: str, analysis_results: List) -> str:
+        payload = json.dumps(
+            {"name": contract_name, "results": analysis_results or [], "template": self.template_version},
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def filename(key: str) -> str:
+        return f"{key}.pdf"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, self.filename(key))
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Path of the cached report, marking it as recently used; None on a miss."""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # Bump atime only: the storage ETag/Last-Modified stay tied to mtime
+        os.utime(path, (time.time(), stat.st_mtime))
+        return path
+
+    async def get_or_render(self, contract_name: str, analysis_results: List, key: Optional[str] = None) -> str:
+        """Return the path of the report, rendering it if it isn't cached."""
+        key = key or self.report_key(contract_name, analysis_results)
+        path = self.lookup(key)
+        if path:
+            return path
+        await self.render(key, contract_name, analysis_results)
+        return self._path(key)
+
+    async def render(self, key: str, contract_name: str, analysis_results: List) -> bytes:
+        """
+        Render the report to bytes and store it under key. Concurrent calls for the
+        same key share one render; the bytes can be sent without re-reading the file.
+        """
+        pending = self._renders.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._renders[key] = future
+        try:
+            pdf, _ = await self.export_service.render_pdf(contract_name, analysis_results)
+            await asyncio.to_thread(self._store, key, pdf)
+            future.set_result(pdf)
+            return pdf
+        except BaseException as e:
+            future.set_exception(e)
+            # Don't leave "exception never retrieved" warnings when nobody else waited
+            future.exception()
+            raise
+        finally:
+            self._renders.pop(key, None)
+
+    def _store(self, key: str, pdf: bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        # Unique scratch name: concurrent workers rendering the same key can't clobber each other
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{uuid.uuid4().hex}.pdf")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict(keep=path)
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Delete least recently used reports until the cache fits in max_bytes.
+        Reports used within grace_seconds are skipped: their paths may be in flight.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.endswith(".pdf") or entry.name.startswith("."):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        recent = time.time() - self.grace_seconds
+        for atime, size, path in entries:
+            if total <= self.max_bytes or atime >= recent:
+                # Sorted by atime: everything after this one is recent too
+                break
+            if keep and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        log.info(f"Report cache evicted down to {total / 1024 / 1024:.1f} MB")
+
+    async def pregenerate(self, contract_name: str, analysis_results: List):
+        """Fire-and-forget warmup; failures only get logged."""
+        if not REPORT_PREGENERATE or not analysis_results:
+            return
+        try:
+            await self.get_or_render(contract_name, analysis_results)
+        except Exception as e:
+            log.error(f"Report pre-generation failed for {contract_name}: {e}")
+
+    def pregenerate_from_thread(self, contract_name: str, analysis_results: List):
+        """Pre-generate from a sync endpoint / background task running in the threadpool."""
+        if not REPORT_PREGENERATE or not analysis_results:
+            return
+        import anyio.from_thread
+        try:
+            anyio.from_thread.run(self.pregenerate, contract_name, analysis_results)
+        except RuntimeError as e:
+            # Not inside an anyio worker thread (e.g. called from a script)
+            log.info(f"Skipping report pre-generation: {e}")
+
+
+report_cache = ReportCache(ExportService())
@@ -0,0 +1,134 @@
+import os
+import re
+import base64
+import hashlib
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from app.utils.log_utils import log
+
+# Family name the report template puts first in its font stack
+REPORT_FONT_FAMILY = "NexDoc Report"
+# Subset fonts down to the characters of each report (needs fontTools; brotli enables woff2)
+REPORT_FONT_SUBSET = os.getenv("REPORT_FONT_SUBSET", "1") == "1"
+SUBSET_CACHE_SIZE = 32
+
+FONT_EXTENSIONS = (".ttf", ".otf", ".woff", ".woff2")
+_WEIGHTS = [
+    ("extralight", 200), ("ultralight", 200), ("semibold", 600), ("demibold", 600),
+    ("extrabold", 800), ("ultrabold", 800), ("thin", 100), ("light", 300), ("medium", 500),
+    ("bold", 700), ("heavy", 800), ("black", 900),
+]
+_MIME = {".ttf": "font/ttf", ".otf": "font/otf", ".woff": "font/woff", ".woff2": "font/woff2"}
+
+
+def font_weight(filename: str) -> str:
+    """CSS font-weight from a file name: NotoSansSC-Bold.otf -> "700", variable fonts -> "100 900"."""
+    stem = os.path.splitext(filename)[0].lower()
+    if "variable" in stem or "[wght" in stem or stem.endswith("-vf"):
+        return "100 900"
+    style = stem.rsplit("-", 1)[-1] if "-" in stem else stem
+    for name, weight in _WEIGHTS:
+        if name in style:
+            return str(weight)
+    return "400"
+
+
+class ReportFonts:
+    """
+    Builds @font-face rules with the fonts in app/assets/fonts embedded as data
+    URLs, so the report renders without any network or file access. Fonts are
+    subset to the characters actually used by the report.
+    """
+
+    def __init__(self, fonts_dir: str):
+        self.fonts_dir = fonts_dir
+        self._files: Optional[List[Tuple[str, bytes]]] = None
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = Lock()
+        self._subsetter_ok: Optional[bool] = None
+
+    def _load_files(self) -> List[Tuple[str, bytes]]:
+        if self._files is None:
+            files = []
+            if os.path.isdir(self.fonts_dir):
+                for name in sorted(os.listdir(self.fonts_dir)):
+                    if name.lower().endswith(FONT_EXTENSIONS):
+                        with open(os.path.join(self.fonts_dir, name), "rb") as f:
+                            files.append((name, f.read()))
+            if not files:
+                log.warning(f"No report fonts in {self.fonts_dir}; falling back to system fonts "
+                            f"(see README.md there for how to provision them)")
+            self._files = files
+        return self._files
+
+    def _subset(self, data: bytes, text: str) -> Tuple[bytes, str]:
+        """Return (font bytes, extension) reduced to the glyphs for text."""
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+
+        options = subset.Options()
+        options.layout_features = ["*"]
+        options.notdef_outline = True
+        try:
+            import brotli  # noqa: F401
+            options.flavor = "woff2"
+        except ImportError:
+            options.flavor = None
+        font = TTFont(BytesIO(data))
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text=text)
+        subsetter.subset(font)
+        font.flavor = options.flavor
+        out = BytesIO()
+        font.save(out)
+        return out.getvalue(), ".woff2" if options.flavor else ".ttf"
+
+    def _can_subset(self) -> bool:
+        if self._subsetter_ok is None:
+            try:
+                import fontTools.subset  # noqa: F401
+                self._subsetter_ok = True
+            except ImportError:
+                log.info("fontTools not installed; embedding report fonts without subsetting")
+                self._subsetter_ok = False
+        return self._subsetter_ok
+
+    def font_faces(self, text: str) -> str:
+        """CSS @font-face rules covering every character in text."""
+        files = self._load_files()
+        if not files:
+            return ""
+        # Printable ASCII is always kept: numbers, dates and Latin text in the template
+        chars = "".join(sorted(set(text) | set(map(chr, range(0x20, 0x7f)))))
+        cache_key = hashlib.sha256(chars.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                return cached
+
+        subset = REPORT_FONT_SUBSET and self._can_subset()
+        rules = []
+        for name, data in files:
+            ext = os.path.splitext(name)[1].lower()
+            if subset:
+                try:
+                    data, ext = self._subset(data, chars)
+                except Exception as e:
+                    log.error(f"Failed to subset font {name}, embedding it whole: {e}")
+            style = "italic" if re.search(r"italic|oblique", name, re.I) else "normal"
+            rules.append(
+                "@font-face {"
+                f" font-family: \"{REPORT_FONT_FAMILY}\"; font-weight: {font_weight(name)}; font-style: {style};"
+                f" src: url(data:{_MIME[ext]};base64,{base64.b64encode(data).decode('ascii')});"
+                " }"
+            )
+        css = "\n".join(rules)
+        with self._lock:
+            self._cache[cache_key] = css
+            while len(self._cache) > SUBSET_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return css
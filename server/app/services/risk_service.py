@@ -0,0 +1,267 @@
+import os
+import json
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, func, or_
+from sqlalchemy.orm import load_only
+
+from app.core.redis import get_redis_client
+from app.models.contract import Contract
+from app.models.risk import Risk
+from app.services.tiering_service import tiering, COLD
+from app.utils.log_utils import log
+
+RISK_TYPES = ("high", "medium", "low")
+RISK_STATUSES = ("pending", "processing", "resolved")
+# Seconds the per-user stats facets are cached (also dropped on every risk write)
+RISK_STATS_TTL = int(os.getenv("RISK_STATS_TTL", 60))
+RISK_PAGE_MAX = 200
+
+_STATS_KEY = "risk_stats:{}"
+
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class VersionConflict(Exception):
+    """The contract changed since the version the client last saw."""
+
+    def __init__(self, current_version: Optional[int]):
+        super().__init__(f"Contract was modified (current version {current_version})")
+        self.current_version = current_version
+
+
+class RiskService:
+    """
+    Keeps the normalized risks table in step with Contract.analysis_results and
+    answers risk lists/stats with indexed SQL instead of walking the JSON.
+    """
+
+    @staticmethod
+    def build_rows(contract: Contract, results: Optional[List[Any]] = None) -> List[Risk]:
+        results = contract.analysis_results if results is None else results
+        if not isinstance(results, list):
+            return []
+        rows = []
+        for i, risk in enumerate(results):
+            if not isinstance(risk, dict):
+                continue
+            # Same fallback as the API id: the position when the AI gave no usable id
+            risk_no = _int_or_none(risk.get("id"))
+            rows.append(Risk(
+                contract_id=contract.id,
+                user_id=contract.user_id,
+                risk_no=i if risk_no is None else risk_no,
+                json_index=i,
+                type=str(risk.get("type") or "medium")[:20],
+                category=(risk.get("category") or "其他")[:100],
+                status=str(risk.get("status") or "pending")[:20],
+                title=(risk.get("title") or "Unknown Risk")[:255],
+                description=risk.get("description", ""),
+                suggestion=risk.get("suggestion", ""),
+                clause=risk.get("clause", ""),
+                clause_id=str(risk["clause_id"])[:64] if risk.get("clause_id") is not None else None,
+                clause_start=_int_or_none(risk.get("clause_start")),
+                clause_end=_int_or_none(risk.get("clause_end")),
+                ai_confidence=_int_or_none(risk.get("aiConfidence")),
+                created_at=contract.upload_date or datetime.utcnow(),
+            ))
+        return rows
+
+    def sync_contract(self, db, contract: Contract):
+        """Replace the contract's risk rows with its current analysis_results (caller commits)."""
+        db.query(Risk).filter(Risk.contract_id == contract.id).delete(synchronize_session=False)
+        db.add_all(self.build_rows(contract))
+
+    @staticmethod
+    def delete_contract(db, contract_id: int):
+        db.query(Risk).filter(Risk.contract_id == contract_id).delete(synchronize_session=False)
+
+    def backfill(self, db, batch_size: int = 200) -> int:
+        """
+        Create risk rows for analysed contracts that have none yet, and rebuild rows
+        written before json_index existed (statuses come from the mirrored JSON). Safe to re-run.
+        """
+        missing = ~exists().where(Risk.contract_id == Contract.id)
+        unindexed = exists().where(Risk.contract_id == Contract.id, Risk.json_index.is_(None))
+        ids = [row.id for row in db.query(Contract.id).filter(
+            Contract.analysis_results.isnot(None), or_(missing, unindexed)
+        ).all()]
+        created = 0
+        for start in range(0, len(ids), batch_size):
+            batch_ids = ids[start:start + batch_size]
+            db.query(Risk).filter(Risk.contract_id.in_(batch_ids)).delete(synchronize_session=False)
+            contracts = db.query(Contract).filter(Contract.id.in_(batch_ids)).all()
+            for contract in contracts:
+                rows = self.build_rows(contract)
+                db.add_all(rows)
+                created += len(rows)
+            db.commit()
+            # Contracts (and their JSON) are not needed after the batch is written
+            db.expunge_all()
+            log.info(f"Risk backfill: {min(start + batch_size, len(ids))}/{len(ids)} contracts")
+        return created
+
+    def patch_status(self, db, contract_id: int, risk_nos: List[int], status: str,
+                     expected_version: Optional[int] = None) -> Tuple[List[str], Optional[int]]:
+        """
+        Set the status of some of a contract's risks in the risks table and, with one
+        JSON_SET over their stored positions, in analysis_results, without reading the
+        document. Bumps Contract.version; with expected_version the write only applies
+        if nobody changed the contract since (else VersionConflict). Caller commits.
+        Returns (previous statuses of the matched risks, new version); ([], None) if none matched.
+        """
+        # Contract row first (same lock order as re-analysis), so the tiering job can't
+        # move the document out from under the JSON_SET; a cold document is rehydrated
+        contract = db.query(Contract).options(
+            load_only(Contract.id, Contract.results_tier, Contract.last_accessed_at)
+        ).filter(Contract.id == contract_id).with_for_update().first()
+        if contract is None:
+            return [], None
+        tiering.touch(db, contract)
+        if contract.results_tier == COLD:
+            tiering.rehydrate_results(db, contract)
+
+        rows = db.query(Risk.id, Risk.status, Risk.json_index).filter(
+            Risk.contract_id == contract_id, Risk.risk_no.in_(risk_nos)
+        ).with_for_update().all()
+        if not rows:
+            return [], None
+
+        paths = []
+        for row in rows:
+            if row.json_index is not None:
+                paths += [f"$[{row.json_index}].status", status]
+        values = {Contract.version: Contract.version + 1}
+        if paths:
+            values[Contract.analysis_results] = func.json_set(Contract.analysis_results, *paths)
+
+        query = db.query(Contract).filter(Contract.id == contract_id)
+        if expected_version is not None:
+            query = query.filter(Contract.version == expected_version)
+        if not query.update(values, synchronize_session=False):
+            raise VersionConflict(db.query(Contract.version).filter(Contract.id == contract_id).scalar())
+
+        db.query(Risk).filter(Risk.id.in_([row.id for row in rows])).update(
+            {Risk.status: status}, synchronize_session=False
+        )
+        version = db.query(Contract.version).filter(Contract.id == contract_id).scalar()
+        return [row.status for row in rows], version
+
+    @staticmethod
+    def encode_cursor(risk: Risk) -> str:
+        raw = json.dumps([risk.created_at.isoformat() if risk.created_at else None, risk.id])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+        """Raises ValueError on anything that isn't a cursor we issued."""
+        try:
+            created_at, risk_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            return (datetime.fromisoformat(created_at) if created_at else None), int(risk_id)
+        except (TypeError, ValueError, json.JSONDecodeError) as e:
+            raise ValueError(f"Invalid cursor: {e}")
+
+    def list_risks(self, db, user_id: int, filters: Dict[str, Any], limit: int = 50,
+                   cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of the user's risks, newest contract first. Keyset pagination on
+        (created_at, id) through ix_risks_user_created, so page N costs the same as page 1.
+        """
+        limit = max(1, min(limit, RISK_PAGE_MAX))
+        query = db.query(Risk, Contract.name, Contract.upload_date).join(
+            Contract, Contract.id == Risk.contract_id
+        ).filter(Risk.user_id == user_id)
+
+        if filters.get("status"):
+            query = query.filter(Risk.status == filters["status"])
+        if filters.get("type"):
+            query = query.filter(Risk.type == filters["type"])
+        if filters.get("category"):
+            query = query.filter(Risk.category == filters["category"])
+        if filters.get("contract_id"):
+            query = query.filter(Risk.contract_id == filters["contract_id"])
+        if filters.get("date_from"):
+            query = query.filter(Risk.created_at >= filters["date_from"])
+        if filters.get("date_to"):
+            query = query.filter(Risk.created_at <= filters["date_to"])
+        if filters.get("q"):
+            pattern = f"%{filters['q']}%"
+            query = query.filter(or_(
+                Risk.title.like(pattern), Risk.description.like(pattern), Contract.name.like(pattern)
+            ))
+
+        if cursor:
+            created_at, last_id = self.decode_cursor(cursor)
+            if created_at is None:
+                # Rows without a date sort last; only the id decides within them
+                query = query.filter(Risk.created_at.is_(None), Risk.id < last_id)
+            else:
+                query = query.filter(or_(
+                    Risk.created_at < created_at,
+                    and_(Risk.created_at == created_at, Risk.id < last_id),
+                    Risk.created_at.is_(None),
+                ))
+
+        rows = query.order_by(Risk.created_at.desc(), Risk.id.desc()).limit(limit + 1).all()
+        next_cursor = self.encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+        return [self.to_dict(risk, name, upload_date) for risk, name, upload_date in rows[:limit]], next_cursor
+
+    def stats(self, db, user_id: int) -> Dict[str, Any]:
+        """Type / category facet counts, cached per user for RISK_STATS_TTL seconds."""
+        redis_client = get_redis_client()
+        key = _STATS_KEY.format(user_id)
+        if redis_client:
+            cached = redis_client.get(key)
+            if cached:
+                return json.loads(cached)
+
+        def facet(column) -> Dict[str, int]:
+            return {
+                value: count for value, count in
+                db.query(column, func.count(Risk.id)).filter(Risk.user_id == user_id).group_by(column).all()
+            }
+
+        result = {"type": facet(Risk.type), "category": facet(Risk.category)}
+        if redis_client:
+            redis_client.set(key, json.dumps(result, ensure_ascii=False), ex=RISK_STATS_TTL)
+        return result
+
+    @staticmethod
+    def invalidate_stats(user_id: Optional[int]):
+        """Call after committing a change to the user's risks."""
+        if user_id is None:
+            return
+        redis_client = get_redis_client()
+        if redis_client:
+            redis_client.delete(_STATS_KEY.format(user_id))
+
+    @staticmethod
+    def to_dict(risk: Risk, contract_name: str, upload_date: Optional[datetime]) -> Dict[str, Any]:
+        """Frontend shape of a risk (the one /risks has always returned)."""
+        date = upload_date or risk.created_at or datetime.utcnow()
+        return {
+            "id": f"{risk.contract_id}_{risk.risk_no}",  # Unique combined ID
+            "original_id": risk.risk_no,
+            "contract_id": risk.contract_id,
+            "title": risk.title,
+            "contract": contract_name,
+            "type": risk.type,
+            "category": risk.category or "其他",
+            "status": risk.status,
+            "date": date.strftime("%Y-%m-%d"),
+            "aiConfidence": risk.ai_confidence if risk.ai_confidence is not None else 90,
+            "description": risk.description or "",
+            "suggestion": risk.suggestion or "",
+            "clause": risk.clause or "",
+            "clause_id": risk.clause_id,
+        }
+
+
+risk_service = RiskService()
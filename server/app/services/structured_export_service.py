@@ -0,0 +1,345 @@
+import os
+import io
+import csv
+import json
+import zipfile
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from app.core.database import SessionLocal
+from app.models.contract import Contract, ContractColdResults
+from app.services.batch_export_service import filter_contracts
+from app.services.report_cache import report_cache
+from app.services.tiering_service import decompress
+from app.utils.log_utils import log
+
+# Contracts fetched per round trip; only this many analysis results are in memory at once
+STRUCTURED_EXPORT_BATCH = int(os.getenv("STRUCTURED_EXPORT_BATCH", 50))
+ExportRow = namedtuple("ExportRow", "id name contract_type upload_date analysis_results")
+# Bytes buffered before a chunk is sent to the client
+STRUCTURED_EXPORT_CHUNK = 64 * 1024
+# Excel refuses to open sheets with more rows than this (header included)
+XLSX_MAX_ROWS = 1048576
+XLSX_MAX_CELL_CHARS = 32767
+
+FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx"),
+}
+
+LEVELS = {"high": "高", "medium": "中", "low": "低"}
+STATUSES = {"pending": "待处理", "processing": "处理中", "resolved": "已解决"}
+REVISION_AUTHOR = "NexDoc"
+
+# (key, header, xlsx column width)
+COLUMNS = [
+    ("contract_id", "合同ID", 9),
+    ("contract_name", "合同名称", 28),
+    ("contract_type", "合同类型", 12),
+    ("upload_date", "上传时间", 18),
+    ("risk_id", "风险编号", 9),
+    ("level", "风险等级", 9),
+    ("title", "风险标题", 30),
+    ("status", "状态", 9),
+    ("clause_id", "条款编号", 9),
+    ("description", "风险描述", 50),
+    ("suggestion", "修改建议", 50),
+    ("clause", "原文条款", 50),
+]
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="风险清单" sheetId="1" r:id="rId1"/></sheets>'
+        '<definedNames><definedName name="_xlnm._FilterDatabase" localSheetId="0" hidden="1">\'风险清单\'!$A$1:${last}$1</definedName></definedNames>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Style 1: bold header, style 2: wrapped top-aligned text
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0" applyAlignment="1"><alignment vertical="top" wrapText="1"/></xf></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+_DOCX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+        '</Relationships>'
+    ),
+    "word/_rels/document.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    "word/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        '<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:eastAsia="Microsoft YaHei"/><w:sz w:val="21"/></w:rPr></w:rPrDefault>'
+        '<w:pPrDefault><w:pPr><w:spacing w:after="120" w:line="300" w:lineRule="auto"/></w:pPr></w:pPrDefault></w:docDefaults>'
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+        '<w:pPr><w:jc w:val="center"/></w:pPr><w:rPr><w:b/><w:sz w:val="40"/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>'
+        '<w:pPr><w:keepNext/><w:spacing w:before="240"/><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Heading2"><w:name w:val="heading 2"/><w:basedOn w:val="Normal"/>'
+        '<w:pPr><w:keepNext/><w:spacing w:before="200"/><w:outlineLvl w:val="1"/></w:pPr><w:rPr><w:b/><w:sz w:val="24"/></w:rPr></w:style>'
+        '</w:styles>'
+    ),
+}
+
+
+def column_letter(index: int) -> str:
+    """1 -> A, 27 -> AA"""
+    letters = ""
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, unseekable sink for ZipFile; the bytes are drained as they are produced."""
+
+    def __init__(self):
+        self._data = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._data += b
+        return len(b)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._data)
+        self._data.clear()
+        return data
+
+
+def iter_zip(parts: Iterable[Tuple[str, Iterable[str]]]) -> Iterator[bytes]:
+    """
+    Stream a ZIP whose members are produced as iterables of text. The archive is
+    written to an unseekable buffer (sizes go into data descriptors), so nothing
+    but the current chunk is held in memory.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, chunks in parts:
+            with zf.open(name, "w") as member:
+                for chunk in chunks:
+                    member.write(chunk.encode("utf-8"))
+                    if len(buffer) >= STRUCTURED_EXPORT_CHUNK:
+                        yield buffer.drain()
+            if len(buffer) >= STRUCTURED_EXPORT_CHUNK:
+                yield buffer.drain()
+    yield buffer.drain()
+
+
+def _buffered(chunks: Iterable[str]) -> Iterator[bytes]:
+    parts: List[str] = []
+    size = 0
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= STRUCTURED_EXPORT_CHUNK:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+class StructuredExportService:
+    """
+    Browser-free exports of analysis results: XLSX / CSV / JSONL risk tables and
+    a DOCX redline (tracked changes from clause to suggestion). Everything is a
+    generator over a streamed database cursor, so memory stays flat whether one
+    contract or thousands are exported. Templates and report context come from
+    the same ExportService as the PDF report.
+    """
+
+    def __init__(self, export_service):
+        self.export_service = export_service
+
+    # --- Data ---
+
+    @staticmethod
+    def iter_contracts(user_id: int, contract_ids: Optional[List[int]] = None,
+                       filters: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+        """
+        Analysed contracts of user_id, newest first. The session is owned by the
+        generator: StreamingResponse keeps pulling after the request's session is gone.
+        """
+        db = SessionLocal()
+        try:
+            # Cold contracts are decoded from the side table on the fly, without rehydrating them
+            query = db.query(
+                Contract.id, Contract.name, Contract.contract_type, Contract.upload_date, Contract.analysis_results,
+                ContractColdResults.codec, ContractColdResults.payload
+            ).outerjoin(ContractColdResults, ContractColdResults.contract_id == Contract.id).filter(
+                Contract.user_id == user_id,
+                or_(Contract.analysis_results.isnot(None), ContractColdResults.contract_id.isnot(None))
+            )
+            query = filter_contracts(query, contract_ids, filters)
+            # yield_per streams from a server-side cursor instead of buffering the whole result
+            for row in query.order_by(Contract.upload_date.desc(), Contract.id.desc()).yield_per(STRUCTURED_EXPORT_BATCH):
+                results = row.analysis_results
+                if results is None:
+                    results = decompress(row.codec, row.payload)
+                yield ExportRow(row.id, row.name, row.contract_type, row.upload_date, results)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _risks(row) -> List[Dict[str, Any]]:
+        results = row.analysis_results
+        return [r for r in results if isinstance(r, dict)] if isinstance(results, list) else []
+
+    def iter_records(self, contracts: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+        """One flat record per risk."""
+        for row in contracts:
+            upload_date = row.upload_date.strftime("%Y-%m-%d %H:%M") if row.upload_date else ""
+            for i, risk in enumerate(self._risks(row)):
+                status = risk.get("status", "pending")
+                yield {
+                    "contract_id": row.id,
+                    "contract_name": row.name,
+                    "contract_type": row.contract_type or "未分类",
+                    "upload_date": upload_date,
+                    "risk_id": risk.get("id", i),
+                    "level": LEVELS.get(risk.get("type"), risk.get("type") or ""),
+                    "title": risk.get("title", ""),
+                    "status": STATUSES.get(status, status),
+                    "clause_id": risk.get("clause_id") or "",
+                    "description": risk.get("description", ""),
+                    "suggestion": risk.get("suggestion", ""),
+                    "clause": risk.get("clause", ""),
+                }
+
+    def iter_reports(self, contracts: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+        """The PDF report's template context, one contract at a time."""
+        for row in contracts:
+            risks = [r for r in self._risks(row) if r.get("type") in LEVELS]
+            context = self.export_service.report_context(row.name, risks)
+            context["contract_type"] = row.contract_type
+            yield context
+
+    # --- Formats ---
+
+    def iter_csv(self, contracts: Iterable[Any]) -> Iterator[bytes]:
+        def lines():
+            out = io.StringIO()
+            writer = csv.writer(out)
+            # BOM so Excel opens the UTF-8 file with the right encoding
+            out.write("\ufeff")
+            writer.writerow([header for _, header, _ in COLUMNS])
+            for record in self.iter_records(contracts):
+                writer.writerow([record[key] for key, _, _ in COLUMNS])
+                yield out.getvalue()
+                out.seek(0)
+                out.truncate()
+            yield out.getvalue()
+
+        return _buffered(lines())
+
+    def iter_jsonl(self, contracts: Iterable[Any]) -> Iterator[bytes]:
+        return _buffered(
+            json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            for record in self.iter_records(contracts)
+        )
+
+    def iter_xlsx(self, contracts: Iterable[Any]) -> Iterator[bytes]:
+        last_column = column_letter(len(COLUMNS))
+
+        def rows():
+            for count, record in enumerate(self.iter_records(contracts), start=1):
+                if count >= XLSX_MAX_ROWS:
+                    log.warning(f"XLSX export truncated at {XLSX_MAX_ROWS - 1} risks")
+                    return
+                yield [
+                    value if isinstance(value, int) else str(value)[:XLSX_MAX_CELL_CHARS]
+                    for value in (record[key] for key, _, _ in COLUMNS)
+                ]
+
+        # Inline strings instead of a shared string table, which would have to be kept in memory
+        sheet = self.export_service.template_env.get_template("export/sheet.xml").generate(
+            headers=[header for _, header, _ in COLUMNS],
+            widths=[width for _, _, width in COLUMNS],
+            last_column=last_column,
+            rows=rows(),
+        )
+        parts = [(name, [xml.replace("{last}", last_column)]) for name, xml in _XLSX_PARTS.items()]
+        parts.append(("xl/worksheets/sheet1.xml", sheet))
+        return iter_zip(parts)
+
+    def iter_docx(self, contracts: Iterable[Any]) -> Iterator[bytes]:
+        now = datetime.now(timezone.utc)
+        document = self.export_service.template_env.get_template("export/document.xml").generate(
+            date=now.astimezone().strftime("%Y-%m-%d %H:%M:%S"),
+            revision_date=now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            author=REVISION_AUTHOR,
+            levels=LEVELS,
+            reports=self.iter_reports(contracts),
+        )
+        parts = [(name, [xml]) for name, xml in _DOCX_PARTS.items()]
+        parts.append(("word/document.xml", document))
+        return iter_zip(parts)
+
+    def export(self, fmt: str, contracts: Iterable[Any]) -> Iterator[bytes]:
+        return getattr(self, f"iter_{fmt}")(contracts)
+
+
+structured_export_service = StructuredExportService(report_cache.export_service)
@@ -0,0 +1,164 @@
+import os
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, or_
+
+from app.core.redis import get_redis_client
+from app.models.activity import Activity
+from app.models.stats import UserStats
+from app.models.user import User
+
+# Seconds team members / stats are cached (dropped early when a member is added)
+TEAM_CACHE_TTL = int(os.getenv("TEAM_CACHE_TTL", 30))
+TEAM_PAGE_MAX = 200
+# Window for the per-member "recent activities" count
+ACTIVITY_WINDOW_DAYS = 30
+
+_VERSION_KEY = "team:version"
+
+
+def time_ago(moment: Optional[datetime], now: Optional[datetime] = None, never: str = "从未登录") -> str:
+    if not moment:
+        return never
+    diff = (now or datetime.utcnow()) - moment
+    if diff.days > 0:
+        return f"{diff.days} 天前"
+    if diff.seconds > 3600:
+        return f"{diff.seconds // 3600} 小时前"
+    if diff.seconds > 60:
+        return f"{diff.seconds // 60} 分钟前"
+    return "刚刚"
+
+
+def _display_name():
+    return func.coalesce(User.full_name, User.email)
+
+
+def _iso(moment: Optional[datetime]) -> Optional[str]:
+    return moment.isoformat() if moment else None
+
+
+class TeamAnalyticsService:
+    """
+    Team page queries as grouped SQL: one query per member page (contract counts
+    come from the user_stats aggregate), one grouped activity query for the page
+    and one conditional-count query for the stats cards. Results are cached raw
+    (timestamps, not "3 天前") so relative times stay correct when served from cache.
+    """
+
+    SORT_FIELDS = {
+        "name": _display_name,
+        "email": lambda: User.email,
+        "role": lambda: User.role,
+        "department": lambda: User.department,
+        "status": lambda: User.status,
+        "lastActive": lambda: User.last_active,
+        "contracts": lambda: func.coalesce(UserStats.contracts, 0),
+    }
+
+    # --- Cache ---
+
+    @staticmethod
+    def _cache_key(redis_client, kind: str, params: Dict[str, Any]) -> str:
+        # Keys embed a version counter so invalidate() drops every variant without a SCAN
+        version = redis_client.get(_VERSION_KEY) or 0
+        return f"team:{version}:{kind}:{json.dumps(params, sort_keys=True, ensure_ascii=False)}"
+
+    def _cached(self, kind: str, params: Dict[str, Any], compute):
+        redis_client = get_redis_client()
+        if not redis_client:
+            return compute()
+        key = self._cache_key(redis_client, kind, params)
+        cached = redis_client.get(key)
+        if cached:
+            return json.loads(cached)
+        result = compute()
+        redis_client.set(key, json.dumps(result, ensure_ascii=False), ex=TEAM_CACHE_TTL)
+        return result
+
+    @staticmethod
+    def invalidate():
+        """Call after committing a change to team membership or member fields."""
+        redis_client = get_redis_client()
+        if redis_client:
+            redis_client.incr(_VERSION_KEY)
+
+    # --- Queries ---
+
+    def members(self, db, q: Optional[str] = None, sort: str = "name", order: str = "asc",
+                limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """{"total", "members"}; raises ValueError on an unknown sort field."""
+        if sort not in self.SORT_FIELDS:
+            raise ValueError(f"Unknown sort field: {sort}")
+        limit = max(1, min(limit, TEAM_PAGE_MAX))
+        offset = max(0, offset)
+        params = {"q": q or "", "sort": sort, "order": order, "limit": limit, "offset": offset}
+        return self._cached("members", params, lambda: self._query_members(db, **params))
+
+    def _query_members(self, db, q: str, sort: str, order: str, limit: int, offset: int) -> Dict[str, Any]:
+        query = db.query(User, func.coalesce(UserStats.contracts, 0)).outerjoin(
+            UserStats, UserStats.user_id == User.id
+        )
+        if q:
+            pattern = f"%{q}%"
+            query = query.filter(or_(User.full_name.like(pattern), User.email.like(pattern)))
+
+        column = self.SORT_FIELDS[sort]()
+        column = column.desc() if order == "desc" else column.asc()
+        total = query.order_by(None).count()
+        rows = query.order_by(column, User.id).limit(limit).offset(offset).all()
+
+        activity = self._activity_by_user(db, [user.id for user, _ in rows])
+        members = []
+        for user, contracts in rows:
+            recent, last_activity = activity.get(user.id, (0, None))
+            members.append({
+                "id": user.id,
+                "name": user.full_name or user.email.split('@')[0],
+                "email": user.email,
+                "role": user.role,
+                "department": user.department,
+                "status": user.status,
+                "contracts": int(contracts),
+                "lastActiveAt": _iso(user.last_active),
+                "recentActivities": recent,
+                "lastActivityAt": _iso(last_activity),
+                "avatar": user.avatar,
+            })
+        return {"total": total, "members": members}
+
+    @staticmethod
+    def _activity_by_user(db, user_ids: List[int]) -> Dict[int, Tuple[int, Optional[datetime]]]:
+        """Recent activity count and last activity time for a page of members, one grouped query."""
+        if not user_ids:
+            return {}
+        since = datetime.utcnow() - timedelta(days=ACTIVITY_WINDOW_DAYS)
+        rows = db.query(
+            Activity.user_id,
+            func.coalesce(func.sum(case((Activity.timestamp >= since, 1), else_=0)), 0),
+            func.max(Activity.timestamp),
+        ).filter(Activity.user_id.in_(user_ids)).group_by(Activity.user_id).all()
+        return {user_id: (int(recent), last) for user_id, recent, last in rows}
+
+    def stats(self, db) -> Dict[str, int]:
+        return self._cached("stats", {}, lambda: self._query_stats(db))
+
+    @staticmethod
+    def _query_stats(db) -> Dict[str, int]:
+        month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        def count_if(condition):
+            return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+        total, pending, admins, active = db.query(
+            func.count(User.id),
+            count_if(User.status == "pending"),
+            count_if(User.role == "admin"),
+            count_if(User.last_active >= month_start),
+        ).one()
+        return {"members": int(total), "pending": int(pending), "admins": int(admins), "active_this_month": int(active)}
+
+
+team_analytics = TeamAnalyticsService()
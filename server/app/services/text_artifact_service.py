@@ -0,0 +1,122 @@
+import gzip
+import json
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterator, Optional
+
+from app.core.storage import get_storage
+from app.services.file_parser import FileParser, ParsedDocument
+from app.utils.log_utils import log
+
+# Bump when extraction output changes (new parser, OCR...) so stale artifacts are ignored
+ARTIFACT_VERSION = 4
+ARTIFACT_PREFIX = "artifacts/text"
+# Parsed documents kept in memory for page-by-page viewer requests
+MEMORY_CACHE_SIZE = 16
+
+
+class TextArtifactService:
+    """
+    Persists the extracted text of a contract file as a gzip'd JSON artifact,
+    keyed by the SHA-256 of the original file, next to the originals in storage.
+    The artifact carries the page -> character offset index from ParsedDocument.
+    """
+
+    def __init__(self):
+        self._cache: "OrderedDict[str, ParsedDocument]" = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def artifact_key(file_hash: str) -> str:
+        return f"{ARTIFACT_PREFIX}/{file_hash}.v{ARTIFACT_VERSION}.json.gz"
+
+    def _remember(self, file_hash: str, document: ParsedDocument):
+        with self._lock:
+            self._cache[file_hash] = document
+            self._cache.move_to_end(file_hash)
+            while len(self._cache) > MEMORY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def load(self, file_hash: str) -> Optional[ParsedDocument]:
+        """Return the stored artifact for file_hash, or None if it was never parsed."""
+        with self._lock:
+            document = self._cache.get(file_hash)
+        if document is not None:
+            return document
+
+        storage = get_storage()
+        key = self.artifact_key(file_hash)
+        if not storage.exists(key):
+            return None
+        try:
+            payload = json.loads(gzip.decompress(storage.get_bytes(key)).decode("utf-8"))
+            document = ParsedDocument(text=payload["text"], page_offsets=payload["page_offsets"])
+        except Exception as e:
+            log.error(f"Corrupt text artifact {key}: {e}")
+            return None
+        self._remember(file_hash, document)
+        return document
+
+    def save(self, file_hash: str, document: ParsedDocument):
+        payload = json.dumps({
+            "version": ARTIFACT_VERSION,
+            "sha256": file_hash,
+            "page_offsets": document.page_offsets,
+            "text": document.text,
+        }, ensure_ascii=False).encode("utf-8")
+        get_storage().put_bytes(self.artifact_key(file_hash), gzip.compress(payload, compresslevel=6))
+        self._remember(file_hash, document)
+
+    def get_document(self, storage_key: str, file_hash: Optional[str] = None) -> ParsedDocument:
+        """
+        Load the parsed text of a stored contract file, parsing it (and persisting
+        the artifact) only the first time this file content is seen.
+        """
+        storage = get_storage()
+        file_hash = file_hash or storage.sha256(storage_key)
+
+        document = self.load(file_hash)
+        if document is not None:
+            log.info(f"Loaded text artifact for {storage_key} ({file_hash[:12]})")
+            return document
+
+        with storage.local_copy(storage_key) as local_path:
+            document = FileParser.extract_document(local_path)
+
+        # Don't persist failures; a later retry (e.g. after a parser fix) should re-parse
+        if document.text:
+            try:
+                self.save(file_hash, document)
+            except Exception as e:
+                log.error(f"Failed to persist text artifact for {storage_key}: {e}")
+        return document
+
+    def iter_pages(self, storage_key: str, file_hash: Optional[str] = None) -> Iterator[str]:
+        """
+        Streaming variant of get_document: yield page texts as the parser produces
+        them, then persist the artifact once the whole file has been read.
+        """
+        storage = get_storage()
+        file_hash = file_hash or storage.sha256(storage_key)
+
+        document = self.load(file_hash)
+        if document is not None:
+            for page_text in document.pages():
+                yield page_text
+            return
+
+        pages = []
+        with storage.local_copy(storage_key) as local_path:
+            for page_text in FileParser.iter_pages(local_path):
+                pages.append(page_text)
+                yield page_text
+
+        document = ParsedDocument.from_pages(pages)
+        if document.text:
+            try:
+                self.save(file_hash, document)
+            except Exception as e:
+                log.error(f"Failed to persist text artifact for {storage_key}: {e}")
+
+
+text_artifact_service = TextArtifactService()
@@ -0,0 +1,260 @@
+import os
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.storage import get_storage, get_cold_storage
+from app.models.contract import Contract, ContractColdResults
+from app.utils.log_utils import log
+
+# Contracts not opened for this many days are moved to the cold tier
+TIERING_COLD_AFTER_DAYS = int(os.getenv("TIERING_COLD_AFTER_DAYS", 180))
+# Contracts handled per job transaction
+TIERING_BATCH_SIZE = int(os.getenv("TIERING_BATCH_SIZE", 100))
+TIERING_ZSTD_LEVEL = int(os.getenv("TIERING_ZSTD_LEVEL", 10))
+# last_accessed_at is only rewritten when older than this, so reads don't all turn into writes
+TIERING_TOUCH_SECONDS = int(os.getenv("TIERING_TOUCH_SECONDS", 3600))
+
+HOT, COLD = "hot", "cold"
+
+try:
+    import zstandard
+except ImportError:  # Optional: tiering falls back to zlib, the codec is stored per row
+    zstandard = None
+
+
+def compress(results: List[Any]) -> Tuple[str, bytes, int]:
+    """Returns (codec, payload, raw size)."""
+    raw = json.dumps(results, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=TIERING_ZSTD_LEVEL).compress(raw), len(raw)
+    return "zlib", zlib.compress(raw, 9), len(raw)
+
+
+def decompress(codec: str, payload: bytes) -> List[Any]:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed analysis results")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == "zlib":
+        raw = zlib.decompress(payload)
+    else:
+        raise ValueError(f"Unknown codec: {codec}")
+    return json.loads(raw.decode("utf-8"))
+
+
+class TieringService:
+    """
+    Hot/cold tiering of contracts nobody opened for TIERING_COLD_AFTER_DAYS.
+
+    run() compresses analysis_results into contract_cold_results (NULLing the hot
+    column) and moves originals to the cold storage backend. Single-contract reads
+    rehydrate what they need back into the hot tier; bulk exports decode cold
+    results in place without promoting them. Metadata (name, size, type, risks
+    table) never moves, so lists, /archive and stats don't care about tiers.
+    """
+
+    # --- Access tracking ---
+
+    def touch(self, db, contract) -> bool:
+        """Record a read of contract (caller commits). Returns whether a write was issued."""
+        now = datetime.utcnow()
+        last = contract.last_accessed_at
+        if last and (now - last).total_seconds() < TIERING_TOUCH_SECONDS:
+            return False
+        db.query(Contract).filter(Contract.id == contract.id).update(
+            {Contract.last_accessed_at: now}, synchronize_session=False
+        )
+        set_committed_value(contract, "last_accessed_at", now)
+        return True
+
+    # --- Rehydration ---
+
+    def rehydrate_results(self, db, contract) -> List[Any]:
+        """
+        Move contract's analysis_results back into the hot column (caller commits)
+        and return them. Safe against concurrent rehydration of the same contract.
+        """
+        if contract.results_tier != COLD:
+            return contract.analysis_results or []
+        row = db.query(ContractColdResults.codec, ContractColdResults.payload).filter(
+            ContractColdResults.contract_id == contract.id
+        ).first()
+        if row is None:
+            # Someone else rehydrated it in the meantime
+            db.refresh(contract, ["analysis_results", "results_tier"])
+            return contract.analysis_results or []
+
+        results = decompress(row.codec, row.payload)
+        db.query(Contract).filter(Contract.id == contract.id, Contract.results_tier == COLD).update(
+            {Contract.analysis_results: results, Contract.results_tier: HOT}, synchronize_session=False
+        )
+        db.query(ContractColdResults).filter(ContractColdResults.contract_id == contract.id).delete(
+            synchronize_session=False
+        )
+        set_committed_value(contract, "analysis_results", results)
+        set_committed_value(contract, "results_tier", HOT)
+        log.info(f"Rehydrated analysis results of contract {contract.id}")
+        return results
+
+    def cold_results(self, db, contract_ids: Iterable[int]) -> Dict[int, List[Any]]:
+        """Decode cold results for bulk reads without moving them back (contract_id -> results)."""
+        ids = list(contract_ids)
+        if not ids:
+            return {}
+        rows = db.query(ContractColdResults.contract_id, ContractColdResults.codec, ContractColdResults.payload).filter(
+            ContractColdResults.contract_id.in_(ids)
+        ).all()
+        return {row.contract_id: decompress(row.codec, row.payload) for row in rows}
+
+    @staticmethod
+    def restore_file(key: str):
+        """Copy an original back from the cold backend (no DB access: run it off the event loop)."""
+        hot = get_storage()
+        if hot.exists(key):
+            return
+        # The cold copy is kept: tiering the contract again is then only a flag flip
+        with get_cold_storage().local_copy(key) as local_path, open(local_path, "rb") as f:
+            hot.save(key, f)
+        log.info(f"Rehydrated original {key} from cold storage")
+
+    @staticmethod
+    def lock_file_tier(db, contract) -> Optional[str]:
+        """
+        Row-lock the contract (SELECT ... FOR UPDATE) until the caller commits. The
+        tiering job takes the same lock before deleting a hot original, so a
+        restore_file() repeated under it can't be undone by that delete.
+        """
+        return db.query(Contract.file_tier).filter(Contract.id == contract.id).with_for_update().scalar()
+
+    @staticmethod
+    def mark_file_hot(db, contract):
+        """Flag the original as back in hot storage (after restore_file under lock_file_tier; caller commits)."""
+        db.query(Contract).filter(Contract.id == contract.id).update(
+            {Contract.file_tier: HOT}, synchronize_session=False
+        )
+        set_committed_value(contract, "file_tier", HOT)
+
+    def ensure_file(self, db, contract):
+        """Sync callers (background analysis): restore_file + mark_file_hot, re-checked under the row lock."""
+        if contract.file_tier == COLD:
+            self.restore_file(contract.file_path)
+            self.lock_file_tier(db, contract)
+            self.restore_file(contract.file_path)
+            self.mark_file_hot(db, contract)
+
+    # --- Removal ---
+
+    @staticmethod
+    def forget_results(db, contract):
+        """Drop the cold copy of analysis_results, e.g. because they are being replaced."""
+        db.query(ContractColdResults).filter(ContractColdResults.contract_id == contract.id).delete(
+            synchronize_session=False
+        )
+        contract.results_tier = HOT
+
+    @staticmethod
+    def delete_file(key: str):
+        """Remove an original from both tiers."""
+        get_storage().delete(key)
+        cold = get_cold_storage()
+        if cold.exists(key):
+            cold.delete(key)
+
+    # --- Job ---
+
+    def candidates(self, db, cutoff: datetime, limit: Optional[int] = None) -> List[int]:
+        query = db.query(Contract.id).filter(
+            Contract.last_accessed_at < cutoff,
+            Contract.status != "analyzing",
+            or_(
+                (Contract.results_tier == HOT) & Contract.analysis_results.isnot(None),
+                Contract.file_tier == HOT,
+            )
+        ).order_by(Contract.last_accessed_at)
+        if limit:
+            query = query.limit(limit)
+        return [row.id for row in query.all()]
+
+    def run(self, db, older_than_days: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, int]:
+        """Move idle contracts to the cold tier. Safe to re-run and to run while serving."""
+        days = TIERING_COLD_AFTER_DAYS if older_than_days is None else older_than_days
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        ids = self.candidates(db, cutoff, limit)
+        stats = {"contracts": len(ids), "results": 0, "raw_bytes": 0, "compressed_bytes": 0, "files": 0}
+
+        for start in range(0, len(ids), TIERING_BATCH_SIZE):
+            batch = ids[start:start + TIERING_BATCH_SIZE]
+            rows = db.query(
+                Contract.id, Contract.version, Contract.analysis_results, Contract.results_tier,
+                Contract.file_path, Contract.file_tier
+            ).filter(Contract.id.in_(batch)).all()
+
+            for row in rows:
+                if row.results_tier == HOT and row.analysis_results is not None:
+                    moved = self._freeze_results(db, row, cutoff)
+                    if moved:
+                        stats["results"] += 1
+                        stats["raw_bytes"] += moved[0]
+                        stats["compressed_bytes"] += moved[1]
+            db.commit()
+
+            for row in rows:
+                if row.file_tier == HOT and row.file_path:
+                    try:
+                        if self._freeze_file(db, row, cutoff):
+                            stats["files"] += 1
+                    except Exception as e:
+                        db.rollback()
+                        log.error(f"Tiering: could not move original of contract {row.id}: {e}")
+            log.info(f"Tiering: {min(start + TIERING_BATCH_SIZE, len(ids))}/{len(ids)} contracts")
+        return stats
+
+    @staticmethod
+    def _freeze_results(db, row, cutoff: datetime) -> Optional[Tuple[int, int]]:
+        codec, payload, raw_bytes = compress(row.analysis_results)
+        # Guarded on version and access time: a status patch or a read since we loaded the row wins
+        updated = db.query(Contract).filter(
+            Contract.id == row.id, Contract.version == row.version,
+            Contract.results_tier == HOT, Contract.last_accessed_at < cutoff
+        ).update({Contract.analysis_results: None, Contract.results_tier: COLD}, synchronize_session=False)
+        if not updated:
+            return None
+        db.query(ContractColdResults).filter(ContractColdResults.contract_id == row.id).delete(
+            synchronize_session=False
+        )
+        db.add(ContractColdResults(contract_id=row.id, codec=codec, payload=payload, raw_bytes=raw_bytes))
+        return raw_bytes, len(payload)
+
+    @staticmethod
+    def _freeze_file(db, row, cutoff: datetime) -> bool:
+        hot, cold = get_storage(), get_cold_storage()
+        stat = hot.stat(row.file_path)
+        if stat is None:
+            log.error(f"Tiering: original {row.file_path} of contract {row.id} is missing")
+            return False
+        cold_stat = cold.stat(row.file_path)
+        if cold_stat is None or cold_stat.size != stat.size:
+            with hot.local_copy(row.file_path) as local_path, open(local_path, "rb") as f:
+                if cold.save(row.file_path, f) != stat.size:
+                    raise IOError(f"size mismatch copying {row.file_path} to cold storage")
+
+        updated = db.query(Contract).filter(
+            Contract.id == row.id, Contract.file_tier == HOT, Contract.last_accessed_at < cutoff
+        ).update({Contract.file_tier: COLD}, synchronize_session=False)
+        db.commit()
+        if not updated:
+            return False
+        # Only after the flag is committed (until then readers still expect the hot copy), and
+        # under the row lock restores take: one that marked it hot since then keeps its copy
+        if db.query(Contract.file_tier).filter(Contract.id == row.id).with_for_update().scalar() == COLD:
+            hot.delete(row.file_path)
+        db.commit()
+        return True
+
+
+tiering = TieringService()
@@ -0,0 +1,212 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.redis import get_redis_client
+from app.models.user import User
+from app.utils.log_utils import log
+
+# Seconds a resolved user is reused; also bounds staleness while Redis is unreachable
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+# Users kept per worker process (least recently used dropped first)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 1024))
+
+_CHANNEL = "user_cache:invalidate"
+_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+_DIRTY_KEY = "user_cache_dirty"
+
+
+class UserCache:
+    """
+    Per-process TTL + LRU cache of the users behind access tokens, keyed by the
+    token subject (email). The token itself is still verified on every request;
+    only the users lookup is skipped. Users changed or deleted through the ORM are
+    dropped after commit and the subject is published on Redis, so the other
+    workers drop it too. Bulk query().update() on users bypasses the ORM events:
+    call invalidate() after it.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation: a lookup that raced one is not cached
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._listener: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._subscribed = False
+
+    # --- Lookup ---
+
+    def _get(self, subject: str) -> Tuple[Optional[User], int]:
+        self._ensure_listener()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(subject)
+                self.hits += 1
+                return self._materialize(entry[1]), self._epoch
+            if entry:
+                del self._entries[subject]
+            self.misses += 1
+            return None, self._epoch
+
+    def _put(self, subject: str, user: User, epoch: int):
+        if USER_CACHE_TTL <= 0 or USER_CACHE_SIZE <= 0:
+            return
+        values = {key: getattr(user, key) for key in _COLUMNS}
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._entries[subject] = (time.monotonic() + USER_CACHE_TTL, values)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _materialize(values: Dict[str, Any]) -> User:
+        # A fresh detached instance per request: callers never share (or mutate) one object
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def resolve(self, subject: str, load: Callable[[], Optional[User]]) -> Optional[User]:
+        """Cached user for subject, else load() (a DB lookup) and remember the result."""
+        user, epoch = self._get(subject)
+        if user is None:
+            user = load()
+            if user is not None:
+                self._put(subject, user, epoch)
+        return user
+
+    async def aresolve(self, subject: str, load: Callable[[], Awaitable[Optional[User]]]) -> Optional[User]:
+        user, epoch = self._get(subject)
+        if user is None:
+            user = await load()
+            if user is not None:
+                self._put(subject, user, epoch)
+        return user
+
+    # --- Invalidation ---
+
+    def _drop(self, subject: str):
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += 1
+            self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def invalidate(self, *subjects: str):
+        """Drop subjects here and, via Redis pub/sub, in every other worker."""
+        for subject in subjects:
+            self._drop(subject)
+        redis_client = get_redis_client()
+        if not redis_client:
+            return
+        try:
+            for subject in subjects:
+                redis_client.publish(_CHANNEL, subject)
+        except RedisError as e:
+            log.error(f"User cache invalidation not published: {e}")
+
+    def _ensure_listener(self):
+        # Started lazily (and again after a fork) so the gunicorn master never owns it
+        if self._listener and self._listener.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener and self._listener.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name="user-cache", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        reconnecting = False
+        while True:
+            redis_client = get_redis_client()
+            if not redis_client:
+                time.sleep(5)
+                continue
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(_CHANNEL)
+                if reconnecting:
+                    # Anything published while we were disconnected is lost: start over
+                    self.clear()
+                self._subscribed = True
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        self._drop(message["data"])
+            except RedisError as e:
+                log.error(f"User cache listener disconnected: {e}")
+            finally:
+                self._subscribed = False
+                reconnecting = True
+                try:
+                    pubsub.close()
+                except RedisError:
+                    pass
+            time.sleep(1)
+
+    # --- Metrics ---
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": USER_CACHE_SIZE,
+                "ttl_seconds": USER_CACHE_TTL,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "subscribed": self._subscribed,
+            }
+
+
+user_cache = UserCache()
+
+
+# --- ORM hooks: invalidate once the change is committed ---
+
+def _mark_dirty(mapper, connection, target: User):
+    subjects = {target.email}
+    # An email change must also drop the entry under the old subject
+    subjects.update(inspect(target).attrs.email.history.deleted or ())
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).update(s for s in subjects if s)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_dirty(session):
+    subjects = session.info.pop(_DIRTY_KEY, None)
+    if subjects:
+        user_cache.invalidate(*subjects)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dirty(session):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+event.listen(User, "after_update", _mark_dirty)
+event.listen(User, "after_delete", _mark_dirty)
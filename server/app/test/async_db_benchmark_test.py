@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import asyncio
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from sqlalchemy import select, text
+
+from app.core.database import SessionLocal, AsyncSessionLocal, async_engine, SQLALCHEMY_DATABASE_URL
+from app.models.contract import Contract
+
+TICK = 0.005  # 事件循环探针间隔 (秒)
+
+
+def query(latency: float):
+    """模拟一次接口查询; MySQL 上可用 SLEEP() 放大网络往返"""
+    if latency and SQLALCHEMY_DATABASE_URL.startswith("mysql"):
+        return text("SELECT SLEEP(:s)").bindparams(s=latency)
+    return select(Contract.id, Contract.status).order_by(Contract.id).limit(1)
+
+
+async def sync_in_loop(latency):
+    """旧实现: async 接口里直接用同步 Session, 查询期间事件循环被占住"""
+    db = SessionLocal()
+    try:
+        db.execute(query(latency)).first()
+    finally:
+        db.close()
+
+
+async def async_session(latency):
+    async with AsyncSessionLocal() as db:
+        (await db.execute(query(latency))).first()
+
+
+async def probe(lags, stop):
+    """每 TICK 秒醒一次, 记录实际晚了多久 = 事件循环延迟"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(name, make_request, total, concurrency, latency):
+    lags, stop = [], asyncio.Event()
+    prober = asyncio.create_task(probe(lags, stop))
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with slots:
+            await make_request(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await prober
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p95 = lags_ms[int(len(lags_ms) * 0.95) - 1] if len(lags_ms) > 1 else lags_ms[0]
+    print(f"{name:<12} {total / elapsed:8.1f} 请求/秒  循环延迟 p50 {statistics.median(lags_ms):6.1f} ms"
+          f"  p95 {p95:6.1f} ms  max {lags_ms[-1]:6.1f} ms")
+
+
+async def main(total, concurrency, latency):
+    print(f"--- {total} 次查询, 并发 {concurrency}, 模拟往返 {latency * 1000:.0f} ms ---")
+    # 预热两个连接池, 不计入
+    await sync_in_loop(0)
+    await async_session(0)
+    await run("同步 Session", sync_in_loop, total, concurrency, latency)
+    await run("异步 Session", async_session, total, concurrency, latency)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    asyncio.run(main(total, concurrency, latency))
@@ -0,0 +1,48 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.services.clause_segmenter import split_clauses
+
+SAMPLE = """软件开发技术服务协议
+甲方：某某科技有限公司
+乙方：某某软件服务提供商
+第一条 服务内容
+1.1 乙方应向甲方提供定制化软件开发服务，具体需求见附件。
+1.2 乙方有权根据实际情况自行调整开发计划，无需经过甲方同意。
+第二条 验收标准
+2.1 软件交付后，甲方应在3日内完成验收。如甲方未在3日内提出书面异议，视为验收通过。
+2.2 验收标准以乙方开发完成时的实际功能为准。
+Article 3 Governing Law
+(a) This agreement is governed by the laws of the PRC.
+"""
+
+
+def print_tree(clause, text, indent=0):
+    first_line = text[clause.start:clause.end].strip().split("\n")[0][:40]
+    print(f"{'  ' * indent}[{clause.id}] {clause.number or '-'} {clause.title} ({clause.start}-{clause.end}) {first_line}")
+    for child in clause.children:
+        print_tree(child, text, indent + 1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = SAMPLE
+    max_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    chunks, segmenter = split_clauses(text, max_tokens)
+    print("--- 条款树 ---")
+    for root in segmenter.roots:
+        print_tree(root, text)
+
+    print(f"\n--- {len(chunks)} 个分块 (max_tokens={max_tokens}) ---")
+    for i, chunk in enumerate(chunks):
+        print(f"#{i + 1} {chunk.start}-{chunk.end} 条款: {', '.join(chunk.clause_ids)}")
+
+    # 分块首尾相接、无重叠
+    assert all(a.end == b.start for a, b in zip(chunks, chunks[1:])), "分块之间存在重叠或缺口"
+    print("\n分块连续且无重叠")
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.services.native_readers import DocxReader
+
+
+def measure(name, func, file_path, rounds=3):
+    """返回 (最佳耗时秒, 峰值 Python 内存 MB, 文本长度)"""
+    best = float("inf")
+    text = ""
+    for _ in range(rounds):
+        start = time.perf_counter()
+        text = func(file_path)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(file_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    size_mb = os.path.getsize(file_path) / 1024 / 1024
+    print(f"{name:<14} {best:7.3f}s  {size_mb / best:7.2f} MB/s  峰值内存 {peak / 1024 / 1024:7.1f} MB  {len(text)} 字符")
+    return best, peak, len(text)
+
+
+def native_docx(file_path):
+    return "\n\n".join(DocxReader.iter_pages(file_path))
+
+
+def unstructured_docx(file_path):
+    from unstructured.partition.auto import partition
+    elements = partition(filename=file_path, strategy="fast", languages=["chi_sim", "eng"])
+    return "\n\n".join(str(el) for el in elements)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python docx_parse_benchmark_test.py <合同.docx>")
+        sys.exit(1)
+
+    path = sys.argv[1]
+    print(f"--- {path} ---")
+    # unstructured 首次导入本身就要数秒，单独计时
+    start = time.perf_counter()
+    import unstructured.partition.auto  # noqa: F401
+    print(f"unstructured 导入耗时: {time.perf_counter() - start:.2f}s")
+
+    native = measure("native", native_docx, path)
+    baseline = measure("unstructured", unstructured_docx, path)
+    print(f"加速比: {baseline[0] / native[0]:.1f}x, 内存比: {baseline[1] / max(native[1], 1):.1f}x")
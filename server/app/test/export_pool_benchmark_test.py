@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.services.browser_pool import BrowserPool, RenderMetrics
+
+HTML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resource", "test.html")
+FILE_URL = f"file:///{HTML_PATH.replace(os.sep, '/')}"
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resource", "bench_out")
+
+
+async def render(page, index):
+    await page.goto(FILE_URL, wait_until="networkidle")
+    await page.pdf(path=os.path.join(OUTPUT_DIR, f"{index}.pdf"), format="A4", print_background=True)
+
+
+async def launch_per_export(index, metrics):
+    """旧实现: 每次导出启动一个 Chromium"""
+    from playwright.async_api import async_playwright
+    start = time.perf_counter()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await render(page, index)
+        await browser.close()
+    metrics.record(time.perf_counter() - start)
+
+
+async def pooled_export(pool, index, metrics):
+    start = time.perf_counter()
+    async with pool.lease() as page:
+        await render(page, index)
+    metrics.record(time.perf_counter() - start)
+
+
+async def run(name, make_task, total, concurrency):
+    metrics = RenderMetrics()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with slots:
+            await make_task(i, metrics)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    elapsed = time.perf_counter() - start
+    snap = metrics.snapshot()
+    print(f"{name:<18} {total / elapsed:6.2f} 次/秒  p50 {snap['p50_ms']} ms  p95 {snap['p95_ms']} ms")
+
+
+async def main(total, concurrency):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    print(f"--- {total} 次导出, 并发 {concurrency} ---")
+    await run("每次启动浏览器", launch_per_export, total, concurrency)
+
+    pool = BrowserPool(size=concurrency)
+    await pool.start()  # 预热不计入
+    try:
+        await run("浏览器池", lambda i, m: pooled_export(pool, i, m), total, concurrency)
+    finally:
+        await pool.shutdown()
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    asyncio.run(main(total, concurrency))
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from pypdf import PdfReader, PdfWriter
+from app.services.pdf_parser import PdfParser, PdfParsePool, PDF_PARSE_WORKERS
+
+SAMPLES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../assets/sample_contracts"))
+
+
+def build_large_pdf(source_path: str, target_pages: int) -> str:
+    """把样例合同的页面重复拼接成一份 target_pages 页的大合同"""
+    reader = PdfReader(source_path)
+    writer = PdfWriter()
+    while len(writer.pages) < target_pages:
+        for page in reader.pages:
+            if len(writer.pages) >= target_pages:
+                break
+            writer.add_page(page)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def run_benchmark(pdf_path: str, rounds: int = 3):
+    page_count = len(PdfReader(pdf_path).pages)
+    print(f"--- {pdf_path}: {page_count} 页, pool={PDF_PARSE_WORKERS} ---")
+
+    # 预热进程池，避免把进程启动时间算进并行结果
+    PdfParser.extract_pages(pdf_path)
+
+    serial_best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        serial_pages = PdfParser.extract_pages_serial(pdf_path)
+        serial_best = min(serial_best, time.perf_counter() - start)
+
+    parallel_best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        parallel_pages = PdfParser.extract_pages(pdf_path)
+        parallel_best = min(parallel_best, time.perf_counter() - start)
+
+    assert serial_pages == parallel_pages, "并行结果与串行结果不一致"
+    print(f"串行: {serial_best:.2f}s, {page_count / serial_best:.1f} 页/秒")
+    print(f"并行: {parallel_best:.2f}s, {page_count / parallel_best:.1f} 页/秒")
+    print(f"加速比: {serial_best / parallel_best:.2f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run_benchmark(sys.argv[1])
+    else:
+        source = os.path.join(SAMPLES_DIR, sorted(f for f in os.listdir(SAMPLES_DIR) if f.endswith(".pdf"))[0])
+        large_pdf = build_large_pdf(source, 200)
+        try:
+            run_benchmark(large_pdf)
+        finally:
+            os.remove(large_pdf)
+    PdfParsePool.shutdown()
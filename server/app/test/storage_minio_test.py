@@ -0,0 +1,43 @@
+import io
+import os
+import sys
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from app.core.storage import S3Storage, LocalStorage
+
+# 本地启动 MinIO 作为 S3 替身:
+#   docker run -p 9000:9000 -e MINIO_ROOT_USER=minioadmin -e MINIO_ROOT_PASSWORD=minioadmin minio/minio server /data
+ENDPOINT = os.getenv("S3_ENDPOINT_URL", "http://127.0.0.1:9000")
+ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "minioadmin")
+SECRET_KEY = os.getenv("S3_SECRET_KEY", "minioadmin")
+
+
+def check_backend(storage):
+    key = f"test_{uuid.uuid4().hex}.bin"
+    payload = os.urandom(300 * 1024)
+
+    size = storage.save(key, io.BytesIO(payload))
+    assert size == len(payload), f"size mismatch: {size}"
+
+    stat = storage.stat(key)
+    assert stat is not None and stat.size == len(payload)
+    assert stat.etag.startswith('"')
+
+    assert b"".join(storage.iter_range(key)) == payload
+    assert b"".join(storage.iter_range(key, 100, 199)) == payload[100:200]
+    assert b"".join(storage.iter_range(key, len(payload) - 10)) == payload[-10:]
+
+    with storage.local_copy(key) as path:
+        with open(path, "rb") as f:
+            assert f.read() == payload
+
+    storage.delete(key)
+    assert not storage.exists(key)
+    print(f"OK: {type(storage).__name__}")
+
+
+if __name__ == "__main__":
+    check_backend(LocalStorage(os.path.join(os.path.dirname(__file__), "resource", "storage")))
+    check_backend(S3Storage("nexdoc-test", endpoint_url=ENDPOINT, access_key=ACCESS_KEY, secret_key=SECRET_KEY, region="us-east-1"))
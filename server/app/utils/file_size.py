@@ -0,0 +1,25 @@
+import re
+
+_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+
+def parse_size(size_str: str) -> float:
+    """Parse a legacy size string (e.g., '1.2 MB') to bytes. Only the migration still needs this."""
+    if not size_str:
+        return 0
+    
+    match = re.match(r"([\d.]+)\s*([A-Za-z]+)", size_str)
+    if match:
+        value, unit = match.groups()
+        return float(value) * _UNITS.get(unit.upper(), 1)
+    return 0
+
+
+def format_size(size_bytes: float, precision: int = 1) -> str:
+    """Format bytes to string."""
+    size_bytes = size_bytes or 0
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.{precision}f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.{precision}f} TB"
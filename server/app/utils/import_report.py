@@ -0,0 +1,90 @@
+"""
+Import-time report for the API entry point.
+
+    python -m app.utils.import_report [module] [--top N]
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter, prints the
+slowest top-level packages and checks that heavy dependencies stay lazy.
+Exits with status 1 when the budget is exceeded or a lazy module was imported eagerly.
+"""
+import os
+import re
+import subprocess
+import sys
+
+# Total import time allowed for app.main, in milliseconds
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 1500))
+
+# Must only be imported on first use (parsing, analysis, export)
+LAZY_MODULES = [
+    "unstructured",
+    "playwright",
+    "langgraph",
+    "langchain_openai",
+    "langchain_core",
+    "langchain_text_splitters",
+    "jinja2",
+    "tiktoken",
+]
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def collect(module: str = "app.main"):
+    """Return [(name, self_us, cumulative_us, depth)] for every module imported by `module`."""
+    server_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=server_dir,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def report(module: str = "app.main", top: int = 15) -> bool:
+    rows = collect(module)
+    total_ms = next((cum for name, _, cum, _ in rows if name == module), 0) / 1000
+    imported = {name for name, _, _, _ in rows}
+
+    print(f"Import time of {module}: {total_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    print(f"Modules imported: {len(rows)}")
+    print()
+    print("Slowest top-level packages:")
+    packages = {}
+    for name, _, cumulative_us, depth in rows:
+        root = name.split(".")[0]
+        if name == root:
+            packages[root] = max(packages.get(root, 0), cumulative_us)
+    for name, cumulative_us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    eager = [m for m in LAZY_MODULES if m in imported]
+    print()
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+    else:
+        print("OK: heavy dependencies stay lazy")
+
+    within_budget = total_ms <= IMPORT_TIME_BUDGET_MS
+    print(f"{'OK' if within_budget else 'FAIL'}: import time {'within' if within_budget else 'over'} budget")
+    return within_budget and not eager
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    top = 15
+    if "--top" in args:
+        i = args.index("--top")
+        top = int(args[i + 1])
+        del args[i:i + 2]
+    sys.exit(0 if report(args[0] if args else "app.main", top) else 1)
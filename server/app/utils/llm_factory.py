@@ -1,8 +1,11 @@
 import os
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from app.utils.log_utils import log
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 
 class LLMFactory:
     """LLM 实例化工厂类，支持多种模型供应商切换"""
@@ -16,7 +19,7 @@ class LLMFactory:
     }
 
     @classmethod
-    def get_llm(cls, provider: str = "zhipu", **kwargs) -> ChatOpenAI:
+    def get_llm(cls, provider: str = "zhipu", **kwargs) -> "ChatOpenAI":
         """
         获取 LLM 实例
         :param provider: 供应商名称 ('zhipu', 'deepseek', 'openai')
@@ -40,6 +43,9 @@ class LLMFactory:
         log.info(f"Initializing LLM: Provider={provider}, Model={model_name}, BaseURL={base_url}")
 
         # 统一使用 ChatOpenAI 接口，因为智谱、DeepSeek 都兼容 OpenAI 协议
+        # 延迟导入：langchain_openai 较重，只在真正创建 LLM 时加载
+        from langchain_openai import ChatOpenAI
+
         return ChatOpenAI(
             model=model_name,
             api_key=api_key,
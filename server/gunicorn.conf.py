@@ -0,0 +1,19 @@
+# gunicorn app.main:app -c gunicorn.conf.py
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+workers = int(os.getenv("WEB_CONCURRENCY", 4))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "127.0.0.1:8000")
+
+
+def on_starting(server):
+    # Runs once in the master before any worker is forked, instead of once per worker
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from app.core.startup import run_startup_tasks, STARTUP_DONE_ENV
+    run_startup_tasks()
+    os.environ[STARTUP_DONE_ENV] = "1"
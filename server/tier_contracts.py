@@ -0,0 +1,25 @@
+import argparse
+
+from app.core.database import SessionLocal
+from app.models import user, contract, activity, knowledge, risk, stats # Import to register
+from app.services.tiering_service import tiering, TIERING_COLD_AFTER_DAYS
+
+def main():
+    parser = argparse.ArgumentParser(description="Move contracts nobody opened recently to the cold tier")
+    parser.add_argument("--days", type=int, default=TIERING_COLD_AFTER_DAYS,
+                        help=f"idle days before a contract goes cold (default {TIERING_COLD_AFTER_DAYS})")
+    parser.add_argument("--limit", type=int, default=None, help="at most this many contracts per run")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = tiering.run(db, older_than_days=args.days, limit=args.limit)
+    finally:
+        db.close()
+    ratio = result["compressed_bytes"] / result["raw_bytes"] if result["raw_bytes"] else 0
+    print(f"Candidates: {result['contracts']}, results compressed: {result['results']} "
+          f"({result['raw_bytes']} -> {result['compressed_bytes']} bytes, {ratio:.0%}), "
+          f"originals moved: {result['files']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,46 @@
-from app.core.database import engine, Base
+import sys
+from app.core.database import engine, Base, SessionLocal
 from sqlalchemy import text
-from app.models import user, activity, knowledge # Import to register
+from app.models import user, contract, activity, knowledge, risk, stats # Import to register
+from app.services.risk_service import risk_service
+from app.services.dashboard_stats_service import dashboard_stats
+from app.core.storage import get_storage
+from app.utils.file_size import parse_size
 
-def update_schema():
+def backfill_file_sizes(db, batch_size: int = 500) -> int:
+    """
+    Fill file_size_bytes for rows created before the column: the stored file's
+    size when it is still there, else the legacy formatted string parsed back.
+    """
+    has_legacy = True
+    try:
+        db.execute(text("SELECT file_size FROM contracts LIMIT 1"))
+    except Exception:
+        db.rollback()
+        has_legacy = False
+    legacy = "file_size" if has_legacy else "NULL"
+
+    storage = get_storage()
+    updated, last_id = 0, 0
+    while True:
+        rows = db.execute(text(
+            f"SELECT id, file_path, {legacy} FROM contracts "
+            "WHERE file_size_bytes = 0 AND id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": batch_size}).all()
+        if not rows:
+            break
+        for contract_id, file_path, legacy_size in rows:
+            stat = storage.stat(file_path) if file_path else None
+            size = stat.size if stat else int(parse_size(legacy_size))
+            if size:
+                db.execute(text("UPDATE contracts SET file_size_bytes = :size WHERE id = :id"),
+                           {"size": size, "id": contract_id})
+                updated += 1
+        db.commit()
+        last_id = rows[-1][0]
+    return updated
+
+def update_schema(rebuild_stats: bool = False):
     print("Creating new tables...")
     Base.metadata.create_all(bind=engine)
     print("Tables created (if not existed).")
@@ -43,8 +81,92 @@ def update_schema():
             print("Added last_active column")
         except Exception as e:
             print(f"last_active column might exist: {e}")
+
+        # Add file_hash column (keys the persisted text artifact)
+        try:
+            conn.execute(text("ALTER TABLE contracts ADD COLUMN file_hash VARCHAR(64)"))
+            conn.execute(text("CREATE INDEX ix_contracts_file_hash ON contracts (file_hash)"))
+            print("Added file_hash column")
+        except Exception as e:
+            print(f"file_hash column might exist: {e}")
+
+        # Keyset pagination index for risks tables created before it existed
+        try:
+            conn.execute(text("CREATE INDEX ix_risks_user_created ON risks (user_id, created_at, id)"))
+            print("Added ix_risks_user_created index")
+        except Exception as e:
+            print(f"ix_risks_user_created might exist: {e}")
+
+        # Byte-size column replacing the formatted file_size string (left in place, no longer mapped)
+        try:
+            conn.execute(text("ALTER TABLE contracts ADD COLUMN file_size_bytes BIGINT NOT NULL DEFAULT 0"))
+            print("Added file_size_bytes column")
+        except Exception as e:
+            print(f"file_size_bytes column might exist: {e}")
+        try:
+            conn.execute(text("CREATE INDEX ix_contracts_user_type_size ON contracts (user_id, contract_type, file_size_bytes)"))
+            print("Added ix_contracts_user_type_size index")
+        except Exception as e:
+            print(f"ix_contracts_user_type_size might exist: {e}")
+
+        # Optimistic concurrency for in-place risk status patches
+        try:
+            conn.execute(text("ALTER TABLE contracts ADD COLUMN version INT NOT NULL DEFAULT 1"))
+            print("Added contracts.version column")
+        except Exception as e:
+            print(f"contracts.version column might exist: {e}")
+        # Rows without json_index are rebuilt by the risk backfill below
+        try:
+            conn.execute(text("ALTER TABLE risks ADD COLUMN json_index INT"))
+            print("Added risks.json_index column")
+        except Exception as e:
+            print(f"risks.json_index column might exist: {e}")
+
+        # Activities keep the id activity_log gave them while buffered; older rows use their row id
+        try:
+            conn.execute(text("ALTER TABLE activities ADD COLUMN event_id VARCHAR(32)"))
+            print("Added activities.event_id column")
+        except Exception as e:
+            print(f"activities.event_id column might exist: {e}")
+        conn.execute(text("UPDATE activities SET event_id = CAST(id AS CHAR) WHERE event_id IS NULL"))
+
+        # Hot/cold tiering (contract_cold_results itself comes from create_all)
+        for column, ddl in [
+            ("results_tier", "VARCHAR(10) NOT NULL DEFAULT 'hot'"),
+            ("file_tier", "VARCHAR(10) NOT NULL DEFAULT 'hot'"),
+            ("last_accessed_at", "DATETIME"),
+        ]:
+            try:
+                conn.execute(text(f"ALTER TABLE contracts ADD COLUMN {column} {ddl}"))
+                print(f"Added contracts.{column} column")
+            except Exception as e:
+                print(f"contracts.{column} column might exist: {e}")
+        try:
+            conn.execute(text("CREATE INDEX ix_contracts_last_accessed_at ON contracts (last_accessed_at)"))
+            print("Added ix_contracts_last_accessed_at index")
+        except Exception as e:
+            print(f"ix_contracts_last_accessed_at might exist: {e}")
+        # Existing contracts count as last opened when they were uploaded
+        conn.execute(text("UPDATE contracts SET last_accessed_at = upload_date WHERE last_accessed_at IS NULL"))
             
         conn.commit()
 
+    # Backfill the normalized risks table from analysis_results (skips contracts already done)
+    print("Backfilling risks...")
+    db = SessionLocal()
+    try:
+        print("Backfilling file sizes...")
+        print(f"Backfilled {backfill_file_sizes(db)} file sizes")
+
+        created = risk_service.backfill(db)
+        print(f"Backfilled {created} risks")
+
+        # Only users without aggregates yet; --rebuild-stats recomputes everyone (pause uploads first)
+        print("Rebuilding dashboard stats...")
+        rebuilt = dashboard_stats.rebuild_all(db, missing_only=not rebuild_stats)
+        print(f"Rebuilt dashboard stats for {rebuilt} users")
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    update_schema()
+    update_schema(rebuild_stats="--rebuild-stats" in sys.argv)
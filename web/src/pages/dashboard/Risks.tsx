@@ -53,24 +53,55 @@ export const Risks: React.FC = () => {
     { name: '本月新增', value: 0, change: 0, color: 'blue' },
   ]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
-    fetchRisks();
+    fetchStats();
   }, []);
 
-  const fetchRisks = async () => {
+  // Filters are applied by the server; debounce so typing doesn't fire a request per key
+  useEffect(() => {
+    const timer = setTimeout(() => fetchRisks(), searchQuery ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [searchQuery, selectedType, selectedCategory]);
+
+  const authHeaders = (): Record<string, string> | null => {
+    const token = localStorage.getItem('NexDoc_token');
+    if (!token) {
+      navigate('/login');
+      return null;
+    }
+    return { 'Authorization': `Bearer ${token}` };
+  };
+
+  const fetchStats = async () => {
+    const headers = authHeaders();
+    if (!headers) return;
     try {
-      const token = localStorage.getItem('NexDoc_token');
-      if (!token) {
-        navigate('/login');
-        return;
+      const response = await fetch('/api/v1/risks/stats', { headers });
+      if (response.ok) {
+        const data = await response.json();
+        setRiskStats(data.stats);
       }
+    } catch (error) {
+      console.error('Error fetching risk stats:', error);
+    }
+  };
 
-      const response = await fetch('/api/v1/risks/', {
-        headers: {
-          'Authorization': `Bearer ${token}`
-        }
-      });
+  const fetchRisks = async (cursor?: string) => {
+    const headers = authHeaders();
+    if (!headers) return;
+
+    const params = new URLSearchParams({ limit: '50' });
+    if (searchQuery.trim()) params.set('q', searchQuery.trim());
+    if (selectedType !== 'all') params.set('type', selectedType);
+    if (selectedCategory !== '全部') params.set('category', selectedCategory);
+    if (cursor) params.set('cursor', cursor);
+
+    if (cursor) setLoadingMore(true);
+    try {
+      const response = await fetch(`/api/v1/risks/?${params.toString()}`, { headers });
 
       if (!response.ok) {
         if (response.status === 401) {
@@ -81,23 +112,16 @@ export const Risks: React.FC = () => {
       }
 
       const data = await response.json();
-      setRisksList(data.risks);
-      setRiskStats(data.stats);
+      setRisksList(prev => cursor ? [...prev, ...data.risks] : data.risks);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error('Error fetching risks:', error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
-  const filteredRisks = risksList.filter(risk => {
-    const matchesSearch = risk.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                         risk.contract.toLowerCase().includes(searchQuery.toLowerCase());
-    const matchesCategory = selectedCategory === '全部' || risk.category === selectedCategory;
-    const matchesType = selectedType === 'all' || risk.type === selectedType;
-    return matchesSearch && matchesCategory && matchesType;
-  });
-
   const getTypeBadge = (type: string) => {
     const styles: Record<string, string> = {
       high: 'bg-red-100 text-red-600',
@@ -239,7 +263,7 @@ export const Risks: React.FC = () => {
             </tr>
           </thead>
           <tbody>
-            {filteredRisks.map((risk) => (
+            {risksList.map((risk) => (
               <tr key={risk.id} className="border-b border-gray-100 hover:bg-gray-50 transition-colors">
                 <td className="px-6 py-4">
                   <p className="font-medium text-charcoal">{risk.title}</p>
@@ -293,7 +317,19 @@ export const Risks: React.FC = () => {
           </tbody>
         </table>
 
-        {filteredRisks.length === 0 && (
+        {nextCursor && (
+          <div className="p-4 text-center border-t border-gray-100">
+            <button
+              onClick={() => fetchRisks(nextCursor)}
+              disabled={loadingMore}
+              className="text-sm text-gray-600 hover:text-charcoal disabled:opacity-50"
+            >
+              {loadingMore ? '加载中...' : '加载更多'}
+            </button>
+          </div>
+        )}
+
+        {!loading && risksList.length === 0 && (
           <div className="p-12 text-center">
             <div className="w-20 h-20 rounded-2xl bg-gray-100 flex items-center justify-center mx-auto mb-4">
               <Shield className="w-10 h-10 text-gray-300" />
@@ -355,6 +391,7 @@ export const Risks: React.FC = () => {
           setRisksList(prev => prev.map(r => 
             r.id === riskId ? { ...r, status: 'resolved' } : r
           ));
+          fetchStats();
         }}
       />
     </div>
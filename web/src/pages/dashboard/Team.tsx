@@ -27,7 +27,7 @@ interface Member {
 }
 
 interface Activity {
-  id: number;
+  id: string;
   user: string;
   action: string;
   target: string;
@@ -59,6 +59,28 @@ export const Team: React.FC = () => {
     fetchData();
   }, []);
 
+  // Search runs on the server; debounce so typing doesn't fire a request per key
+  useEffect(() => {
+    if (loading) return;
+    const timer = setTimeout(() => fetchMembers(), 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  const fetchMembers = async () => {
+    const token = localStorage.getItem('NexDoc_token');
+    if (!token) return;
+    const params = new URLSearchParams({ limit: '200' });
+    if (searchQuery.trim()) params.set('q', searchQuery.trim());
+    try {
+      const membersRes = await fetch(`/api/v1/team/members?${params.toString()}`, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+      if (membersRes.ok) setMembers(await membersRes.json());
+    } catch (error) {
+      console.error("Failed to fetch team members", error);
+    }
+  };
+
   const fetchData = async () => {
     const token = localStorage.getItem('NexDoc_token');
     if (!token) {
@@ -70,7 +92,7 @@ export const Team: React.FC = () => {
       const headers = { 'Authorization': `Bearer ${token}` };
 
       // Fetch Members
-      const membersRes = await fetch('/api/v1/team/members', { headers });
+      const membersRes = await fetch('/api/v1/team/members?limit=200', { headers });
       const membersData = await membersRes.json();
       setMembers(membersData);
 
@@ -129,11 +151,6 @@ export const Team: React.FC = () => {
     }
   };
 
-  const filteredMembers = members.filter(member =>
-    member.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-    member.email.toLowerCase().includes(searchQuery.toLowerCase())
-  );
-
   const getRoleBadge = (role: string) => {
     const styles: Record<string, string> = {
       admin: 'bg-purple-100 text-purple-600',
@@ -245,7 +262,7 @@ export const Team: React.FC = () => {
                 </tr>
               </thead>
               <tbody>
-                {filteredMembers.map((member) => (
+                {members.map((member) => (
                   <tr key={member.id} className="border-b border-gray-100 hover:bg-gray-50 transition-colors">
                     <td className="px-6 py-4">
                       <div className="flex items-center gap-3">